@@ -3,15 +3,159 @@ Vietnamese Food Classifier using EfficientNet-B3
 
 This module provides AI-based food recognition for Vietnamese dishes.
 The model architecture and preprocessing must match the training configuration exactly.
+
+torch and torchvision are imported lazily on first load, so importing this
+module (and every router that depends on it) stays cheap for workers that
+never serve the camera.
+
+On CPU the weights are memory-mapped from the checkpoint file instead of
+being copied into each process (``MODEL_WEIGHTS_MMAP``, on by default), so
+every uvicorn/gunicorn worker on the host shares one physical copy through
+the page cache.
+
+Weights are taken from the active version of the model registry
+(``app.core.model_registry``) when there is one. Activating another version
+hot-swaps it in the background without dropping in-flight requests, and a
+shadow version can be evaluated on a sample of live traffic.
 """
 
-import torch
-import torch.nn as nn
-from torchvision import models, transforms
 from PIL import Image
+import hashlib
 import io
 import os
-from typing import Tuple, Optional
+import queue
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Optional, Sequence, List
+
+from app.core.inference_protocol import send_message, recv_message
+from app.core.metrics import IMAGE_DECODE, MODEL_IMAGES, MODEL_INFERENCE
+from app.core.tracing import span
+from app.core.model_registry import registry
+
+DEFAULT_MODEL_PATH = "food_model.pth"
+DEFAULT_LABELS_PATH = "labels.txt"
+# How often each process checks the registry for a new active/shadow version
+REGISTRY_POLL_SECONDS = float(os.getenv("MODEL_REGISTRY_POLL_SECONDS", "5"))
+# Below this top-1 confidence a prediction is refined with test-time
+# augmentation (one extra batched forward pass); 0 disables it
+TTA_THRESHOLD = float(os.getenv("MODEL_TTA_THRESHOLD", "0.5"))
+TTA_ZOOM = 0.875
+# Size of the pooled EfficientNet-B3 features fed to the classifier head
+EMBEDDING_DIM = 1536
+# CPU time allowed for one multi-dish detection, decode to deduplication
+MULTI_DISH_BUDGET_MS = float(os.getenv("MULTI_DISH_BUDGET_MS", "1500"))
+# Sliding windows as (side fraction of the image, stride fraction), coarse first
+MULTI_DISH_WINDOWS = ((1.0, 1.0), (0.6, 0.2), (0.45, 0.1833))
+# Assumed per-crop forward cost (CPU) until a real measurement is available
+DEFAULT_CROP_MS = 200.0
+
+
+def _tta_views(batch) -> list:
+    """
+    Augmented views of a preprocessed batch: horizontal flip, a central
+    zoomed crop and its flip. Built from the tensors directly (resize and
+    normalisation are linear), so images are not decoded again.
+    """
+    import torch
+    import torch.nn.functional as F
+
+    height, width = batch.shape[-2:]
+    crop_h, crop_w = int(height * TTA_ZOOM), int(width * TTA_ZOOM)
+    top, left = (height - crop_h) // 2, (width - crop_w) // 2
+    zoom = F.interpolate(
+        batch[:, :, top:top + crop_h, left:left + crop_w],
+        size=(height, width),
+        mode="bilinear",
+        align_corners=False,
+    )
+    return [torch.flip(batch, dims=[3]), zoom, torch.flip(zoom, dims=[3])]
+
+
+def _window_boxes(width: int, height: int, windows=MULTI_DISH_WINDOWS) -> list:
+    """
+    Candidate regions as (x0, y0, x1, y1) pixel boxes, coarse to fine.
+
+    Within a scale the windows are ordered by distance to the centre, where
+    dishes usually are, so cutting the list short for the time budget drops
+    the corners first.
+    """
+    boxes = []
+    for scale, stride in windows:
+        box_w, box_h = int(width * scale), int(height * scale)
+        step_x, step_y = max(1, int(width * stride)), max(1, int(height * stride))
+        level = []
+        for y0 in range(0, height - box_h + 1, step_y):
+            for x0 in range(0, width - box_w + 1, step_x):
+                level.append((x0, y0, x0 + box_w, y0 + box_h))
+        center_x, center_y = width / 2, height / 2
+        level.sort(
+            key=lambda b: ((b[0] + b[2]) / 2 - center_x) ** 2 + ((b[1] + b[3]) / 2 - center_y) ** 2
+        )
+        boxes.extend(level)
+    return boxes
+
+
+def _box_overlap(a, b) -> Tuple[float, float]:
+    """Return (IoU, intersection over the smaller box)."""
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0, 0.0
+    intersection = width * height
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return intersection / (area_a + area_b - intersection), intersection / min(area_a, area_b)
+
+
+def _dedupe_dishes(
+    candidates: list,
+    same_label_overlap: float = 0.5,
+    other_label_iou: float = 0.6,
+) -> list:
+    """
+    Greedy non-maximum suppression over (label, confidence, box) candidates.
+
+    A crop is dropped when a more confident crop of the same dish covers most
+    of it (windows of one bowl at several scales), or when a more confident
+    crop of another dish is essentially the same region.
+    """
+    kept = []
+    for label, confidence, box in sorted(candidates, key=lambda c: -c[1]):
+        duplicate = False
+        for kept_label, _, kept_box in kept:
+            iou, containment = _box_overlap(box, kept_box)
+            if label == kept_label and max(iou, containment) >= same_label_overlap:
+                duplicate = True
+            elif label != kept_label and iou >= other_label_iou:
+                duplicate = True
+            if duplicate:
+                break
+        if not duplicate:
+            kept.append((label, confidence, box))
+    return kept
+
+
+class ModelState:
+    NOT_LOADED = "not_loaded"
+    LOADING = "loading"
+    WARMING_UP = "warming_up"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class LoadedModel:
+    """Weights, labels and preprocessing of one model version, swapped as a unit."""
+
+    def __init__(self, model, labels: list, transform, version: str, weights_mode: str):
+        self.model = model
+        self.labels = labels
+        self.transform = transform
+        self.version = version
+        self.weights_mode = weights_mode
 
 
 class VNFoodClassifier:
@@ -24,17 +168,45 @@ class VNFoodClassifier:
     """
     
     _instance = None
-    _model = None
-    _labels = None
+    _loaded = None
     _device = None
-    _transform = None
+    _load_lock = threading.Lock()
+    _swap_lock = threading.Lock()
+    _state = ModelState.NOT_LOADED
+    _error = None
+    _load_seconds = None
+    _warmup_seconds = None
+    # Only the application singleton follows the registry and runs shadows
+    _follow_registry = True
+    _registry_mtime = None
+    _next_registry_check = 0.0
+    tta_threshold = TTA_THRESHOLD
+    _stats_lock = threading.Lock()
+    _tta_predictions = 0
+    _tta_triggered = 0
+    _tta_changed = 0
+    _tta_seconds = 0.0
+    # Moving average of the forward cost per image, sizes the multi-dish batch
+    _crop_ms = None
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(VNFoodClassifier, cls).__new__(cls)
+            cls._instance.shadow = ShadowEvaluator()
         return cls._instance
+
+    @classmethod
+    def standalone(cls) -> "VNFoodClassifier":
+        """A separate, non-singleton classifier (e.g. a shadow candidate)."""
+        instance = super(VNFoodClassifier, cls).__new__(cls)
+        instance._load_lock = threading.Lock()
+        instance._swap_lock = threading.Lock()
+        instance._follow_registry = False
+        return instance
     
-    def __init__(self):
+    def _init_device(self):
+        import torch
+
         if self._device is None:
             self._device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
             print(f"AI Predictor using device: {self._device}")
@@ -52,7 +224,7 @@ class VNFoodClassifier:
         
         return labels
     
-    def _build_model(self, num_classes: int) -> nn.Module:
+    def _build_model(self, num_classes: int) -> "torch.nn.Module":
         """
         Build EfficientNet-B3 model with custom classifier.
         
@@ -60,6 +232,9 @@ class VNFoodClassifier:
         - Base: EfficientNet-B3 (pretrained weights NOT loaded here, we load from .pth)
         - Classifier: Dropout(0.3) -> Linear(1536, num_classes)
         """
+        import torch.nn as nn
+        from torchvision import models
+
         # Create EfficientNet-B3 without pretrained weights
         model = models.efficientnet_b3(weights=None)
         
@@ -72,7 +247,7 @@ class VNFoodClassifier:
         
         return model
     
-    def _create_transforms(self) -> transforms.Compose:
+    def _create_transforms(self) -> "transforms.Compose":
         """
         Create preprocessing transforms matching training configuration.
         
@@ -81,6 +256,8 @@ class VNFoodClassifier:
         - ToTensor
         - Normalize with ImageNet stats
         """
+        from torchvision import transforms
+
         return transforms.Compose([
             transforms.Resize((300, 300)),
             transforms.ToTensor(),
@@ -92,75 +269,347 @@ class VNFoodClassifier:
     
     def load_model(
         self, 
-        model_path: str = "food_model.pth",
-        labels_path: str = "labels.txt"
+        model_path: Optional[str] = None,
+        labels_path: Optional[str] = None
     ) -> bool:
         """
         Load the model and labels.
         
         Args:
-            model_path: Path to the .pth weights file
-            labels_path: Path to labels.txt file
+            model_path: Path to the .pth weights file (default: the active
+                registry version, else ``food_model.pth``)
+            labels_path: Path to labels.txt file (default: as above, else
+                ``labels.txt``)
             
         Returns:
             True if model loaded successfully, False otherwise
         """
-        if self._model is not None:
+        if self._loaded is not None:
             return True
-        
+
+        with self._load_lock:
+            # Another thread may have finished loading while we waited
+            if self._loaded is not None:
+                return True
+            version = None
+            if model_path is None and labels_path is None and self._follow_registry:
+                active = registry.active()
+                if active is not None:
+                    model_path, labels_path, version = (
+                        active.model_path, active.labels_path, active.version
+                    )
+            return self._load_model_locked(
+                model_path or DEFAULT_MODEL_PATH,
+                labels_path or DEFAULT_LABELS_PATH,
+                version,
+            )
+
+    def _load_model_locked(
+        self, model_path: str, labels_path: str, version: Optional[str] = None
+    ) -> bool:
+        started = time.perf_counter()
+        self._set_state(ModelState.LOADING)
         try:
-            # Load labels first to determine num_classes
-            self._labels = self._load_labels(labels_path)
-            num_classes = len(self._labels)
-            print(f"Loaded {num_classes} class labels from {labels_path}")
-            
-            # Build model architecture
-            self._model = self._build_model(num_classes)
-            
-            # Load weights - handle both formats
-            if not os.path.exists(model_path):
-                raise FileNotFoundError(f"Model file not found: {model_path}")
-            
-            checkpoint = torch.load(model_path, map_location=self._device)
-            
-            # Handle different checkpoint formats
-            if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
-                # Checkpoint contains model_state_dict key
-                state_dict = checkpoint['model_state_dict']
-                print("Loading weights from checkpoint with 'model_state_dict' key")
-            elif isinstance(checkpoint, dict) and 'state_dict' in checkpoint:
-                # Some frameworks use 'state_dict' key
-                state_dict = checkpoint['state_dict']
-                print("Loading weights from checkpoint with 'state_dict' key")
-            elif isinstance(checkpoint, dict):
-                # Assume the dict itself is the state_dict
-                state_dict = checkpoint
-                print("Loading weights from direct state_dict")
-            else:
-                # It might be the full model (not recommended but handle it)
-                raise ValueError("Unexpected checkpoint format. Expected state_dict or dict with 'model_state_dict' key.")
-            
-            self._model.load_state_dict(state_dict)
-            self._model.to(self._device)
-            self._model.eval()
-            
-            # Create transforms
-            self._transform = self._create_transforms()
-            
-            print(f"AI Model loaded successfully from {model_path}")
-            return True
-            
+            loaded = self._build_loaded(model_path, labels_path, version)
         except FileNotFoundError as e:
             print(f"File not found: {e}")
-            self._model = None
-            self._labels = None
+            self._set_state(ModelState.FAILED, str(e))
             return False
         except Exception as e:
             print(f"Error loading model: {e}")
-            self._model = None
-            self._labels = None
+            self._set_state(ModelState.FAILED, str(e))
             return False
+
+        self._loaded = loaded
+        self._load_seconds = time.perf_counter() - started
+        self._set_state(ModelState.READY)
+        print(f"AI Model loaded successfully from {model_path}")
+        return True
+
+    def _build_loaded(
+        self, model_path: str, labels_path: str, version: Optional[str] = None
+    ) -> LoadedModel:
+        """
+        Load weights, labels and transforms into a new ``LoadedModel``.
+
+        Nothing is published on ``self``: callers swap the result in with a
+        single assignment, so concurrent predictions never see a model
+        paired with the labels of another version.
+        """
+        self._init_device()
+
+        # Load labels first to determine num_classes
+        labels = self._load_labels(labels_path)
+        num_classes = len(labels)
+        print(f"Loaded {num_classes} class labels from {labels_path}")
+        
+        # Build model architecture
+        model = self._build_model(num_classes)
+        
+        # Load weights - handle both formats
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+        
+        checkpoint, weights_mode = self._load_checkpoint(model_path)
+        
+        # Handle different checkpoint formats
+        if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
+            # Checkpoint contains model_state_dict key
+            state_dict = checkpoint['model_state_dict']
+            print("Loading weights from checkpoint with 'model_state_dict' key")
+        elif isinstance(checkpoint, dict) and 'state_dict' in checkpoint:
+            # Some frameworks use 'state_dict' key
+            state_dict = checkpoint['state_dict']
+            print("Loading weights from checkpoint with 'state_dict' key")
+        elif isinstance(checkpoint, dict):
+            # Assume the dict itself is the state_dict
+            state_dict = checkpoint
+            print("Loading weights from direct state_dict")
+        else:
+            # It might be the full model (not recommended but handle it)
+            raise ValueError("Unexpected checkpoint format. Expected state_dict or dict with 'model_state_dict' key.")
+        
+        if weights_mode == "mmap":
+            # assign=True makes the parameters point at the mapped storage
+            # instead of copying it into freshly allocated tensors
+            model.load_state_dict(state_dict, assign=True)
+        else:
+            model.load_state_dict(state_dict)
+        model.to(self._device)
+        model.eval()
+
+        if version is None:
+            version = os.getenv("MODEL_VERSION") or self._derive_version(model_path)
+        return LoadedModel(model, labels, self._create_transforms(), version, weights_mode)
+
+    @staticmethod
+    def _derive_version(model_path: str) -> str:
+        """Architecture name plus a short content hash of the weights file."""
+        digest = hashlib.sha256()
+        with open(model_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return f"efficientnet_b3-{digest.hexdigest()[:8]}"
+
+    @property
+    def model_version(self) -> Optional[str]:
+        loaded = self._loaded
+        return loaded.version if loaded is not None else None
+
+    def _use_mmap(self) -> bool:
+        enabled = os.getenv("MODEL_WEIGHTS_MMAP", "true").lower() == "true"
+        # Mapped storage only helps when the weights stay in host memory
+        return enabled and self._device.type == "cpu"
+
+    def _load_checkpoint(self, model_path: str):
+        """
+        Load the checkpoint, memory-mapped when possible.
+
+        Falls back to a regular (private copy) load on torch versions
+        without ``mmap`` support or for legacy non-zip checkpoints.
+
+        Returns:
+            Tuple of (checkpoint, weights_mode)
+        """
+        import torch
+
+        if self._use_mmap():
+            try:
+                checkpoint = torch.load(model_path, map_location="cpu", mmap=True)
+                return checkpoint, "mmap"
+            except (TypeError, RuntimeError) as e:
+                print(f"Memory-mapped load unavailable, copying weights instead: {e}")
+
+        return torch.load(model_path, map_location=self._device), "private"
+
+    def _set_state(self, state: str, error: Optional[str] = None):
+        self._state = state
+        self._error = error
+
+    @property
+    def labels(self) -> Optional[list]:
+        loaded = self._loaded
+        return loaded.labels if loaded is not None else None
+
+    @property
+    def transform(self):
+        """Preprocessing of the serving model (PIL image -> tensor)."""
+        loaded = self._loaded
+        return loaded.transform if loaded is not None else None
+
+    def logits(self, batch, loaded: Optional[LoadedModel] = None):
+        """
+        Raw class scores for an already preprocessed batch (N, 3, 300, 300).
+
+        Used by the offline evaluation harness and warm-up; moves the batch
+        to the model device.
+        """
+        import torch
+
+        loaded = loaded or self._loaded
+        with torch.no_grad():
+            return loaded.model(batch.to(self._device))
+
+    def refine_logits(self, batch, logits, threshold: Optional[float] = None, loaded=None):
+        """
+        Confidence-gated test-time augmentation.
+
+        Images whose top-1 probability is below ``threshold`` (default
+        ``tta_threshold``) are run once more as augmented views in a single
+        batched forward pass, and their logits are averaged with the original
+        ones. Confident images are returned untouched, so the common case
+        costs nothing extra.
+
+        Returns:
+            Tuple of (logits, bool mask of the images that were refined)
+        """
+        import torch
+
+        loaded = loaded or self._loaded
+        threshold = self.tta_threshold if threshold is None else threshold
+        refined = torch.zeros(logits.shape[0], dtype=torch.bool)
+        if threshold <= 0:
+            return logits, refined
+
+        confidences = torch.nn.functional.softmax(logits, dim=1).max(dim=1).values
+        low = (confidences < threshold).nonzero(as_tuple=True)[0]
+        if low.numel() == 0:
+            return logits, refined
+
+        views = _tta_views(batch[low.to(batch.device)])
+        with torch.no_grad():
+            view_logits = loaded.model(torch.cat(views).to(self._device))
+        view_logits = view_logits.view(len(views), low.numel(), -1)
+
+        logits = logits.clone()
+        logits[low] = (logits[low] + view_logits.sum(dim=0)) / (len(views) + 1)
+        refined[low.cpu()] = True
+        return logits, refined
+
+    def warmup(self, batch_sizes: Sequence[int] = (1,)) -> bool:
+        """
+        Run dummy forward passes so the first real request does not pay for
+        lazy kernel selection and memory allocation.
+
+        Args:
+            batch_sizes: Batch sizes to exercise, one forward pass each
+
+        Returns:
+            True if the model is loaded and warmed up, False otherwise
+        """
+        if not self.load_model():
+            return False
+
+        started = time.perf_counter()
+        self._set_state(ModelState.WARMING_UP)
+        self._warm(self._loaded, batch_sizes)
+        self._warmup_seconds = time.perf_counter() - started
+        self._set_state(ModelState.READY)
+        return True
+
+    def _warm(self, loaded: LoadedModel, batch_sizes: Sequence[int]) -> None:
+        import torch
+
+        try:
+            for batch_size in batch_sizes:
+                dummy = torch.zeros(batch_size, 3, 300, 300, device=self._device)
+                self.logits(dummy, loaded)
+        except Exception as e:
+            # A failed warm-up is not fatal, real requests can still try
+            print(f"Model warm-up error: {e}")
+
+    def swap(self, version: str) -> bool:
+        """
+        Hot-swap to a registered model version.
+
+        The new version is loaded and warmed up next to the current one,
+        then published with a single assignment: requests already running
+        finish on the old model, new ones use the new model.
+
+        Returns:
+            True if the new version is now serving, False otherwise
+        """
+        model_version = registry.get(version)
+        if model_version is None:
+            print(f"Unknown model version: {version}")
+            return False
+
+        with self._swap_lock:
+            if self.model_version == version:
+                return True
+            started = time.perf_counter()
+            try:
+                loaded = self._build_loaded(
+                    model_version.model_path, model_version.labels_path, version
+                )
+            except Exception as e:
+                # Keep serving the current model
+                print(f"Hot-swap to {version} failed: {e}")
+                return False
+            self._warm(loaded, (1,))
+            self._loaded = loaded
+            self._load_seconds = time.perf_counter() - started
+            self._error = None
+            self._state = ModelState.READY
+            print(f"AI Model hot-swapped to {version}")
+            return True
+
+    def _check_registry(self) -> None:
+        """Follow registry pointer changes, at most every few seconds."""
+        now = time.monotonic()
+        if not self._follow_registry or now < self._next_registry_check:
+            return
+        self._next_registry_check = now + REGISTRY_POLL_SECONDS
+
+        mtime = registry.pointers_mtime()
+        if mtime == self._registry_mtime:
+            return
+        self._registry_mtime = mtime
+
+        shadow_config = registry.shadow()
+        self.shadow.configure(
+            shadow_config["model"] if shadow_config else None,
+            shadow_config["sample_rate"] if shadow_config else 0.0,
+        )
+        active = registry.active()
+        if active is not None and active.version != self.model_version:
+            # Load in the background, the current model keeps serving meanwhile
+            threading.Thread(
+                target=self.swap, args=(active.version,), name="model-swap", daemon=True
+            ).start()
+
+    def status(self) -> dict:
+        """Model state for readiness probes."""
+        loaded = self._loaded
+        return {
+            "state": self._state,
+            "ready": self._state == ModelState.READY,
+            "error": self._error,
+            "device": str(self._device) if self._device is not None else None,
+            "num_classes": len(loaded.labels) if loaded else 0,
+            "weights": loaded.weights_mode if loaded else None,
+            "model_version": loaded.version if loaded else None,
+            "load_seconds": round(self._load_seconds, 3) if self._load_seconds else None,
+            "warmup_seconds": round(self._warmup_seconds, 3) if self._warmup_seconds else None,
+            "shadow": self.shadow.snapshot() if self._follow_registry else None,
+            "tta": self.tta_stats(),
+            "forward_ms_per_image": round(self._crop_ms, 2) if self._crop_ms else None,
+        }
     
+    def tta_stats(self) -> dict:
+        """How often the test-time augmentation path was taken."""
+        with self._stats_lock:
+            predictions = self._tta_predictions
+            triggered = self._tta_triggered
+            return {
+                "threshold": self.tta_threshold,
+                "predictions": predictions,
+                "triggered": triggered,
+                "trigger_rate": round(triggered / predictions, 4) if predictions else None,
+                "label_changed": self._tta_changed,
+                "mean_extra_ms": round(self._tta_seconds * 1000 / triggered, 2) if triggered else None,
+            }
+
     def predict(self, image_bytes: bytes) -> Tuple[Optional[str], float]:
         """
         Predict the food class from image bytes.
@@ -172,38 +621,255 @@ class VNFoodClassifier:
             Tuple of (label_name, confidence_score)
             Returns (None, 0.0) if prediction fails
         """
-        # Ensure model is loaded
-        if self._model is None:
+        return self.predict_batch([image_bytes])[0]
+    
+    def predict_batch(self, images: Sequence[bytes]) -> List[Tuple[Optional[str], float]]:
+        """
+        Predict several images with a single forward pass.
+
+        Args:
+            images: Raw image bytes, one entry per image
+
+        Returns:
+            One (label_name, confidence_score) tuple per input, in order.
+            Images that fail to decode get (None, 0.0).
+        """
+        results = [(None, 0.0)] * len(images)
+        if not images:
+            return results
+        if self._loaded is None:
             if not self.load_model():
-                return (None, 0.0)
-        
+                return results
+        self._check_registry()
+
+        import torch
+
+        # One snapshot for the whole batch, a hot-swap may happen meanwhile
+        loaded = self._loaded
+        started = time.perf_counter()
+        tensors, positions = self._preprocess(images, loaded)
+        if not tensors:
+            return results
+
         try:
-            # Load and preprocess image
-            image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-            input_tensor = self._transform(image)
-            input_batch = input_tensor.unsqueeze(0).to(self._device)
-            
-            # Run inference
-            with torch.no_grad():
-                outputs = self._model(input_batch)
-                probabilities = torch.nn.functional.softmax(outputs, dim=1)
-                confidence, predicted_idx = torch.max(probabilities, 1)
-            
-            # Get label and confidence
-            label_idx = predicted_idx.item()
-            confidence_score = confidence.item()
-            
-            if 0 <= label_idx < len(self._labels):
-                label_name = self._labels[label_idx]
+            input_batch = torch.stack(tensors).to(self._device)
+            forward_started = time.perf_counter()
+            with span("classifier.forward", op="predict", batch_size=len(tensors)), torch.no_grad():
+                outputs = loaded.model(input_batch)
+            self._note_forward((time.perf_counter() - forward_started) * 1000, len(tensors), "predict")
+            tta_started = time.perf_counter()
+            with span("classifier.tta"):
+                refined_outputs, refined = self.refine_logits(input_batch, outputs, loaded=loaded)
+            tta_seconds = time.perf_counter() - tta_started
+            probabilities = torch.nn.functional.softmax(refined_outputs, dim=1)
+            confidences, predicted = torch.max(probabilities, 1)
+        except Exception as e:
+            print(f"Prediction error: {e}")
+            return results
+
+        triggered = int(refined.sum())
+        with self._stats_lock:
+            self._tta_predictions += len(positions)
+            if triggered:
+                self._tta_triggered += triggered
+                self._tta_seconds += tta_seconds
+                self._tta_changed += int(
+                    (outputs.argmax(dim=1) != predicted)[refined.to(predicted.device)].sum()
+                )
+
+        for position, label_idx, confidence in zip(
+            positions, predicted.tolist(), confidences.tolist()
+        ):
+            if 0 <= label_idx < len(loaded.labels):
+                label_name = loaded.labels[label_idx]
             else:
                 label_name = f"Unknown (index {label_idx})"
-            
-            return (label_name, confidence_score)
-            
+            results[position] = (label_name, confidence)
+
+        if self._follow_registry:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            for position in positions:
+                self.shadow.maybe_submit(
+                    images[position], loaded.version, results[position], elapsed_ms
+                )
+        return results
+
+    def _preprocess(self, images: Sequence[bytes], loaded: LoadedModel) -> tuple:
+        """Decode and transform images; returns (tensors, their input positions)."""
+        started = time.perf_counter()
+        tensors = []
+        positions = []
+        with span("classifier.decode", images=len(images)):
+            for i, image_bytes in enumerate(images):
+                try:
+                    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+                    tensors.append(loaded.transform(image))
+                    positions.append(i)
+                except Exception as e:
+                    print(f"Prediction error: {e}")
+        IMAGE_DECODE.observe(time.perf_counter() - started)
+        return tensors, positions
+
+    def predict_topk_batch(self, images: Sequence[bytes], k: int = 5) -> List[list]:
+        """
+        Top-``k`` (label_name, probability) pairs per image, one forward pass.
+
+        Meant for cheap, frequent predictions (live camera previews): no
+        test-time augmentation and no shadow sampling. Images that fail to
+        decode get an empty list.
+        """
+        results = [[] for _ in images]
+        if not images:
+            return results
+        if self._loaded is None:
+            if not self.load_model():
+                return results
+
+        import torch
+
+        loaded = self._loaded
+        tensors, positions = self._preprocess(images, loaded)
+        if not tensors:
+            return results
+        try:
+            forward_started = time.perf_counter()
+            with span("classifier.forward", op="topk", batch_size=len(tensors)), torch.no_grad():
+                outputs = loaded.model(torch.stack(tensors).to(self._device))
+            self._note_forward((time.perf_counter() - forward_started) * 1000, len(tensors), "topk")
+            probabilities = torch.nn.functional.softmax(outputs, dim=1)
+            top = probabilities.topk(min(k, probabilities.shape[1]), dim=1)
         except Exception as e:
             print(f"Prediction error: {e}")
-            return (None, 0.0)
-    
+            return results
+
+        for position, indices, values in zip(positions, top.indices.tolist(), top.values.tolist()):
+            results[position] = [
+                (loaded.labels[i], p) for i, p in zip(indices, values) if 0 <= i < len(loaded.labels)
+            ]
+        return results
+
+    def detect_dishes(
+        self,
+        image_bytes: bytes,
+        budget_ms: Optional[float] = None,
+        min_confidence: float = 0.4,
+        max_dishes: int = 4,
+    ) -> dict:
+        """
+        Find several dishes in one photo by classifying sliding-window crops.
+
+        The image is decoded once; as many windows as fit in ``budget_ms``
+        (default ``MULTI_DISH_BUDGET_MS``, estimated from the measured
+        per-image forward cost) are cropped, classified in a single forward
+        pass and deduplicated. The whole frame is always evaluated, so at
+        worst this degrades to ``predict``.
+
+        Returns:
+            {"dishes": [{"label", "confidence", "box"}], "windows": int,
+            "elapsed_ms": float}, dishes sorted by confidence and boxes as
+            [x0, y0, x1, y1] fractions of the image size.
+        """
+        started = time.perf_counter()
+        budget_ms = MULTI_DISH_BUDGET_MS if budget_ms is None else budget_ms
+        result = {"dishes": [], "windows": 0, "elapsed_ms": 0.0}
+        if self._loaded is None:
+            if not self.load_model():
+                return result
+        self._check_registry()
+
+        import torch
+
+        loaded = self._loaded
+        try:
+            with span("classifier.decode", images=1), IMAGE_DECODE.time():
+                image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        except Exception as e:
+            print(f"Prediction error: {e}")
+            return result
+
+        crop_ms = self._crop_ms or DEFAULT_CROP_MS
+        boxes = []
+        tensors = []
+        for box in _window_boxes(*image.size):
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if tensors and elapsed_ms + (len(tensors) + 1) * crop_ms > budget_ms:
+                break
+            tensors.append(loaded.transform(image.crop(box)))
+            boxes.append(box)
+
+        try:
+            forward_started = time.perf_counter()
+            with span("classifier.forward", op="detect", batch_size=len(tensors)), torch.no_grad():
+                outputs = loaded.model(torch.stack(tensors).to(self._device))
+            self._note_forward((time.perf_counter() - forward_started) * 1000, len(tensors), "detect")
+            probabilities = torch.nn.functional.softmax(outputs, dim=1)
+            confidences, predicted = torch.max(probabilities, 1)
+        except Exception as e:
+            print(f"Prediction error: {e}")
+            return result
+
+        candidates = [
+            (loaded.labels[label_idx], confidence, box)
+            for label_idx, confidence, box in zip(predicted.tolist(), confidences.tolist(), boxes)
+            if confidence >= min_confidence and 0 <= label_idx < len(loaded.labels)
+        ]
+        width, height = image.size
+        result["dishes"] = [
+            {
+                "label": label,
+                "confidence": confidence,
+                "box": [round(box[0] / width, 4), round(box[1] / height, 4),
+                        round(box[2] / width, 4), round(box[3] / height, 4)],
+            }
+            for label, confidence, box in _dedupe_dishes(candidates)[:max_dishes]
+        ]
+        result["windows"] = len(boxes)
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    def _note_forward(self, elapsed_ms: float, images: int, op: str) -> None:
+        MODEL_INFERENCE.observe(elapsed_ms / 1000, op=op)
+        MODEL_IMAGES.inc(images, op=op)
+        per_image = elapsed_ms / max(images, 1)
+        with self._stats_lock:
+            if self._crop_ms is None:
+                self._crop_ms = per_image
+            else:
+                self._crop_ms = 0.8 * self._crop_ms + 0.2 * per_image
+
+    def embed_batch(self, images: Sequence[bytes]):
+        """
+        Penultimate-layer features (the 1536-d pooled EfficientNet output).
+
+        Returns:
+            float32 NumPy array of shape (len(images), 1536), L2-normalised;
+            rows of images that fail to decode are all zeros.
+        """
+        import numpy as np
+        import torch
+
+        embeddings = np.zeros((len(images), EMBEDDING_DIM), dtype=np.float32)
+        if not images:
+            return embeddings
+        if self._loaded is None:
+            if not self.load_model():
+                return embeddings
+
+        loaded = self._loaded
+        tensors, positions = self._preprocess(images, loaded)
+        if not tensors:
+            return embeddings
+
+        model = loaded.model
+        forward_started = time.perf_counter()
+        with span("classifier.forward", op="embed", batch_size=len(tensors)), torch.no_grad():
+            features = model.avgpool(model.features(torch.stack(tensors).to(self._device)))
+            features = torch.nn.functional.normalize(torch.flatten(features, 1), dim=1)
+        MODEL_INFERENCE.observe(time.perf_counter() - forward_started, op="embed")
+        MODEL_IMAGES.inc(len(tensors), op="embed")
+        embeddings[positions] = features.cpu().numpy()
+        return embeddings
+
     def predict_from_path(self, image_path: str) -> Tuple[Optional[str], float]:
         """
         Predict the food class from an image file path.
@@ -227,5 +893,337 @@ class VNFoodClassifier:
             return (None, 0.0)
 
 
-# Singleton instance for use across the application
-predictor = VNFoodClassifier()
+class ShadowEvaluator:
+    """
+    Runs a candidate model on a sampled fraction of predictions.
+
+    The candidate runs on its own thread after the primary prediction has
+    been returned, so it never adds latency to the request. Both predictions
+    and their latencies are appended to the registry shadow log; when more
+    than ``max_pending`` samples are queued new ones are dropped.
+    """
+
+    def __init__(self, max_pending: int = 16):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._executor = None
+        self._candidate = None
+        self._candidate_version = None
+        self._sample_rate = 0.0
+        self._pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.agreed = 0
+        self.dropped = 0
+
+    def configure(self, model_version, sample_rate: float) -> None:
+        with self._lock:
+            if model_version is None or sample_rate <= 0:
+                self._candidate_version = None
+                self._sample_rate = 0.0
+                return
+            self._candidate_version = model_version.version
+            self._sample_rate = sample_rate
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-shadow")
+
+    def maybe_submit(
+        self,
+        image_bytes: bytes,
+        primary_version: str,
+        primary_result: Tuple[Optional[str], float],
+        primary_ms: float,
+    ) -> None:
+        if self._sample_rate <= 0 or random.random() >= self._sample_rate:
+            return
+        with self._lock:
+            version = self._candidate_version
+            if version is None or version == primary_version:
+                return
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending += 1
+            self.submitted += 1
+        self._executor.submit(
+            self._run, version, image_bytes, primary_version, primary_result, primary_ms
+        )
+
+    def _get_candidate(self, version: str) -> Optional[VNFoodClassifier]:
+        # Only called from the shadow thread
+        if self._candidate is not None and self._candidate.model_version == version:
+            return self._candidate
+        self._candidate = None
+        model_version = registry.get(version)
+        if model_version is None:
+            return None
+        candidate = VNFoodClassifier.standalone()
+        with candidate._load_lock:
+            if not candidate._load_model_locked(
+                model_version.model_path, model_version.labels_path, version
+            ):
+                return None
+        self._candidate = candidate
+        return candidate
+
+    def _run(self, version, image_bytes, primary_version, primary_result, primary_ms):
+        try:
+            candidate = self._get_candidate(version)
+            if candidate is None:
+                return
+            started = time.perf_counter()
+            label, confidence = candidate.predict(image_bytes)
+            candidate_ms = (time.perf_counter() - started) * 1000
+            agreed = label == primary_result[0]
+            with self._lock:
+                self.completed += 1
+                self.agreed += int(agreed)
+            registry.record_shadow(
+                {
+                    "ts": round(time.time(), 3),
+                    "image_sha1": hashlib.sha1(image_bytes).hexdigest(),
+                    "primary_version": primary_version,
+                    "primary_label": primary_result[0],
+                    "primary_confidence": round(primary_result[1], 4),
+                    "primary_ms": round(primary_ms, 2),
+                    "candidate_version": version,
+                    "candidate_label": label,
+                    "candidate_confidence": round(confidence, 4),
+                    "candidate_ms": round(candidate_ms, 2),
+                }
+            )
+        except Exception as e:
+            print(f"Shadow evaluation error: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "candidate_version": self._candidate_version,
+                "sample_rate": self._sample_rate,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "agreement": round(self.agreed / self.completed, 4) if self.completed else None,
+                "dropped": self.dropped,
+                "pending": self._pending,
+            }
+
+
+class InferenceServiceError(Exception):
+    """The inference service answered with an error or could not be reached."""
+
+
+class InferenceClient:
+    """
+    Client for the out-of-process inference service (``app.core.inference_service``).
+
+    Keeps up to ``pool_size`` idle Unix socket connections open for reuse;
+    every call is bounded by ``timeout`` seconds.
+    """
+
+    def __init__(self, socket_path: str, pool_size: int = 4, timeout: float = 5.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._next_id = 0
+        self._id_lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _acquire(self) -> socket.socket:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, sock: socket.socket) -> None:
+        try:
+            self._pool.put_nowait(sock)
+        except queue.Full:
+            sock.close()
+
+    def request(self, op: str, payload: bytes = b"") -> dict:
+        return self.request_with_payload(op, payload)[0]
+
+    def request_with_payload(self, op: str, payload: bytes = b"") -> Tuple[dict, bytes]:
+        with self._id_lock:
+            self._next_id += 1
+            request_id = self._next_id
+
+        sock = self._acquire()
+        try:
+            with span("inference_service.request", op=op):
+                send_message(sock, {"op": op, "id": request_id}, payload)
+                header, response_payload = recv_message(sock)
+        except Exception:
+            # The connection state is unknown after a failure, never reuse it
+            sock.close()
+            raise
+        self._release(sock)
+
+        if not header.get("ok"):
+            raise InferenceServiceError(header.get("error", "unknown error"))
+        return header, response_payload
+
+    def predict(self, image_bytes: bytes) -> Tuple[Optional[str], float, Optional[str]]:
+        header = self.request("predict", image_bytes)
+        return header.get("label"), float(header.get("confidence", 0.0)), header.get("model_version")
+
+    def embed(self, image_bytes: bytes):
+        import numpy as np
+
+        _, payload = self.request_with_payload("embed", image_bytes)
+        return np.frombuffer(payload, dtype=np.float16).astype(np.float32)
+
+    def detect(self, image_bytes: bytes) -> dict:
+        header = self.request("detect", image_bytes)
+        return {
+            "dishes": header.get("dishes", []),
+            "windows": header.get("windows", 0),
+            "elapsed_ms": header.get("elapsed_ms", 0.0),
+            "model_version": header.get("model_version"),
+        }
+
+    def ping(self) -> dict:
+        return self.request("ping")
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class RemotePredictor:
+    """
+    Predictor backed by the inference service, with in-process fallback.
+
+    Exposes the same interface as ``VNFoodClassifier`` so routers do not
+    care where inference runs. After a failed call the service is skipped
+    for ``retry_after`` seconds to avoid paying the timeout on every request.
+    """
+
+    def __init__(
+        self,
+        client: InferenceClient,
+        fallback: Optional[VNFoodClassifier] = None,
+        retry_after: float = 10.0,
+    ):
+        self.client = client
+        self.fallback = fallback
+        self.retry_after = retry_after
+        self._skip_until = 0.0
+        self._last_version = None
+
+    def _remote_available(self) -> bool:
+        return time.monotonic() >= self._skip_until
+
+    def _mark_failed(self, error: Exception) -> None:
+        print(f"Inference service error: {error}")
+        self._skip_until = time.monotonic() + self.retry_after
+
+    def predict(self, image_bytes: bytes) -> Tuple[Optional[str], float]:
+        if self._remote_available():
+            try:
+                label, confidence, version = self.client.predict(image_bytes)
+                self._last_version = version
+                return (label, confidence)
+            except (OSError, InferenceServiceError, ValueError) as e:
+                self._mark_failed(e)
+
+        if self.fallback is not None:
+            return self.fallback.predict(image_bytes)
+        return (None, 0.0)
+
+    def predict_batch(self, images: Sequence[bytes]) -> List[Tuple[Optional[str], float]]:
+        return [self.predict(image_bytes) for image_bytes in images]
+
+    def predict_topk_batch(self, images: Sequence[bytes], k: int = 5) -> List[list]:
+        if self._remote_available() or self.fallback is None:
+            # The service only returns the top-1 label
+            return [
+                [(label, confidence)] if label else []
+                for label, confidence in self.predict_batch(images)
+            ]
+        return self.fallback.predict_topk_batch(images, k)
+
+    def embed_batch(self, images: Sequence[bytes]):
+        import numpy as np
+
+        if self._remote_available():
+            try:
+                return np.stack([self.client.embed(image_bytes) for image_bytes in images])
+            except (OSError, InferenceServiceError, ValueError) as e:
+                self._mark_failed(e)
+        if self.fallback is not None:
+            return self.fallback.embed_batch(images)
+        return np.zeros((len(images), EMBEDDING_DIM), dtype=np.float32)
+
+    def detect_dishes(self, image_bytes: bytes, **kwargs) -> dict:
+        # The service applies its own budget and thresholds
+        if self._remote_available():
+            try:
+                result = self.client.detect(image_bytes)
+                self._last_version = result.pop("model_version")
+                return result
+            except (OSError, InferenceServiceError, ValueError) as e:
+                self._mark_failed(e)
+        if self.fallback is not None:
+            return self.fallback.detect_dishes(image_bytes, **kwargs)
+        return {"dishes": [], "windows": 0, "elapsed_ms": 0.0}
+
+    def load_model(self, *args, **kwargs) -> bool:
+        return self.warmup()
+
+    def warmup(self, batch_sizes: Sequence[int] = (1,)) -> bool:
+        # The service warms itself up; only check that it answers
+        try:
+            self.client.ping()
+            return True
+        except (OSError, InferenceServiceError, ValueError) as e:
+            self._mark_failed(e)
+            return False
+
+    @property
+    def model_version(self) -> Optional[str]:
+        return self._last_version
+
+    def status(self) -> dict:
+        try:
+            remote = self.client.ping()
+        except (OSError, InferenceServiceError, ValueError) as e:
+            local = self.fallback.status() if self.fallback is not None else {}
+            # Serving from the fallback still counts as ready if it is loaded
+            return {**local, "remote": False, "remote_error": str(e),
+                    "ready": bool(local.get("ready"))}
+        self._last_version = remote.get("model_version")
+        return {**remote.get("status", {}), "remote": True}
+
+
+def _create_predictor():
+    socket_path = os.getenv("INFERENCE_SOCKET")
+    if not socket_path:
+        return VNFoodClassifier()
+    client = InferenceClient(
+        socket_path,
+        pool_size=int(os.getenv("INFERENCE_POOL_SIZE", "4")),
+        timeout=float(os.getenv("INFERENCE_TIMEOUT", "5")),
+    )
+    use_fallback = os.getenv("INFERENCE_FALLBACK", "true").lower() == "true"
+    return RemotePredictor(client, VNFoodClassifier() if use_fallback else None)
+
+
+# Singleton instance for use across the application: in-process by default,
+# or a client of the inference service when INFERENCE_SOCKET is set
+predictor = _create_predictor()
@@ -0,0 +1,168 @@
+"""
+Static asset pipeline.
+
+``python -m app.core.assets`` copies every CSS/JS file from ``app/static``
+into ``app/static/dist`` under a content-hashed name (``style.3f2a9c1b0e.css``),
+writes pre-compressed ``.gz`` (and ``.br`` when the optional ``brotli``
+package is installed) variants next to it and records the mapping in
+``manifest.json``.
+
+At runtime templates call ``asset_url("css/style.css")``, which returns the
+hashed URL when the manifest exists and the plain URL otherwise, so
+development works without a build step. ``AssetStaticFiles`` serves the
+pre-compressed variant matching ``Accept-Encoding`` and marks hashed files
+as immutable.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError:  # Optional, gzip alone is served when missing
+    brotli = None
+
+STATIC_DIR = "app/static"
+STATIC_URL = "/static"
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+ASSET_EXTENSIONS = (".css", ".js")
+HASH_LENGTH = 10
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+# Preferred order when the client accepts several encodings
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _fingerprint(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def _write_compressed(path: str) -> None:
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path + ".gz", "wb") as f:
+        # mtime=0 keeps the output reproducible between builds
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build_assets(static_dir: str = STATIC_DIR) -> Dict[str, str]:
+    """Fingerprint and pre-compress all assets, returns the manifest."""
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist_dir]
+        for name in sorted(files):
+            if not name.endswith(ASSET_EXTENSIONS):
+                continue
+            source = os.path.join(root, name)
+            rel_path = os.path.relpath(source, static_dir).replace(os.sep, "/")
+            stem, ext = os.path.splitext(rel_path)
+            hashed_rel = f"{DIST_DIR}/{stem}.{_fingerprint(source)}{ext}"
+
+            target = os.path.join(static_dir, hashed_rel)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+            _write_compressed(target)
+            manifest[rel_path] = hashed_rel
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_dir: str = STATIC_DIR) -> Dict[str, str]:
+    path = os.path.join(static_dir, DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+_manifest = load_manifest()
+
+
+def asset_url(path: str) -> str:
+    """Template helper: URL of the fingerprinted asset, or the plain one."""
+    return f"{STATIC_URL}/{_manifest.get(path, path)}"
+
+
+class AssetStaticFiles(StaticFiles):
+    """StaticFiles serving pre-compressed variants with long-lived caching."""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        is_hashed = f"{os.sep}{DIST_DIR}{os.sep}" in full_path
+
+        encoding, served_path, served_stat = self._negotiate(
+            full_path, request_headers.get("accept-encoding", "")
+        )
+        if served_path is None:
+            served_path, served_stat = full_path, stat_result
+
+        response = FileResponse(
+            served_path,
+            status_code=status_code,
+            stat_result=served_stat,
+            # Keep the media type of the original file, not of the .gz/.br
+            media_type=mimetypes.guess_type(full_path)[0] or "text/plain",
+        )
+        response.headers["Cache-Control"] = (
+            IMMUTABLE_CACHE_CONTROL if is_hashed else DEFAULT_CACHE_CONTROL
+        )
+        response.headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    @staticmethod
+    def _negotiate(full_path: str, accept_encoding: str):
+        accepted = {
+            part.split(";")[0].strip().lower() for part in accept_encoding.split(",")
+        }
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            try:
+                return encoding, full_path + suffix, os.stat(full_path + suffix)
+            except FileNotFoundError:
+                continue
+        return None, None, None
+
+
+def _main(static_dir: Optional[str] = None) -> None:
+    manifest = build_assets(static_dir or STATIC_DIR)
+    for source, hashed in sorted(manifest.items()):
+        print(f"{source} -> {hashed}")
+    if brotli is None:
+        print("brotli not installed, only gzip variants were written")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,603 @@
+"""
+Application data cache for hot repository reads.
+
+Values are cached per ``Namespace`` (user by id, latest health status, food
+by slug, daily calories, search results...) in a pluggable backend:
+
+* ``memory`` (default): an LRU with per-entry TTL in each worker;
+* ``redis``: any server speaking the Redis protocol (Redis, Valkey,
+  KeyDB...), shared by every worker and host;
+* ``none``: caching disabled, every read runs its query.
+
+Entries are never deleted to invalidate them. A key embeds the version of
+its namespace and, optionally, of a group inside it (usually a user id);
+bumping a version makes every key built on it unreachable at once, and the
+stale entries age out through their TTL or the LRU. The memory backend keeps
+versions as file modification times in ``CACHE_DIR`` (like the HTTP cache),
+so a write in one worker is seen by every worker on the host.
+
+Versions are bumped after commit from the ORM changes a session flushed,
+as declared with ``Namespace.invalidate_on``; writes that bypass the ORM
+(bulk upserts...) call ``Namespace.invalidate`` themselves. Concurrent
+misses of one key run a single loader (per process, and across processes
+with the Redis backend) while the others wait for its result; callers on
+the event loop thread (async routes) never wait and load it themselves.
+
+Usage in a repository::
+
+    USER_BY_ID: Namespace[User] = Namespace("user_by_id", ttl=300)
+    USER_BY_ID.invalidate_on(User, group=lambda user: user.id)
+
+    @cached(USER_BY_ID, group="user_id", attach=True)
+    def get_by_id(self, user_id: int): ...
+
+ORM instances are cached as pickled snapshots and merged back into the
+caller's session (``attach=True``) on a hit, so they can be modified and
+lazy-load relationships as usual.
+"""
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import itertools
+import logging
+import os
+import pickle
+import queue
+import socket
+import tempfile
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+from urllib.parse import unquote, urlparse
+
+from sqlalchemy import event
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "nutrition")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_DIR = os.getenv(
+    "CACHE_DIR", os.path.join(tempfile.gettempdir(), "nutrition_tracker_cache")
+)
+CACHE_TIMEOUT = float(os.getenv("CACHE_TIMEOUT", "0.25"))
+# How long a loader may hold a key before waiting callers load it themselves
+CACHE_LOCK_SECONDS = float(os.getenv("CACHE_LOCK_SECONDS", "2"))
+# After a Redis error, skip the backend for this long instead of timing out per call
+CACHE_RETRY_SECONDS = float(os.getenv("CACHE_RETRY_SECONDS", "5"))
+
+# session.info key of the (namespace, group) versions to bump on commit
+PENDING_INVALIDATIONS = "cache_invalidations"
+
+T = TypeVar("T")
+
+
+class CacheBackendError(Exception):
+    """The cache backend could not be reached or answered with an error."""
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+
+class MemoryBackend:
+    """Thread-safe LRU of bytes with per-entry TTL; versions in ``CACHE_DIR``."""
+
+    shared = False
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, version_dir: str = CACHE_DIR):
+        from app.core.http_cache import DataVersionStore
+
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._versions = DataVersionStore(version_dir)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                return False
+        self.set(key, value, ttl)
+        return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def versions(self, names: List[str]) -> List[int]:
+        return [self._versions.version(name) for name in names]
+
+    def bump(self, name: str) -> None:
+        self._versions.bump(name)
+
+    def size(self) -> int:
+        return len(self._data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def close(self) -> None:
+        pass
+
+
+class RedisBackend:
+    """
+    Minimal client for a server speaking the Redis protocol (RESP2).
+
+    Keeps up to ``pool_size`` idle TCP connections for reuse; every call is
+    bounded by ``timeout`` seconds. After a failure the backend reports
+    itself unavailable for ``retry_seconds`` so a down server costs one
+    timeout, not one per request. Version keys have no TTL: run the server
+    with ``maxmemory-policy volatile-lru`` so only cache entries get evicted.
+    """
+
+    shared = True
+
+    def __init__(
+        self,
+        url: str = CACHE_URL,
+        pool_size: int = 8,
+        timeout: float = CACHE_TIMEOUT,
+        retry_seconds: float = CACHE_RETRY_SECONDS,
+    ):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("redis", ""):
+            raise ValueError(f"Unsupported cache URL scheme: {parsed.scheme}")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._down_until = 0.0
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection = (sock, sock.makefile("rb"))
+        try:
+            if self.password:
+                auth = ("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)
+                self._roundtrip(connection, auth)
+            if self.db:
+                self._roundtrip(connection, ("SELECT", self.db))
+        except Exception:
+            sock.close()
+            raise
+        return connection
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read_reply(self, rfile):
+        line = rfile.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise CacheBackendError(rest.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = rfile.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Connection closed by cache server")
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read_reply(rfile) for _ in range(length)]
+        raise CacheBackendError(f"Unexpected reply from cache server: {line[:32]!r}")
+
+    def _roundtrip(self, connection, args):
+        sock, rfile = connection
+        sock.sendall(self._encode(args))
+        return self._read_reply(rfile)
+
+    def command(self, *args):
+        if time.monotonic() < self._down_until:
+            raise CacheBackendError("Cache server marked unavailable")
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = None
+        try:
+            if connection is None:
+                connection = self._connect()
+            reply = self._roundtrip(connection, args)
+        except CacheBackendError:
+            # An error reply leaves the connection usable
+            if connection is not None:
+                self._release(connection)
+            raise
+        except OSError as e:
+            if connection is not None:
+                connection[0].close()
+            self._down_until = time.monotonic() + self.retry_seconds
+            logger.warning(
+                "Cache server %s:%s unavailable, skipping it for %.0fs: %s",
+                self.host, self.port, self.retry_seconds, e,
+            )
+            raise CacheBackendError(f"Cache server {self.host}:{self.port} unavailable: {e}") from e
+        self._release(connection)
+        return reply
+
+    def _release(self, connection) -> None:
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection[0].close()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.command("GET", key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.command("SET", key, value, "PX", max(int(ttl * 1000), 1))
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return self.command("SET", key, value, "PX", max(int(ttl * 1000), 1), "NX") is not None
+
+    def delete(self, key: str) -> None:
+        self.command("DEL", key)
+
+    def versions(self, names: List[str]) -> List[int]:
+        keys = [f"{CACHE_PREFIX}:version:{name}" for name in names]
+        return [int(value or 0) for value in self.command("MGET", *keys)]
+
+    def bump(self, name: str) -> None:
+        self.command("INCR", f"{CACHE_PREFIX}:version:{name}")
+
+    def ping(self) -> bool:
+        return self.command("PING") == "PONG"
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait()[0].close()
+            except queue.Empty:
+                return
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """The configured backend (``CACHE_BACKEND``), or None when disabled."""
+    global _backend
+    if _backend is None and CACHE_BACKEND != "none":
+        with _backend_lock:
+            if _backend is None:
+                if CACHE_BACKEND == "redis":
+                    _backend = RedisBackend(CACHE_URL)
+                elif CACHE_BACKEND == "memory":
+                    _backend = MemoryBackend()
+                else:
+                    raise ValueError(f"Unknown CACHE_BACKEND: {CACHE_BACKEND}")
+    return _backend
+
+
+def close_backend() -> None:
+    if _backend is not None:
+        _backend.close()
+
+
+# ---------------------------------------------------------------------------
+# Namespaces
+# ---------------------------------------------------------------------------
+
+
+class CacheStats:
+    """Hit / miss / coalesced / error counters per namespace."""
+
+    RESULTS = ("hits", "misses", "coalesced", "errors")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: dict.fromkeys(self.RESULTS, 0))
+
+    def record(self, namespace: str, result: str) -> None:
+        with self._lock:
+            self._counts[namespace][result] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for namespace, counts in self._counts.items():
+                lookups = counts["hits"] + counts["misses"] + counts["coalesced"]
+                result[namespace] = {
+                    **counts,
+                    "hit_rate": round((counts["hits"] + counts["coalesced"]) / lookups, 4) if lookups else 0.0,
+                }
+            return result
+
+
+stats = CacheStats()
+
+
+def _on_event_loop() -> bool:
+    """True when called from the thread running an asyncio event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class _Flight:
+    __slots__ = ("done", "payload")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.payload = None
+
+
+class Namespace(Generic[T]):
+    """A family of cached values sharing a TTL and an invalidation version."""
+
+    _names = set()
+
+    def __init__(self, name: str, ttl: float):
+        if name in Namespace._names:
+            raise ValueError(f"Cache namespace {name!r} already exists")
+        Namespace._names.add(name)
+        self.name = name
+        self.ttl = ttl
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def _version_names(self, group) -> List[str]:
+        names = [f"cache-{self.name}"]
+        if group is not None:
+            names.append(f"cache-{self.name}-{group}")
+        return names
+
+    def key(self, parts: tuple, group=None) -> str:
+        """Backend key of ``parts``, built on the current versions."""
+        versions = get_backend().versions(self._version_names(group))
+        digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+        return f"{CACHE_PREFIX}:{self.name}:{'.'.join(map(str, versions))}:{digest}"
+
+    def get_or_load(self, parts: tuple, loader: Callable[[], T], group=None) -> T:
+        """
+        Cached value of ``parts``, or ``loader()`` stored for the namespace
+        TTL. Concurrent misses of the same key share one ``loader()`` call.
+        """
+        backend = get_backend()
+        if backend is None:
+            return loader()
+        try:
+            key = self.key(parts, group)
+            payload = backend.get(key)
+        except CacheBackendError as e:
+            self._backend_failed(e)
+            return loader()
+        if payload is not None:
+            stats.record(self.name, "hits")
+            return pickle.loads(payload)
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        # Cached repositories are also called from async routes: never block
+        # the event loop waiting for another loader, run our own instead
+        can_wait = not _on_event_loop()
+        if not leader:
+            if can_wait:
+                flight.done.wait(CACHE_LOCK_SECONDS)
+            if flight.payload is not None:
+                stats.record(self.name, "coalesced")
+                return pickle.loads(flight.payload)
+            stats.record(self.name, "misses")
+            return loader()
+
+        try:
+            waited, owns_lock = None, False
+            if backend.shared:
+                waited, owns_lock = self._wait_for_other_process(backend, key, can_wait)
+            if waited is not None:
+                stats.record(self.name, "coalesced")
+                flight.payload = waited
+                return pickle.loads(waited)
+            stats.record(self.name, "misses")
+            value = loader()
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            try:
+                backend.set(key, payload, self.ttl)
+                if owns_lock:
+                    backend.delete(f"{key}:lock")
+            except CacheBackendError as e:
+                self._backend_failed(e)
+            flight.payload = payload
+            return value
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _wait_for_other_process(self, backend, key: str, can_wait: bool) -> Tuple[Optional[bytes], bool]:
+        """
+        Take the key's load lock, or (with ``can_wait``) wait for the process
+        holding it to store the value. Returns (payload, lock taken); the
+        payload is None when this process should run the loader.
+        """
+        try:
+            if backend.add(f"{key}:lock", b"1", CACHE_LOCK_SECONDS):
+                return None, True
+            if not can_wait:
+                return None, False
+            deadline = time.monotonic() + CACHE_LOCK_SECONDS
+            while time.monotonic() < deadline:
+                time.sleep(0.02)
+                payload = backend.get(key)
+                if payload is not None:
+                    return payload, False
+        except CacheBackendError as e:
+            self._backend_failed(e)
+        return None, False
+
+    def _backend_failed(self, error: CacheBackendError) -> None:
+        # Counted, not logged: an unavailable server fails every lookup
+        stats.record(self.name, "errors")
+        logger.debug("Cache %s: %s", self.name, error)
+
+    def invalidate(self, group=None) -> None:
+        """Make the whole namespace, or one ``group`` of it, unreachable."""
+        backend = get_backend()
+        if backend is None:
+            return
+        try:
+            backend.bump(self._version_names(group)[-1])
+        except CacheBackendError as e:
+            self._backend_failed(e)
+        if _replica_lag_window():
+            # A reader may refill the new version from a replica that has not
+            # replayed the write yet: bump again once it must have caught up
+            timer = threading.Timer(_replica_lag_window(), self._invalidate_once, (group,))
+            timer.daemon = True
+            timer.start()
+
+    def _invalidate_once(self, group) -> None:
+        try:
+            get_backend().bump(self._version_names(group)[-1])
+        except CacheBackendError as e:
+            self._backend_failed(e)
+
+    def invalidate_on(self, model: type, group: Optional[Callable] = None) -> None:
+        """
+        Invalidate after commit whenever a session flushed a new, modified
+        or deleted ``model`` instance: the ``group(instance)`` group, or the
+        whole namespace without ``group``.
+        """
+        _invalidation_rules[model].append((self, group))
+
+
+def _replica_lag_window() -> float:
+    from app.core.replicas import REPLICA_MAX_LAG_SECONDS, replica_set
+
+    return REPLICA_MAX_LAG_SECONDS if replica_set.enabled else 0.0
+
+
+# ---------------------------------------------------------------------------
+# ORM invalidation
+# ---------------------------------------------------------------------------
+
+_invalidation_rules: Dict[type, list] = defaultdict(list)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_invalidations(session, flush_context):
+    if not _invalidation_rules:
+        return
+    # new / dirty / deleted still hold the pre-flush state here
+    for instance in itertools.chain(session.new, session.dirty, session.deleted):
+        rules = _invalidation_rules.get(type(instance))
+        if not rules:
+            continue
+        pending = session.info.setdefault(PENDING_INVALIDATIONS, set())
+        for namespace, group in rules:
+            pending.add((namespace, group(instance) if group else None))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session):
+    pending = session.info.pop(PENDING_INVALIDATIONS, None)
+    for namespace, group in pending or ():
+        namespace.invalidate(group)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session):
+    session.info.pop(PENDING_INVALIDATIONS, None)
+
+
+# ---------------------------------------------------------------------------
+# Decorator
+# ---------------------------------------------------------------------------
+
+
+def _attach(db: Session, value):
+    """Merge cached ORM instances into ``db`` without querying."""
+    if isinstance(value, list):
+        return [_attach(db, item) for item in value]
+    state = sa_inspect(value, raiseerr=False) if value is not None else None
+    if state is None or not hasattr(state, "key") or state.key is None:
+        return value
+    existing = db.identity_map.get(state.key)
+    return existing if existing is not None else db.merge(value, load=False)
+
+
+def cached(namespace: Namespace, group: Optional[str] = None, attach: bool = False):
+    """
+    Cache a repository method in ``namespace``, keyed on its arguments.
+
+    ``group`` names the argument whose value selects the invalidation group
+    (e.g. ``"user_id"``). With ``attach``, ORM instances read from the cache
+    are merged into ``self.db``. A session holding flushed, uncommitted
+    changes reads around the cache, so a rollback never leaves its data
+    cached.
+    """
+
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            db = getattr(self, "db", None)
+            if db is not None and db.info.get(PENDING_INVALIDATIONS):
+                return method(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            parts = tuple(bound.arguments.values())[1:]
+            value = namespace.get_or_load(
+                parts,
+                lambda: method(self, *args, **kwargs),
+                group=bound.arguments[group] if group else None,
+            )
+            return _attach(db, value) if attach and db is not None else value
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,412 @@
+"""
+Nearest-neighbour index over image embeddings of foods.
+
+Each row is the L2-normalised 1536-d penultimate EfficientNet feature of a
+reference photo of a catalog food (shown to everyone) or of a photo a user
+confirmed when adding a meal (shown to that user only). Looking up the nearest rows of a new
+photo proposes foods that are not among the classifier's fixed labels.
+
+Rows are stored as ``float16`` (3 KB per row) or ``int8`` with a per-row
+scale (1.5 KB per row) in one NumPy matrix. Search is exact (one chunked
+matrix-vector product) or, after ``build_ivf``, an inverted file: rows are
+clustered with spherical k-means and only the ``n_probe`` closest clusters
+are scanned.
+
+Build / rebuild the index file (``EMBEDDING_INDEX_PATH``):
+    python -m app.core.embedding_index build --reference-dir data/reference
+        [--from-food-logs] [--dtype int8] [--ivf-lists 256]
+"""
+
+import argparse
+import os
+import threading
+import urllib.error
+import urllib.request
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+INDEX_PATH = os.getenv("EMBEDDING_INDEX_PATH", "embedding_index.npz")
+EMBEDDING_DIM = 1536
+DTYPES = ("float16", "int8")
+KIND_FOOD = 0
+KIND_PERSONAL = 1
+# Rows scored per matrix product, bounds the float32 scratch memory
+SEARCH_CHUNK = 16384
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingIndex:
+    def __init__(self, dim: int = EMBEDDING_DIM, dtype: str = "float16"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        self.dim = dim
+        self.dtype = dtype
+        self.vectors = np.empty((0, dim), dtype=np.int8 if dtype == "int8" else np.float16)
+        self.scales = np.empty(0, dtype=np.float32)
+        self.kinds = np.empty(0, dtype=np.int8)
+        self.item_ids = np.empty(0, dtype=np.int64)
+        self.owner_ids = np.empty(0, dtype=np.int64)
+        self.centroids = None
+        self.assignments = None
+        self._lists = None
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if self.dtype == "float16":
+            return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+        # Symmetric per-row quantisation: row ~= codes * scale
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales = np.maximum(scales, 1e-12).astype(np.float32)
+        codes = np.round(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales
+
+    def add(
+        self,
+        vectors: np.ndarray,
+        kinds: np.ndarray,
+        item_ids: np.ndarray,
+        owner_ids: Optional[np.ndarray] = None,
+    ) -> None:
+        """
+        Add rows. ``kinds`` is KIND_FOOD or KIND_PERSONAL per row,
+        ``owner_ids`` the only user the row is shown to (0: everyone, for
+        reference photos of catalog foods).
+        """
+        vectors = normalize(vectors)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-d vectors, got {vectors.shape[1]}")
+        count = len(vectors)
+        if owner_ids is None:
+            owner_ids = np.zeros(count, dtype=np.int64)
+        codes, scales = self._encode(vectors)
+        self.vectors = np.concatenate([self.vectors, codes])
+        self.scales = np.concatenate([self.scales, scales])
+        self.kinds = np.concatenate([self.kinds, np.asarray(kinds, dtype=np.int8)])
+        self.item_ids = np.concatenate([self.item_ids, np.asarray(item_ids, dtype=np.int64)])
+        self.owner_ids = np.concatenate([self.owner_ids, np.asarray(owner_ids, dtype=np.int64)])
+        if self.centroids is not None:
+            new_assignments = self._nearest_centroids(vectors)
+            self.assignments = np.concatenate([self.assignments, new_assignments])
+            self._lists = None
+
+    def _scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity of ``query`` with all rows, or the given rows."""
+        total = len(self) if rows is None else len(rows)
+        scores = np.empty(total, dtype=np.float32)
+        for start in range(0, total, SEARCH_CHUNK):
+            stop = min(start + SEARCH_CHUNK, total)
+            if rows is None:
+                block = self.vectors[start:stop]
+                scale = self.scales[start:stop]
+            else:
+                block = self.vectors[rows[start:stop]]
+                scale = self.scales[rows[start:stop]]
+            scores[start:stop] = block.astype(np.float32) @ query
+            if self.dtype == "int8":
+                scores[start:stop] *= scale
+        return scores
+
+    def _nearest_centroids(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def _decoded(self, rows: np.ndarray) -> np.ndarray:
+        block = self.vectors[rows].astype(np.float32)
+        if self.dtype == "int8":
+            block *= self.scales[rows][:, None]
+        return block
+
+    def build_ivf(
+        self,
+        n_lists: Optional[int] = None,
+        iterations: int = 10,
+        sample_size: int = 50000,
+        seed: int = 0,
+    ) -> None:
+        """Cluster the rows (spherical k-means) to enable ``n_probe`` search."""
+        count = len(self)
+        if count == 0:
+            return
+        n_lists = n_lists or max(1, int(np.sqrt(count)))
+        n_lists = min(n_lists, count)
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(count, size=min(sample_size, count), replace=False)
+        data = self._decoded(np.sort(sample))
+
+        centroids = data[rng.choice(len(data), size=n_lists, replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, data)
+            empty = np.bincount(assignments, minlength=n_lists) == 0
+            # Re-seed empty clusters with random points
+            sums[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+            centroids = normalize(sums)
+        self.centroids = centroids.astype(np.float32)
+
+        assignments = np.empty(count, dtype=np.int32)
+        for start in range(0, count, SEARCH_CHUNK):
+            stop = min(start + SEARCH_CHUNK, count)
+            assignments[start:stop] = self._nearest_centroids(
+                self._decoded(np.arange(start, stop))
+            )
+        self.assignments = assignments
+        self._lists = None
+
+    def _inverted_lists(self) -> List[np.ndarray]:
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            bounds = np.searchsorted(
+                self.assignments[order], np.arange(len(self.centroids) + 1)
+            )
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        return self._lists
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 5,
+        owner_id: Optional[int] = None,
+        n_probe: int = 8,
+        exact: bool = False,
+    ) -> List[Tuple[int, int, float]]:
+        """
+        Return up to ``k`` distinct foods as (kind, item_id, similarity),
+        best first. Rows with an owner (personal foods, and photos users
+        logged) are only returned to that owner.
+        """
+        if len(self) == 0:
+            return []
+        query = normalize(np.asarray(query).reshape(1, -1))[0]
+
+        if exact or self.centroids is None:
+            rows = None
+        else:
+            closest = np.argsort(-(self.centroids @ query))[:n_probe]
+            lists = self._inverted_lists()
+            rows = np.concatenate([lists[c] for c in closest])
+            if len(rows) == 0:
+                return []
+
+        scores = self._scores(query, rows)
+        candidates = np.arange(len(scores)) if rows is None else rows
+        allowed = self.owner_ids[candidates] == 0
+        if owner_id is not None:
+            allowed |= self.owner_ids[candidates] == owner_id
+        scores = np.where(allowed, scores, -np.inf)
+
+        # Several photos may belong to the same food; over-fetch then dedupe
+        fetch = min(len(scores), k * 8)
+        top = np.argpartition(-scores, fetch - 1)[:fetch]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        seen = set()
+        for position in top:
+            if not np.isfinite(scores[position]):
+                break
+            row = candidates[position]
+            key = (int(self.kinds[row]), int(self.item_ids[row]))
+            if key in seen:
+                continue
+            seen.add(key)
+            results.append((key[0], key[1], float(scores[position])))
+            if len(results) == k:
+                break
+        return results
+
+    def memory_bytes(self) -> int:
+        total = sum(
+            a.nbytes for a in (self.vectors, self.scales, self.kinds, self.item_ids, self.owner_ids)
+        )
+        if self.centroids is not None:
+            total += self.centroids.nbytes + self.assignments.nbytes
+        return total
+
+    def save(self, path: str = INDEX_PATH) -> None:
+        arrays = {
+            "vectors": self.vectors,
+            "scales": self.scales,
+            "kinds": self.kinds,
+            "item_ids": self.item_ids,
+            "owner_ids": self.owner_ids,
+            "dtype": np.array(self.dtype),
+        }
+        if self.centroids is not None:
+            arrays["centroids"] = self.centroids
+            arrays["assignments"] = self.assignments
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> "EmbeddingIndex":
+        with np.load(path) as data:
+            index = cls(dim=data["vectors"].shape[1], dtype=str(data["dtype"]))
+            index.vectors = data["vectors"]
+            index.scales = data["scales"]
+            index.kinds = data["kinds"]
+            index.item_ids = data["item_ids"]
+            index.owner_ids = data["owner_ids"]
+            if "centroids" in data:
+                index.centroids = data["centroids"]
+                index.assignments = data["assignments"]
+        return index
+
+
+_loaded_index = None
+_loaded_mtime = None
+_load_lock = threading.Lock()
+
+
+def get_index(path: str = INDEX_PATH) -> Optional[EmbeddingIndex]:
+    """The index file, reloaded when it is rebuilt; None when missing."""
+    global _loaded_index, _loaded_mtime
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if mtime != _loaded_mtime:
+        with _load_lock:
+            if mtime != _loaded_mtime:
+                _loaded_index = EmbeddingIndex.load(path)
+                _loaded_mtime = mtime
+    return _loaded_index
+
+
+def _iter_reference_images(reference_dir: str):
+    """(ai_slug, image bytes) for every image under reference_dir/<ai_slug>/."""
+    for slug in sorted(os.listdir(reference_dir)):
+        folder = os.path.join(reference_dir, slug)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
+                with open(os.path.join(folder, name), "rb") as f:
+                    yield slug, f.read()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        raise urllib.error.HTTPError(req.full_url, code, f"redirect to {newurl} refused", headers, fp)
+
+
+def _iter_food_log_images(timeout: float = 10.0):
+    """
+    (kind, item_id, owner_id, image bytes) of photos confirmed in food logs.
+
+    Only Cloudinary delivery URLs are fetched, without following redirects:
+    older rows may hold any URL a client posted. Every photo is owned by the
+    user who logged it, catalog foods included, so one user's mislabelled
+    uploads never steer the suggestions of others.
+    """
+    from app.core.database import SessionLocal
+    from app.repositories.food_logs_repository import FoodLogRepository
+    from app.services.food_logs_service import is_delivery_url
+
+    opener = urllib.request.build_opener(_NoRedirect)
+    db = SessionLocal()
+    try:
+        for row in FoodLogRepository(db).stream_confirmed_photos():
+            if not is_delivery_url(row.image_url):
+                print(f"skip {row.image_url!r:.200}: not a Cloudinary delivery URL")
+                continue
+            try:
+                with opener.open(row.image_url, timeout=timeout) as response:
+                    content = response.read()
+            except Exception as e:
+                print(f"skip {row.image_url}: {e}")
+                continue
+            if row.personal_food_id is not None:
+                yield KIND_PERSONAL, row.personal_food_id, row.user_id, content
+            else:
+                yield KIND_FOOD, row.food_id, row.user_id, content
+    finally:
+        db.close()
+
+
+def build_index(args) -> EmbeddingIndex:
+    from app.core.ai_predictor import VNFoodClassifier
+
+    classifier = VNFoodClassifier()
+    if not classifier.load_model():
+        raise SystemExit(f"Could not load the model: {classifier.status()['error']}")
+    index = EmbeddingIndex(dtype=args.dtype)
+    batch_size = 32
+
+    def flush(batch):
+        embeddings = classifier.embed_batch([item[3] for item in batch])
+        valid = np.linalg.norm(embeddings, axis=1) > 0
+        index.add(
+            embeddings[valid],
+            [item[0] for item, ok in zip(batch, valid) if ok],
+            [item[1] for item, ok in zip(batch, valid) if ok],
+            [item[2] for item, ok in zip(batch, valid) if ok],
+        )
+
+    def items():
+        if args.reference_dir:
+            from app.core.database import SessionLocal
+            from app.repositories.food_repository import FoodRepository
+
+            db = SessionLocal()
+            try:
+                repo = FoodRepository(db)
+                food_ids = {}
+                for slug, content in _iter_reference_images(args.reference_dir):
+                    if slug not in food_ids:
+                        food = repo.get_by_ai_slug(slug)
+                        food_ids[slug] = food.id if food else None
+                    if food_ids[slug] is None:
+                        continue
+                    yield KIND_FOOD, food_ids[slug], 0, content
+            finally:
+                db.close()
+        if args.from_food_logs:
+            yield from _iter_food_log_images()
+
+    batch = []
+    for item in items():
+        batch.append(item)
+        if len(batch) == batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    if args.ivf_lists or len(index) > 20000:
+        index.build_ivf(args.ivf_lists)
+    return index
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Build the food embedding index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("--reference-dir", default=None, help="Folder with one sub-folder per ai_slug")
+    build.add_argument("--from-food-logs", action="store_true", help="Add photos users confirmed")
+    build.add_argument("--dtype", choices=DTYPES, default="float16")
+    build.add_argument("--ivf-lists", type=int, default=None)
+    build.add_argument("--output", default=INDEX_PATH)
+    args = parser.parse_args()
+
+    if not args.reference_dir and not args.from_food_logs:
+        parser.error("nothing to index: pass --reference-dir and/or --from-food-logs")
+    index = build_index(args)
+    index.save(args.output)
+    print(
+        f"{len(index)} embeddings ({args.dtype}, "
+        f"{'ivf' if index.centroids is not None else 'exact'}) "
+        f"{index.memory_bytes() / 2**20:.1f} MB -> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,246 @@
+"""
+Conditional GET caching for read-mostly pages.
+
+Every authenticated user has a data version counter that is bumped whenever
+that user sends a write (POST/PUT/PATCH/DELETE). Admin writes bump a global
+version instead because they change the shared food catalog or other users.
+The ETag of a page is derived from those counters plus the request URL, so a
+matching ``If-None-Match`` can be answered with ``304 Not Modified`` before
+the route runs: no template rendering and no database query.
+
+Counters are stored as file modification times in a shared directory, so
+every worker on the host sees a write immediately and a 304 is never served
+from a worker that missed it. The ETag also embeds the directory's epoch, so
+wiping the directory invalidates every outstanding ETag.
+"""
+
+import hashlib
+import os
+import secrets
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+from typing import Optional
+
+from app.core.security import decode_token
+
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Path prefix -> Cache-Control sent along with the ETag
+CACHEABLE_PREFIXES = {
+    # Pages are per user, let the browser keep them but always revalidate
+    "/home/": "private, no-cache",
+    # Search results mix the shared catalog with the user's personal foods,
+    # so they can only be cached by the browser, and only briefly
+    "/camera/search_food": "private, max-age=30",
+}
+
+# Never cached: streamed downloads must always hit the database
+EXCLUDED_PREFIXES = ("/home/export",)
+
+
+class DataVersionStore:
+    """Per-user and global data versions shared by all workers on the host."""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv(
+            "HTTP_CACHE_DIR",
+            os.path.join(tempfile.gettempdir(), "nutrition_tracker_http_cache"),
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        self.epoch = self._load_epoch()
+
+    def _load_epoch(self) -> str:
+        path = os.path.join(self.directory, "epoch")
+        try:
+            with open(path, "x") as f:
+                f.write(secrets.token_hex(4))
+        except FileExistsError:
+            pass
+        with open(path) as f:
+            return f.read().strip()
+
+    def version(self, name: str) -> int:
+        try:
+            return os.stat(os.path.join(self.directory, name)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def bump(self, name: str) -> None:
+        path = os.path.join(self.directory, name)
+        # Versions must strictly increase even on filesystems with coarse mtimes
+        new_version = max(time.time_ns(), self.version(name) + 1)
+        with open(path, "a"):
+            pass
+        os.utime(path, ns=(new_version, new_version))
+
+    def user_version(self, user_id: int) -> int:
+        return self.version(f"user-{user_id}")
+
+    def global_version(self) -> int:
+        return self.version("global")
+
+    def bump_user(self, user_id: int) -> None:
+        self.bump(f"user-{user_id}")
+
+    def bump_global(self) -> None:
+        self.bump("global")
+
+
+class CacheStats:
+    """Hit / miss counters per cached path prefix."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    def record(self, prefix: str, hit: bool) -> None:
+        with self._lock:
+            self._counts[prefix]["hits" if hit else "misses"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for prefix, counts in self._counts.items():
+                total = counts["hits"] + counts["misses"]
+                result[prefix] = {
+                    **counts,
+                    "hit_rate": round(counts["hits"] / total, 4) if total else 0.0,
+                }
+            return result
+
+
+versions = DataVersionStore()
+stats = CacheStats()
+
+
+def _user_id_from_scope(scope) -> Optional[int]:
+    """Read the user id from the JWT cookie without touching the database."""
+    for name, value in scope.get("headers", []):
+        if name != b"cookie":
+            continue
+        for part in value.decode("latin-1").split(";"):
+            key, _, token = part.strip().partition("=")
+            if key != "access_token" or not token:
+                continue
+            payload = decode_token(token.strip('"'))
+            if not payload:
+                return None
+            try:
+                return int(payload.get("sub"))
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _match_prefix(path: str) -> Optional[str]:
+    if path.startswith(EXCLUDED_PREFIXES):
+        return None
+    for prefix in CACHEABLE_PREFIXES:
+        if path.startswith(prefix):
+            return prefix
+    return None
+
+
+def compute_etag(scope, user_id: int) -> str:
+    """Build a weak ETag from the data versions and the requested URL."""
+    # Pages like the dashboard depend on "today", so the day is part of the key
+    raw = "|".join(
+        [
+            scope["path"],
+            scope.get("query_string", b"").decode("latin-1"),
+            date.today().isoformat(),
+        ]
+    )
+    url_hash = hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+    return 'W/"{}-{}-{}-{}-{}"'.format(
+        versions.epoch,
+        user_id,
+        versions.user_version(user_id),
+        versions.global_version(),
+        url_hash,
+    )
+
+
+class HTTPCacheMiddleware:
+    """ASGI middleware adding ETag revalidation to read-mostly routes."""
+
+    def __init__(self, app, enabled: Optional[bool] = None):
+        self.app = app
+        if enabled is None:
+            enabled = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        path = scope["path"]
+
+        if method in UNSAFE_METHODS:
+            await self._handle_write(scope, receive, send)
+            return
+
+        prefix = _match_prefix(path) if method in ("GET", "HEAD") else None
+        user_id = _user_id_from_scope(scope) if prefix else None
+        if user_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        etag = compute_etag(scope, user_id)
+        cache_control = CACHEABLE_PREFIXES[prefix]
+
+        if_none_match = _header(scope, b"if-none-match") or ""
+        if etag in (tag.strip() for tag in if_none_match.split(",")):
+            stats.record(prefix, hit=True)
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": [
+                        (b"etag", etag.encode("latin-1")),
+                        (b"cache-control", cache_control.encode("latin-1")),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        stats.record(prefix, hit=False)
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = [
+                    (k, v)
+                    for k, v in message.get("headers", [])
+                    if k not in (b"etag", b"cache-control")
+                ]
+                headers.append((b"etag", etag.encode("latin-1")))
+                headers.append((b"cache-control", cache_control.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
+
+    async def _handle_write(self, scope, receive, send):
+        user_id = _user_id_from_scope(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # Bump after the handler committed so a concurrent read cannot
+            # cache the pre-write page under the new version
+            if scope["path"].startswith("/admin"):
+                versions.bump_global()
+            elif user_id is not None:
+                versions.bump_user(user_id)
@@ -0,0 +1,72 @@
+"""
+Wire format shared by the inference service and its client.
+
+Every message is a fixed 8-byte prefix (two big-endian uint32: header length
+and payload length) followed by a UTF-8 JSON header and a raw binary payload
+(the image bytes for ``predict``, empty otherwise)::
+
+    request  header: {"op": "predict" | "embed" | "detect" | "ping", "id": <int>}
+    response header: {"ok": true, "label": ..., "confidence": ..., "model_version": ...}
+                     {"ok": false, "error": "..."}
+
+``embed`` answers with the image embedding as a float16 payload, ``detect``
+with ``dishes`` (label, confidence and box of each dish) in the header.
+"""
+
+import json
+import socket
+import struct
+from typing import Tuple
+
+PREFIX = struct.Struct("!II")
+MAX_HEADER_BYTES = 64 * 1024
+MAX_PAYLOAD_BYTES = 16 * 1024 * 1024
+
+
+class ProtocolError(Exception):
+    """Malformed or oversized message."""
+
+
+def encode_message(header: dict, payload: bytes = b"") -> bytes:
+    raw_header = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return PREFIX.pack(len(raw_header), len(payload)) + raw_header + payload
+
+
+def _check_sizes(header_len: int, payload_len: int) -> None:
+    if header_len > MAX_HEADER_BYTES or payload_len > MAX_PAYLOAD_BYTES:
+        raise ProtocolError(
+            f"Message too large (header={header_len}, payload={payload_len})"
+        )
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Connection closed by peer")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def send_message(sock: socket.socket, header: dict, payload: bytes = b"") -> None:
+    sock.sendall(encode_message(header, payload))
+
+
+def recv_message(sock: socket.socket) -> Tuple[dict, bytes]:
+    header_len, payload_len = PREFIX.unpack(_recv_exactly(sock, PREFIX.size))
+    _check_sizes(header_len, payload_len)
+    header = json.loads(_recv_exactly(sock, header_len))
+    payload = _recv_exactly(sock, payload_len) if payload_len else b""
+    return header, payload
+
+
+async def read_message(reader) -> Tuple[dict, bytes]:
+    """asyncio counterpart of ``recv_message`` for the server side."""
+    header_len, payload_len = PREFIX.unpack(await reader.readexactly(PREFIX.size))
+    _check_sizes(header_len, payload_len)
+    header = json.loads(await reader.readexactly(header_len))
+    payload = await reader.readexactly(payload_len) if payload_len else b""
+    return header, payload
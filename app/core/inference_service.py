@@ -0,0 +1,228 @@
+"""
+Out-of-process inference service.
+
+Runs the food classifier in its own process, listening on a Unix domain
+socket, so web workers stay small (no torch import, no weights) and the
+model is loaded once per host. Concurrent ``predict`` requests are
+collected into micro-batches of up to ``--max-batch`` images, waiting at
+most ``--max-wait-ms`` for a batch to fill, and run with one forward pass.
+
+Web workers use it when ``INFERENCE_SOCKET`` points at the socket (see
+``RemotePredictor`` in ``app.core.ai_predictor``).
+
+Usage:
+    python -m app.core.inference_service --socket /tmp/nutrition_tracker_inference.sock \\
+        [--max-batch 8] [--max-wait-ms 5] [--threads 4]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.inference_protocol import ProtocolError, encode_message, read_message
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "/tmp/nutrition_tracker_inference.sock"
+
+
+class BatchingEngine:
+    """Collects queued images into batches and runs them on the model."""
+
+    def __init__(self, classifier, max_batch: int = 8, max_wait_ms: float = 5.0, batch_fn=None):
+        self.classifier = classifier
+        # What a batch runs through, classifier.predict_batch by default
+        self.batch_fn = batch_fn or classifier.predict_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = asyncio.Queue()
+        self.pending = 0
+        # A single thread: torch already parallelises inside the forward pass
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self.batches = 0
+        self.images = 0
+
+    async def predict(self, image_bytes: bytes):
+        future = asyncio.get_running_loop().create_future()
+        self.pending += 1
+        try:
+            await self._queue.put((image_bytes, future))
+            return await future
+        finally:
+            self.pending -= 1
+
+    async def embed(self, image_bytes: bytes):
+        # Same thread as the batches, the model is never run concurrently
+        loop = asyncio.get_running_loop()
+        embeddings = await loop.run_in_executor(
+            self._executor, self.classifier.embed_batch, [image_bytes]
+        )
+        return embeddings[0]
+
+    async def detect(self, image_bytes: bytes) -> dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self.classifier.detect_dishes, image_bytes
+        )
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            images = [image for image, _ in batch]
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self.batch_fn, images
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.images += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class InferenceServer:
+    def __init__(self, engine: BatchingEngine):
+        self.engine = engine
+
+    def _status(self) -> dict:
+        status = self.engine.classifier.status()
+        status["batches"] = self.engine.batches
+        status["images"] = self.engine.images
+        return status
+
+    async def _handle_request(self, header: dict, payload: bytes):
+        """Return (response header, response payload)."""
+        op = header.get("op")
+        response = {"id": header.get("id")}
+        if op == "embed":
+            if not payload:
+                response.update(ok=False, error="Empty image payload")
+                return response, b""
+            embedding = await self.engine.embed(payload)
+            response.update(ok=True, model_version=self.engine.classifier.model_version)
+            return response, embedding.astype("float16").tobytes()
+        if op == "ping":
+            response.update(
+                ok=True,
+                model_version=self.engine.classifier.model_version,
+                status=self._status(),
+            )
+        elif op == "detect":
+            if not payload:
+                response.update(ok=False, error="Empty image payload")
+            else:
+                result = await self.engine.detect(payload)
+                response.update(
+                    ok=True, model_version=self.engine.classifier.model_version, **result
+                )
+        elif op == "predict":
+            if not payload:
+                response.update(ok=False, error="Empty image payload")
+            else:
+                label, confidence = await self.engine.predict(payload)
+                response.update(
+                    ok=True,
+                    label=label,
+                    confidence=confidence,
+                    model_version=self.engine.classifier.model_version,
+                )
+        else:
+            response.update(ok=False, error=f"Unknown op: {op}")
+        return response, b""
+
+    async def handle_connection(self, reader, writer) -> None:
+        try:
+            while True:
+                try:
+                    header, payload = await read_message(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                except (ProtocolError, ValueError) as e:
+                    writer.write(encode_message({"ok": False, "error": str(e)}))
+                    await writer.drain()
+                    break
+
+                try:
+                    response, response_payload = await self._handle_request(header, payload)
+                except Exception as e:
+                    logger.exception("Inference request failed")
+                    response = {"id": header.get("id"), "ok": False, "error": str(e)}
+                    response_payload = b""
+                writer.write(encode_message(response, response_payload))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(socket_path: str, max_batch: int, max_wait_ms: float) -> None:
+    from app.core.ai_predictor import VNFoodClassifier
+
+    classifier = VNFoodClassifier()
+    loop = asyncio.get_running_loop()
+    # Load before listening so clients never wait on a cold model
+    if not await loop.run_in_executor(None, classifier.warmup, (1, max_batch)):
+        raise SystemExit(f"Could not load the model: {classifier.status().get('error')}")
+
+    engine = BatchingEngine(classifier, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    server = InferenceServer(engine)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    unix_server = await asyncio.start_unix_server(server.handle_connection, path=socket_path)
+    logger.info("Inference service listening on %s (%s)", socket_path, classifier.model_version)
+
+    batcher = asyncio.create_task(engine.run())
+    try:
+        async with unix_server:
+            await unix_server.serve_forever()
+    finally:
+        batcher.cancel()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Out-of-process food classifier")
+    parser.add_argument("--socket", default=os.getenv("INFERENCE_SOCKET", DEFAULT_SOCKET))
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # The service must own the model, never forward to another service
+    os.environ.pop("INFERENCE_SOCKET", None)
+    if args.threads:
+        import torch
+
+        torch.set_num_threads(args.threads)
+
+    try:
+        asyncio.run(serve(args.socket, args.max_batch, args.max_wait_ms))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
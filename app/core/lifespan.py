@@ -0,0 +1,68 @@
+"""
+Application lifespan: background model loading and warm-up, the
+write-behind AI log writer (started here, drained on shutdown), the
+live camera preview batcher and the span exporter (flushed on shutdown).
+
+The server starts accepting requests immediately; the classifier is loaded
+and warmed up in a worker thread so the first camera user does not pay for
+weight loading and first-run kernel selection. ``/health/ready`` reports the
+progress through ``predictor.status()``.
+"""
+
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+# false: load the model on the first camera request instead of at startup
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+
+
+def _warmup_batch_sizes() -> tuple:
+    raw = os.getenv("MODEL_WARMUP_BATCH_SIZES", "1")
+    sizes = []
+    for part in raw.split(","):
+        try:
+            size = int(part)
+        except ValueError:
+            continue
+        if size > 0:
+            sizes.append(size)
+    return tuple(sizes) or (1,)
+
+
+def _warm_model() -> None:
+    # Imported here so torch is only pulled in by the background thread
+    from app.core.ai_predictor import predictor
+
+    if predictor.warmup(_warmup_batch_sizes()):
+        logger.info("AI model ready: %s", predictor.status())
+    else:
+        logger.warning("AI model unavailable: %s", predictor.status())
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if MODEL_WARMUP:
+        # Daemon thread: a slow load never blocks startup or shutdown
+        threading.Thread(target=_warm_model, name="model-warmup", daemon=True).start()
+
+    from app.core.ai_predictor import predictor
+    from app.core import cache, tracing
+    from app.core.live_preview import live_preview_engine
+    from app.core.replicas import replica_set
+    from app.services.ai_log_service import ai_log_writer
+
+    ai_log_writer.start()
+    live_preview_engine.start(predictor)
+    replica_set.start()
+    try:
+        yield
+    finally:
+        await live_preview_engine.stop()
+        replica_set.stop()
+        ai_log_writer.stop()
+        tracing.processor.shutdown()
+        cache.close_backend()
@@ -0,0 +1,176 @@
+"""
+Live camera preview: low-rate frames over a WebSocket, smoothed best guess back.
+
+The camera page streams small JPEG frames while the user frames the dish.
+Frames go through their own ``BatchingEngine`` (one thread, micro-batches
+across all live connections), separate from the upload path, so previews
+never queue in front of a real prediction. Three limits keep them cheap:
+
+* each connection has a token bucket of ``LIVE_PREVIEW_FPS`` frames/second;
+* a connection has at most one frame in flight, newer frames replace the
+  waiting one (frame skipping: only the latest view matters);
+* frames are dropped when ``LIVE_PREVIEW_MAX_PENDING`` frames from all
+  connections are already waiting for the model.
+
+Per-frame probabilities are smoothed with an exponential moving average so
+the label shown does not flicker between frames.
+"""
+
+import asyncio
+import os
+import time
+from typing import Optional
+
+from app.core.inference_service import BatchingEngine
+
+LIVE_PREVIEW_FPS = float(os.getenv("LIVE_PREVIEW_FPS", "2"))
+LIVE_PREVIEW_MAX_PENDING = int(os.getenv("LIVE_PREVIEW_MAX_PENDING", "8"))
+LIVE_PREVIEW_MAX_FRAME_BYTES = 128 * 1024
+# Weight of the newest frame in the moving average
+LIVE_PREVIEW_SMOOTHING = 0.4
+# Consecutive frames with the same best label before it is reported stable
+STABLE_FRAMES = 3
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class ProbabilitySmoother:
+    """Exponential moving average over sparse top-k probability vectors."""
+
+    def __init__(self, alpha: float = LIVE_PREVIEW_SMOOTHING, min_score: float = 0.01):
+        self.alpha = alpha
+        self.min_score = min_score
+        self.scores = {}
+        self._best = None
+        self._streak = 0
+
+    def update(self, top_k: list) -> Optional[dict]:
+        frame = dict(top_k)
+        # The first frame starts the average instead of being damped towards zero
+        alpha = self.alpha if self.scores else 1.0
+        for label in set(self.scores) | set(frame):
+            score = (1 - alpha) * self.scores.get(label, 0.0) + alpha * frame.get(label, 0.0)
+            if score >= self.min_score:
+                self.scores[label] = score
+            else:
+                self.scores.pop(label, None)
+        if not self.scores:
+            return None
+
+        label, score = max(self.scores.items(), key=lambda item: item[1])
+        self._streak = self._streak + 1 if label == self._best else 1
+        self._best = label
+        return {
+            "label": label,
+            "confidence": round(score, 4),
+            "stable": self._streak >= STABLE_FRAMES,
+        }
+
+
+class LivePreviewEngine:
+    """Shared micro-batcher for preview frames of all connections."""
+
+    def __init__(self, max_pending: int = LIVE_PREVIEW_MAX_PENDING, max_batch: int = 4):
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self._engine = None
+        self._task = None
+        self.frames = 0
+        self.dropped = 0
+
+    def start(self, classifier) -> None:
+        if self._task is not None:
+            return
+        self._engine = BatchingEngine(
+            classifier,
+            max_batch=self.max_batch,
+            max_wait_ms=20.0,
+            batch_fn=lambda images: classifier.predict_topk_batch(images, k=5),
+        )
+        self._task = asyncio.create_task(self._engine.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def predict(self, frame: bytes) -> Optional[list]:
+        """Top-k probabilities of the frame, or None when the model is saturated."""
+        if self._engine is None or self._engine.pending >= self.max_pending:
+            self.dropped += 1
+            return None
+        self.frames += 1
+        return await self._engine.predict(frame)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "pending": self._engine.pending if self._engine else 0,
+            "batches": self._engine.batches if self._engine else 0,
+        }
+
+
+class LivePreviewSession:
+    """Per-connection state: rate limit, latest-frame slot and smoother."""
+
+    def __init__(self, engine: LivePreviewEngine, fps: float = LIVE_PREVIEW_FPS):
+        self.engine = engine
+        self.bucket = TokenBucket(rate=fps, burst=max(1.0, fps))
+        self.smoother = ProbabilitySmoother()
+        self._latest = None
+        self._ready = asyncio.Event()
+        self.received = 0
+        self.skipped = 0
+
+    def offer(self, frame: bytes) -> None:
+        """Accept a frame from the socket; rate-limited or superseded frames are skipped."""
+        self.received += 1
+        if len(frame) > LIVE_PREVIEW_MAX_FRAME_BYTES or not self.bucket.try_acquire():
+            self.skipped += 1
+            return
+        if self._latest is not None:
+            self.skipped += 1
+        self._latest = frame
+        self._ready.set()
+
+    async def next_frame(self) -> bytes:
+        await self._ready.wait()
+        self._ready.clear()
+        frame, self._latest = self._latest, None
+        return frame
+
+    async def process(self, frame: bytes) -> Optional[dict]:
+        top_k = await self.engine.predict(frame)
+        if top_k is None:
+            self.skipped += 1
+            return None
+        return self.smoother.update(top_k)
+
+
+live_preview_engine = LivePreviewEngine()
@@ -0,0 +1,400 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+A small, dependency-free registry of counters, gauges and histograms with
+labels, an ASGI middleware recording per-route request counts, latencies
+and in-flight requests, and ``timed_methods`` for timing repository
+methods. ``render()`` produces the body of ``GET /metrics``, which only
+answers ``scrape_allowed`` requests: it reveals routes, traffic and
+replica state.
+
+Recording is a dict lookup, a ``bisect`` and a short lock per sample, so it
+stays negligible next to the request it measures. Values are per process:
+with several workers, let Prometheus scrape each one (or aggregate by
+instance).
+"""
+
+import functools
+import hmac
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Bearer token required to scrape /metrics; unset = loopback clients only
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Seconds; covers a template render (ms) up to a slow CPU forward pass
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, the +Inf bucket last
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def totals(self) -> dict:
+        """Label values -> (sum, count) of every series."""
+        with self._lock:
+            return {key: (series[1], series[2]) for key, series in self._values.items()}
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, ([*s[0]], s[1], s[2])) for key, s in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip((*self.buckets, float("inf")), counts):
+                cumulative += n
+                le = 'le="{}"'.format(_format_value(bound))
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        # Called at scrape time for values owned elsewhere (e.g. cache stats)
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, list]]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable) -> None:
+        """
+        ``collector()`` yields (name, kind, help, [(labels dict, value)]);
+        counters are given without the ``_total`` suffix.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.collect())
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                sample_name = f"{name}_total" if kind == "counter" else name
+                for labels, value in samples:
+                    formatted = _format_labels(list(labels), list(labels.values()))
+                    lines.append(f"{sample_name}{formatted} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.register(
+    Counter("http_requests", "HTTP requests by route template, method and status", ["method", "route", "status"])
+)
+HTTP_LATENCY = registry.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency by route template", ["method", "route"])
+)
+HTTP_IN_FLIGHT = registry.register(
+    Gauge("http_requests_in_progress", "HTTP requests currently being served", ["method"])
+)
+MODEL_INFERENCE = registry.register(
+    Histogram("model_inference_seconds", "Forward pass time of the food classifier", ["op"])
+)
+MODEL_IMAGES = registry.register(
+    Counter("model_images", "Images run through the food classifier", ["op"])
+)
+IMAGE_DECODE = registry.register(
+    Histogram(
+        "image_decode_seconds",
+        "Image decode and preprocessing time per batch",
+        buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+    )
+)
+CLOUDINARY_UPLOAD = registry.register(
+    Histogram("cloudinary_upload_seconds", "Image upload time to Cloudinary", ["outcome"])
+)
+DB_QUERY = registry.register(
+    Histogram(
+        "db_query_seconds",
+        "Repository method time, including the queries it runs",
+        ["repository", "method"],
+        buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+    )
+)
+
+DB_READS = registry.register(
+    Counter(
+        "db_routed_reads",
+        "Read-only repository statements by target and routing reason",
+        ["target", "reason"],
+    )
+)
+
+
+def _http_cache_metrics():
+    from app.core import http_cache
+
+    snapshot = http_cache.stats.snapshot()
+    yield (
+        "http_cache_requests",
+        "counter",
+        "ETag cache lookups by path prefix and result",
+        [
+            ({"prefix": prefix, "result": result}, counts[f"{result}s"])
+            for prefix, counts in sorted(snapshot.items())
+            for result in ("hit", "miss")
+        ],
+    )
+    yield (
+        "http_cache_hit_ratio",
+        "gauge",
+        "Share of ETag cache lookups answered with 304",
+        [({"prefix": prefix}, counts["hit_rate"]) for prefix, counts in sorted(snapshot.items())],
+    )
+
+
+registry.add_collector(_http_cache_metrics)
+
+
+def _app_cache_metrics():
+    from app.core import cache
+
+    snapshot = cache.stats.snapshot()
+    yield (
+        "cache_requests",
+        "counter",
+        "Data cache lookups by namespace and result (hit, miss, coalesced, error)",
+        [
+            ({"namespace": namespace, "result": result}, counts[key])
+            for namespace, counts in sorted(snapshot.items())
+            for result, key in (("hit", "hits"), ("miss", "misses"), ("coalesced", "coalesced"), ("error", "errors"))
+        ],
+    )
+    yield (
+        "cache_hit_ratio",
+        "gauge",
+        "Share of data cache lookups served without running the query",
+        [({"namespace": namespace}, counts["hit_rate"]) for namespace, counts in sorted(snapshot.items())],
+    )
+    backend = cache.get_backend()
+    if isinstance(backend, cache.MemoryBackend):
+        yield ("cache_entries", "gauge", "Entries held by this worker's in-memory data cache", [({}, backend.size())])
+
+
+registry.add_collector(_app_cache_metrics)
+
+
+def _replica_metrics():
+    from app.core.replicas import replica_set
+
+    if not replica_set.enabled:
+        return
+    status = replica_set.status()
+    yield (
+        "db_replica_lag_seconds",
+        "gauge",
+        "Replay lag of each read replica (absent when unreachable)",
+        [({"replica": r["name"]}, r["lag_seconds"]) for r in status if r["lag_seconds"] is not None],
+    )
+    yield (
+        "db_replica_healthy",
+        "gauge",
+        "1 when the replica receives reads, 0 when skipped (lagging or down)",
+        [({"replica": r["name"]}, int(r["healthy"])) for r in status],
+    )
+
+
+registry.add_collector(_replica_metrics)
+
+
+def timed_methods(cls):
+    """
+    Class decorator recording every public method in ``db_query_seconds``.
+
+    Generator methods (streamed queries) are left alone: timing them would
+    only measure the creation of the generator.
+    """
+    repository = cls.__name__
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.isfunction(method):
+            continue
+        if inspect.isgeneratorfunction(method):
+            continue
+        setattr(cls, name, _timed(method, repository, name))
+    return cls
+
+
+def _timed(method, repository: str, name: str):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            DB_QUERY.observe(time.perf_counter() - started, repository=repository, method=name)
+
+    return wrapper
+
+
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+def scrape_allowed(authorization: str, client_host: str, token: str = METRICS_TOKEN) -> bool:
+    """
+    True when a ``/metrics`` request may read the registry: it carries
+    ``Authorization: Bearer <METRICS_TOKEN>``, or no token is configured and
+    it comes from this machine (a sidecar scraper or ``curl`` on the host).
+    """
+    if token:
+        scheme, _, credentials = (authorization or "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(credentials.strip().encode(), token.encode())
+    return client_host in LOOPBACK_HOSTS
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request count, latency and in-flight gauge."""
+
+    def __init__(self, app, enabled: bool = METRICS_ENABLED):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method=method)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec(method=method)
+            # The route template, not the raw path, keeps the label set bounded;
+            # 404s and ETag 304s are answered before any route matched
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unrouted"
+            HTTP_LATENCY.observe(time.perf_counter() - started, method=method, route=template)
+            HTTP_REQUESTS.inc(method=method, route=template, status=status)
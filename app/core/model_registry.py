@@ -0,0 +1,296 @@
+"""
+Model registry: versioned classifier weights on disk.
+
+Layout (``MODEL_REGISTRY_DIR``, default ``model_registry``)::
+
+    versions/<version>/model.pth
+    versions/<version>/labels.txt
+    versions/<version>/metadata.json
+    active.json          {"version": "..."}
+    shadow.json          {"version": "...", "sample_rate": 0.1}
+    shadow_log.jsonl     one line per shadowed prediction
+
+The pointer files are replaced atomically, and every worker (and the
+inference service) polls their mtime, so ``activate`` hot-swaps the model
+on all processes of the host without a restart. When the registry has no
+active version the classifier keeps loading ``food_model.pth`` /
+``labels.txt`` from the working directory as before.
+
+Usage:
+    python -m app.core.model_registry list
+    python -m app.core.model_registry register <version> --model food_model.pth --labels labels.txt [--activate]
+    python -m app.core.model_registry activate <version>
+    python -m app.core.model_registry shadow <version> [--rate 0.1] | shadow --off
+    python -m app.core.model_registry report [--limit 10000]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import time
+from typing import List, Optional
+
+REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "model_registry")
+VERSIONS_DIR = "versions"
+ACTIVE_FILE = "active.json"
+SHADOW_FILE = "shadow.json"
+SHADOW_LOG = "shadow_log.jsonl"
+MODEL_FILE = "model.pth"
+LABELS_FILE = "labels.txt"
+METADATA_FILE = "metadata.json"
+
+
+class ModelVersion:
+    """A registered set of weights + labels."""
+
+    def __init__(self, version: str, path: str, metadata: Optional[dict] = None):
+        self.version = version
+        self.path = path
+        self.metadata = metadata or {}
+
+    @property
+    def model_path(self) -> str:
+        return os.path.join(self.path, MODEL_FILE)
+
+    @property
+    def labels_path(self) -> str:
+        return os.path.join(self.path, LABELS_FILE)
+
+    def to_dict(self) -> dict:
+        return {"version": self.version, "path": self.path, "metadata": self.metadata}
+
+
+class ModelRegistry:
+    def __init__(self, root: str = REGISTRY_DIR):
+        self.root = root
+
+    def _path(self, *parts: str) -> str:
+        return os.path.join(self.root, *parts)
+
+    def _read_json(self, name: str) -> Optional[dict]:
+        try:
+            with open(self._path(name), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_json(self, name: str, data: dict) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._path(f".{name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        # Readers see either the old or the new pointer, never a partial file
+        os.replace(tmp_path, self._path(name))
+
+    def get(self, version: str) -> Optional[ModelVersion]:
+        path = self._path(VERSIONS_DIR, version)
+        if not os.path.isfile(os.path.join(path, MODEL_FILE)):
+            return None
+        try:
+            with open(os.path.join(path, METADATA_FILE), encoding="utf-8") as f:
+                metadata = json.load(f)
+        except (FileNotFoundError, ValueError):
+            metadata = {}
+        return ModelVersion(version, path, metadata)
+
+    def list_versions(self) -> List[ModelVersion]:
+        try:
+            names = sorted(os.listdir(self._path(VERSIONS_DIR)))
+        except FileNotFoundError:
+            return []
+        return [v for v in (self.get(name) for name in names) if v is not None]
+
+    def register(
+        self,
+        version: str,
+        model_path: str,
+        labels_path: str,
+        metadata: Optional[dict] = None,
+    ) -> ModelVersion:
+        """Copy weights and labels into the registry under a new version."""
+        if not version or os.sep in version or version.startswith("."):
+            raise ValueError(f"Invalid version name: {version!r}")
+        target = self._path(VERSIONS_DIR, version)
+        if os.path.exists(target):
+            raise ValueError(f"Version already registered: {version}")
+
+        # Build in a temporary directory so a crash never leaves a half version
+        staging = self._path(VERSIONS_DIR, f".{version}.{os.getpid()}.tmp")
+        os.makedirs(staging)
+        try:
+            shutil.copyfile(model_path, os.path.join(staging, MODEL_FILE))
+            shutil.copyfile(labels_path, os.path.join(staging, LABELS_FILE))
+            metadata = {
+                **(metadata or {}),
+                "registered_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "source": os.path.abspath(model_path),
+            }
+            with open(os.path.join(staging, METADATA_FILE), "w", encoding="utf-8") as f:
+                json.dump(metadata, f, indent=2)
+            os.rename(staging, target)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return ModelVersion(version, target, metadata)
+
+    def active(self) -> Optional[ModelVersion]:
+        pointer = self._read_json(ACTIVE_FILE)
+        if not pointer:
+            return None
+        return self.get(pointer.get("version", ""))
+
+    def activate(self, version: str) -> ModelVersion:
+        model_version = self.get(version)
+        if model_version is None:
+            raise ValueError(f"Unknown model version: {version}")
+        self._write_json(ACTIVE_FILE, {"version": version, "activated_at": time.time()})
+        return model_version
+
+    def shadow(self) -> Optional[dict]:
+        """Shadow configuration: {"model": ModelVersion, "sample_rate": float}."""
+        pointer = self._read_json(SHADOW_FILE)
+        if not pointer or not pointer.get("version"):
+            return None
+        model_version = self.get(pointer["version"])
+        if model_version is None:
+            return None
+        return {"model": model_version, "sample_rate": float(pointer.get("sample_rate", 0.0))}
+
+    def set_shadow(self, version: Optional[str], sample_rate: float = 0.1) -> None:
+        """Shadow ``version`` on ``sample_rate`` of the traffic, None disables."""
+        if version is None:
+            self._write_json(SHADOW_FILE, {"version": None})
+            return
+        if self.get(version) is None:
+            raise ValueError(f"Unknown model version: {version}")
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self._write_json(SHADOW_FILE, {"version": version, "sample_rate": sample_rate})
+
+    def pointers_mtime(self) -> int:
+        """Changes whenever the active or shadow pointer is rewritten."""
+        latest = 0
+        for name in (ACTIVE_FILE, SHADOW_FILE):
+            try:
+                latest = max(latest, os.stat(self._path(name)).st_mtime_ns)
+            except FileNotFoundError:
+                continue
+        return latest
+
+    def record_shadow(self, entry: dict) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        # A single O_APPEND write per line keeps concurrent writers from interleaving
+        with open(self._path(SHADOW_LOG), "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def read_shadow_log(self, limit: int = 10000) -> List[dict]:
+        try:
+            with open(self._path(SHADOW_LOG), encoding="utf-8") as f:
+                lines = f.readlines()[-limit:]
+        except FileNotFoundError:
+            return []
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
+
+
+def _latency_summary(samples: List[float]) -> Optional[dict]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        "mean_ms": round(statistics.mean(ordered), 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 2),
+    }
+
+
+def summarize_shadow_log(entries: List[dict]) -> dict:
+    """Agreement and latency of primary vs candidate, per candidate version."""
+    by_pair = {}
+    for entry in entries:
+        key = (entry.get("primary_version"), entry.get("candidate_version"))
+        by_pair.setdefault(key, []).append(entry)
+
+    summaries = []
+    for (primary, candidate), rows in sorted(by_pair.items(), key=lambda kv: str(kv[0])):
+        agreed = sum(1 for r in rows if r.get("primary_label") == r.get("candidate_label"))
+        summaries.append(
+            {
+                "primary_version": primary,
+                "candidate_version": candidate,
+                "samples": len(rows),
+                "agreement": round(agreed / len(rows), 4),
+                "primary_latency": _latency_summary(
+                    [r["primary_ms"] for r in rows if r.get("primary_ms") is not None]
+                ),
+                "candidate_latency": _latency_summary(
+                    [r["candidate_ms"] for r in rows if r.get("candidate_ms") is not None]
+                ),
+            }
+        )
+    return {"comparisons": summaries}
+
+
+registry = ModelRegistry()
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Manage classifier model versions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+    register = sub.add_parser("register")
+    register.add_argument("version")
+    register.add_argument("--model", default="food_model.pth")
+    register.add_argument("--labels", default="labels.txt")
+    register.add_argument("--note", default=None)
+    register.add_argument("--activate", action="store_true")
+    activate = sub.add_parser("activate")
+    activate.add_argument("version")
+    shadow = sub.add_parser("shadow")
+    shadow.add_argument("version", nargs="?")
+    shadow.add_argument("--rate", type=float, default=0.1)
+    shadow.add_argument("--off", action="store_true")
+    report = sub.add_parser("report")
+    report.add_argument("--limit", type=int, default=10000)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        active = registry.active()
+        shadow_config = registry.shadow()
+        for v in registry.list_versions():
+            marks = []
+            if active and active.version == v.version:
+                marks.append("active")
+            if shadow_config and shadow_config["model"].version == v.version:
+                marks.append(f"shadow {shadow_config['sample_rate']:.0%}")
+            print(f"{v.version:<30}{', '.join(marks)}")
+    elif args.command == "register":
+        metadata = {"note": args.note} if args.note else {}
+        v = registry.register(args.version, args.model, args.labels, metadata)
+        print(f"Registered {v.version} at {v.path}")
+        if args.activate:
+            registry.activate(v.version)
+            print(f"Activated {v.version}")
+    elif args.command == "activate":
+        registry.activate(args.version)
+        print(f"Activated {args.version}")
+    elif args.command == "shadow":
+        if args.off or not args.version:
+            registry.set_shadow(None)
+            print("Shadow evaluation disabled")
+        else:
+            registry.set_shadow(args.version, args.rate)
+            print(f"Shadowing {args.version} on {args.rate:.0%} of predictions")
+    elif args.command == "report":
+        print(json.dumps(summarize_shadow_log(registry.read_shadow_log(args.limit)), indent=2))
+
+
+if __name__ == "__main__":
+    _main()
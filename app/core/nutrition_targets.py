@@ -0,0 +1,252 @@
+"""
+Precomputed daily targets (BMI, BMR, TDEE, calories and macros) per user.
+
+Targets are computed from each user's latest health status, date of birth
+and gender with the Mifflin-St Jeor equation, an activity multiplier and a
+fixed macro split, for a whole batch of users at once as NumPy arrays, and
+written to ``nutrition_targets`` with one bulk upsert per batch. The
+dashboard and the diary read that table instead of recomputing anything.
+
+A stored row is stale, and recomputed by the incremental run, when:
+
+* the user has a newer health status (weight, height, activity level, or
+  the dob / gender set with it during onboarding);
+* the user's birthday has passed (``valid_until``), changing the age;
+* ``FORMULA_VERSION`` changed: bump it whenever a constant below changes.
+
+Health updates recompute the user right away (``recompute_users``); run the
+incremental job daily for birthdays, and once after a formula change::
+
+    python -m app.core.nutrition_targets recompute [--all] [--batch-size 5000]
+"""
+
+import argparse
+import logging
+import time
+from datetime import date
+from typing import Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import and_, func, or_, select
+
+from app.models.health_status import ActivityLevelEnum, HealthStatus
+from app.models.nutrition_targets import NutritionTarget
+from app.models.user import GenderEnum, User
+
+logger = logging.getLogger(__name__)
+
+FORMULA_VERSION = 1
+
+ACTIVITY_MULTIPLIERS = {
+    ActivityLevelEnum.Sedentary: 1.2,
+    ActivityLevelEnum.Light: 1.375,
+    ActivityLevelEnum.Moderate: 1.55,
+    ActivityLevelEnum.Active: 1.725,
+    ActivityLevelEnum.VeryActive: 1.9,
+}
+# Share of the calorie target per macro (Vietnamese dietary guidelines)
+MACRO_SPLIT = {"protein": 0.15, "carbs": 0.60, "fat": 0.25}
+KCAL_PER_GRAM = {"protein": 4.0, "carbs": 4.0, "fat": 9.0}
+
+MIN_AGE, MAX_AGE = 1, 120
+# Safety floors for children and very small adults
+MIN_BMR = 800.0
+MIN_TDEE = 1000.0
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def _dates(years, months, days) -> np.ndarray:
+    # Feb 29 of a non-leap year rolls over to Mar 1
+    return (
+        (years - 1970).astype("datetime64[Y]")
+        + (months - 1).astype("timedelta64[M]")
+        + (days - 1).astype("timedelta64[D]")
+    )
+
+
+def ages_on(dobs: Iterable[date], today: date):
+    """
+    Ages on ``today`` of people born on ``dobs``, and the date each age
+    changes (the next birthday), as arrays.
+    """
+    dobs = list(dobs)
+    years = np.fromiter((d.year for d in dobs), np.int64, len(dobs))
+    months = np.fromiter((d.month for d in dobs), np.int64, len(dobs))
+    days = np.fromiter((d.day for d in dobs), np.int64, len(dobs))
+    today64 = np.datetime64(today, "D")
+    birthday_this_year = _dates(np.full_like(years, today.year), months, days)
+    upcoming = birthday_this_year > today64
+    ages = today.year - years - upcoming
+    next_birthday = np.where(upcoming, birthday_this_year, _dates(np.full_like(years, today.year + 1), months, days))
+    return ages, next_birthday
+
+
+def compute_targets(weight_kg, height_cm, age, is_male, multiplier) -> dict:
+    """
+    Targets for arrays (or scalars) of inputs, element-wise.
+
+    Weights and heights must be positive. Returns arrays keyed like the
+    ``nutrition_targets`` columns.
+    """
+    weight_kg = np.asarray(weight_kg, dtype=np.float64)
+    height_cm = np.asarray(height_cm, dtype=np.float64)
+    age = np.clip(np.asarray(age, dtype=np.float64), MIN_AGE, MAX_AGE)
+
+    bmi = np.round(weight_kg / (height_cm / 100) ** 2, 2)
+    # Mifflin-St Jeor
+    bmr = 10 * weight_kg + 6.25 * height_cm - 5 * age + np.where(is_male, 5.0, -161.0)
+    bmr = np.maximum(bmr, MIN_BMR)
+    tdee = np.maximum(np.round(bmr * np.asarray(multiplier, dtype=np.float64), 2), MIN_TDEE)
+    calories = np.rint(tdee).astype(np.int64)
+    targets = {"bmi": bmi, "bmr": np.round(bmr, 2), "tdee": tdee, "calories": calories}
+    for macro, share in MACRO_SPLIT.items():
+        targets[f"{macro}_g"] = np.round(calories * share / KCAL_PER_GRAM[macro], 1)
+    return targets
+
+
+def _inputs_query(today: date, full: bool, user_ids: List[int] = None, start: int = None, stop: int = None):
+    """Users ``user_ids`` (or ids in [start, stop)) with their latest health status."""
+    if user_ids is not None:
+        user_filter, health_filter = User.id.in_(user_ids), HealthStatus.user_id.in_(user_ids)
+    else:
+        user_filter = and_(User.id >= start, User.id < stop)
+        health_filter = and_(HealthStatus.user_id >= start, HealthStatus.user_id < stop)
+    latest = (
+        select(
+            HealthStatus.id,
+            HealthStatus.user_id,
+            HealthStatus.weight_kg,
+            HealthStatus.height_cm,
+            HealthStatus.activity_level,
+            func.row_number()
+            .over(
+                partition_by=HealthStatus.user_id,
+                order_by=(HealthStatus.updated_at.desc(), HealthStatus.id.desc()),
+            )
+            .label("rank"),
+        )
+        .where(health_filter)
+        .subquery()
+    )
+    query = (
+        select(
+            User.id,
+            User.dob,
+            User.gender,
+            latest.c.id,
+            latest.c.weight_kg,
+            latest.c.height_cm,
+            latest.c.activity_level,
+        )
+        .join(latest, and_(latest.c.user_id == User.id, latest.c.rank == 1))
+        .outerjoin(NutritionTarget, NutritionTarget.user_id == User.id)
+        .where(user_filter)
+    )
+    if not full:
+        query = query.where(
+            or_(
+                NutritionTarget.user_id.is_(None),
+                NutritionTarget.health_status_id != latest.c.id,
+                NutritionTarget.formula_version != FORMULA_VERSION,
+                NutritionTarget.valid_until <= today,
+            )
+        )
+    return query
+
+
+def _target_rows(inputs: list, today: date) -> List[dict]:
+    """Compute the ``nutrition_targets`` rows of one batch of inputs."""
+    if not inputs:
+        return []
+    user_ids, dobs, genders, health_ids, weights, heights, levels = zip(*inputs)
+    count = len(inputs)
+    weight = np.fromiter((float(w) for w in weights), np.float64, count)
+    height = np.fromiter((float(h) for h in heights), np.float64, count)
+    is_male = np.fromiter((g == GenderEnum.Male for g in genders), bool, count)
+    multiplier = np.fromiter(
+        (ACTIVITY_MULTIPLIERS.get(level, ACTIVITY_MULTIPLIERS[ActivityLevelEnum.Sedentary]) for level in levels),
+        np.float64,
+        count,
+    )
+    ages, valid_until = ages_on(dobs, today)
+
+    valid = (weight > 0) & (height > 0)
+    if not valid.all():
+        logger.warning("Skipping %d users with a non-positive weight or height", int((~valid).sum()))
+    targets = compute_targets(weight[valid], height[valid], ages[valid], is_male[valid], multiplier[valid])
+
+    columns = {
+        "user_id": np.asarray(user_ids)[valid].tolist(),
+        "health_status_id": np.asarray(health_ids)[valid].tolist(),
+        "valid_until": valid_until[valid].tolist(),
+        "age": np.clip(ages[valid], MIN_AGE, MAX_AGE).tolist(),
+        **{name: values.tolist() for name, values in targets.items()},
+    }
+    names = list(columns)
+    return [
+        {"formula_version": FORMULA_VERSION, **dict(zip(names, values))}
+        for values in zip(*columns.values())
+    ]
+
+
+def recompute_users(db, user_ids: List[int], today: Optional[date] = None) -> int:
+    """Recompute the targets of ``user_ids`` now, stale or not."""
+    from app.repositories.nutrition_target_repository import NutritionTargetRepository
+
+    today = today or date.today()
+    inputs = db.execute(_inputs_query(today, full=True, user_ids=list(user_ids))).all()
+    return NutritionTargetRepository(db).upsert_many(_target_rows(inputs, today))
+
+
+def recompute(db, full: bool = False, batch_size: int = DEFAULT_BATCH_SIZE, today: Optional[date] = None) -> dict:
+    """
+    Recompute stale targets (every user's with ``full``) over user id ranges
+    of ``batch_size``, one query, one bulk upsert and one commit per range.
+    """
+    from app.repositories.nutrition_target_repository import NutritionTargetRepository
+
+    today = today or date.today()
+    repo = NutritionTargetRepository(db)
+    report = {"batches": 0, "users": 0, "seconds": 0.0}
+    started = time.monotonic()
+    low, high = db.execute(select(func.min(User.id), func.max(User.id))).one()
+    if low is None:
+        return report
+    for start in range(low, high + 1, batch_size):
+        inputs = db.execute(_inputs_query(today, full, start=start, stop=start + batch_size)).all()
+        report["users"] += repo.upsert_many(_target_rows(inputs, today))
+        report["batches"] += 1
+        # upsert_many commits; a range with nothing stale still ends its read transaction
+        db.commit()
+    report["seconds"] = round(time.monotonic() - started, 3)
+    logger.info("Nutrition targets: %(users)d users in %(batches)d batches (%(seconds).1fs)", report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("recompute", help="Recompute stale targets")
+    run.add_argument("--all", action="store_true", help="Recompute every user, stale or not")
+    run.add_argument("--user-id", type=int, action="append", help="Only these users (repeatable)")
+    run.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    import app.models  # noqa: F401  (configures every mapper)
+    from app.core.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.user_id:
+            print(f"Recomputed {recompute_users(db, args.user_id)} users")
+        else:
+            report = recompute(db, full=args.all, batch_size=args.batch_size)
+            print(f"Recomputed {report['users']} users in {report['batches']} batches ({report['seconds']}s)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
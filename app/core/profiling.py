@@ -0,0 +1,192 @@
+"""
+On-demand profiling of a running worker (used by the ``/admin/profile`` routes).
+
+Nothing runs until an admin asks for a profile, so the idle cost is zero.
+
+* ``sample_cpu`` samples the stacks of every thread with
+  ``sys._current_frames()`` at a fixed interval for a bounded duration and
+  aggregates them into the "collapsed" format (``frame;frame;frame count``)
+  read by flamegraph.pl, speedscope and most flame graph viewers.
+* ``memory_diff`` turns ``tracemalloc`` on for a bounded window (unless it
+  already was), and reports what was allocated between the two snapshots,
+  as the top allocation sites and as collapsed stacks weighted by bytes.
+* ``torch_stats`` reports torch threading and memory without importing
+  torch when the worker has not loaded it.
+
+Only one CPU profile and one memory capture run at a time per worker.
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+MAX_PROFILE_SECONDS = 60.0
+MIN_INTERVAL_SECONDS = 0.001
+
+# Innermost Python frames of a thread that is blocked rather than running
+_WAITING_FUNCTIONS = {
+    "wait", "sleep", "select", "poll", "accept", "_wait_for_tstate_lock", "recv", "recv_into",
+}
+
+_cpu_lock = threading.Lock()
+_memory_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """A profile of the same kind is already running in this worker."""
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame, thread_name: str) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+def sample_cpu(seconds: float = 10.0, interval: float = 0.01, idle: bool = False) -> dict:
+    """
+    Sample all thread stacks for ``seconds`` (capped at ``MAX_PROFILE_SECONDS``).
+
+    Threads parked in a wait (lock, sleep, select) are skipped unless
+    ``idle`` is set, so the output shows where CPU time goes.
+
+    Returns:
+        {"collapsed": "stack count\\n...", "samples", "seconds", "interval", "pid"}
+    """
+    seconds = min(max(seconds, interval), MAX_PROFILE_SECONDS)
+    interval = max(interval, MIN_INTERVAL_SECONDS)
+    if not _cpu_lock.acquire(blocking=False):
+        raise ProfilerBusy("A CPU profile is already running in this worker")
+    try:
+        own_id = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if not idle and frame.f_code.co_name in _WAITING_FUNCTIONS:
+                    continue
+                stacks[_collapse(frame, names.get(thread_id, f"thread-{thread_id}"))] += 1
+            samples += 1
+            time.sleep(interval)
+    finally:
+        _cpu_lock.release()
+
+    collapsed = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+    return {
+        "collapsed": collapsed,
+        "samples": samples,
+        "seconds": seconds,
+        "interval": interval,
+        "pid": os.getpid(),
+    }
+
+
+def memory_diff(seconds: float = 10.0, top: int = 25, frames: int = 16) -> dict:
+    """
+    Allocations made during the next ``seconds`` that are still alive.
+
+    tracemalloc slows allocations down noticeably, so it is only enabled for
+    the capture window (and left as it was if it was already running).
+    """
+    seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+    if not _memory_lock.acquire(blocking=False):
+        raise ProfilerBusy("A memory capture is already running in this worker")
+    started_here = not tracemalloc.is_tracing()
+    try:
+        if started_here:
+            tracemalloc.start(frames)
+        before = tracemalloc.take_snapshot()
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        traced_current, traced_peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+        _memory_lock.release()
+
+    ignore = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ]
+    before = before.filter_traces(ignore)
+    after = after.filter_traces(ignore)
+
+    top_sites = [
+        {
+            "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_diff_bytes": stat.size_diff,
+            "count_diff": stat.count_diff,
+            "size_bytes": stat.size,
+        }
+        for stat in after.compare_to(before, "lineno")[:top]
+    ]
+
+    stacks = Counter()
+    for stat in after.compare_to(before, "traceback"):
+        if stat.size_diff <= 0:
+            continue
+        # Traceback frames are ordered oldest first, as flame graph tools expect
+        names = [f"{os.path.basename(f.filename)}:{f.lineno}" for f in stat.traceback]
+        stacks[";".join(names)] += stat.size_diff
+
+    return {
+        "seconds": seconds,
+        "pid": os.getpid(),
+        "traced_current_bytes": traced_current,
+        "traced_peak_bytes": traced_peak,
+        "top": top_sites,
+        "collapsed": "\n".join(f"{stack} {size}" for stack, size in stacks.most_common()),
+    }
+
+
+def torch_stats() -> dict:
+    """Torch threading / memory and classifier inference timings of this worker."""
+    from app.core.metrics import MODEL_INFERENCE
+
+    result = {
+        "pid": os.getpid(),
+        "threads": sorted(t.name for t in threading.enumerate()),
+        "torch_loaded": "torch" in sys.modules,
+    }
+    inference = {}
+    for (op,), (total, count) in MODEL_INFERENCE.totals().items():
+        inference[op] = {
+            "calls": count,
+            "seconds": round(total, 3),
+            "mean_ms": round(total * 1000 / count, 2) if count else None,
+        }
+    result["inference"] = inference
+
+    if not result["torch_loaded"]:
+        return result
+
+    torch = sys.modules["torch"]
+    result.update(
+        {
+            "version": torch.__version__,
+            "num_threads": torch.get_num_threads(),
+            "num_interop_threads": torch.get_num_interop_threads(),
+            "parallel_info": torch.__config__.parallel_info(),
+            "cuda_available": torch.cuda.is_available(),
+        }
+    )
+    if torch.cuda.is_available():
+        result["cuda"] = {
+            "allocated_bytes": torch.cuda.memory_allocated(),
+            "reserved_bytes": torch.cuda.memory_reserved(),
+            "max_allocated_bytes": torch.cuda.max_memory_allocated(),
+        }
+    return result
@@ -0,0 +1,258 @@
+"""
+Read-replica routing for the ORM session.
+
+Read-only repository methods (``get_*``, ``search_*``, marked by the
+``routed_methods`` class decorator) run on a replica from
+``DATABASE_REPLICA_URLS``; everything else (flushes, INSERT / UPDATE /
+DELETE, reads outside those methods, lazy loads) runs on the primary. With
+no replica configured every query goes to the primary, as before.
+
+Three rules keep reads consistent:
+
+* a background thread measures each replica's replay lag every
+  ``REPLICA_CHECK_SECONDS``; a replica lagging more than
+  ``REPLICA_MAX_LAG_SECONDS`` (or unreachable) is skipped until it catches
+  up, and with no usable replica reads fall back to the primary;
+* once a session has written, its later reads stay on the primary;
+* after a request that wrote, the response sets a short-lived cookie and
+  that browser's reads stay on the primary for ``READ_YOUR_WRITES_SECONDS``
+  (``ReadYourWritesMiddleware``), so a user sees their own meal in the
+  diary right after logging it.
+"""
+
+import functools
+import inspect
+import itertools
+import logging
+import os
+import threading
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+from app.core.metrics import DB_READS
+
+logger = logging.getLogger(__name__)
+
+DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "2"))
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+PRIMARY_COOKIE = "db_primary"
+
+READ_PREFIXES = ("get_", "search_")
+
+# Replay lag in seconds; 0 for an idle replica that has replayed everything
+# (and for a standalone copy that is not in recovery, e.g. a test instance)
+LAG_QUERY = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+_read_only: ContextVar[bool] = ContextVar("db_read_only", default=False)
+
+
+class RequestState:
+    """Per-request routing flags, shared with the threads the request uses."""
+
+    __slots__ = ("sticky", "wrote")
+
+    def __init__(self, sticky: bool = False):
+        self.sticky = sticky
+        self.wrote = False
+
+
+_request_state: ContextVar[Optional[RequestState]] = ContextVar("db_request_state", default=None)
+
+
+class Replica:
+    def __init__(self, url: str, name: str):
+        self.name = name
+        self.engine = create_engine(url, pool_pre_ping=True)
+        self.lag_seconds = None
+        self.healthy = False
+        self.error = None
+
+
+class ReplicaSet:
+    """Replica engines and their health, refreshed by a background thread."""
+
+    def __init__(self, urls: List[str], max_lag: float = REPLICA_MAX_LAG_SECONDS,
+                 check_interval: float = REPLICA_CHECK_SECONDS):
+        self.replicas = [Replica(url, f"replica{i}") for i, url in enumerate(urls)]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._cycle = itertools.cycle(self.replicas) if self.replicas else None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def check(self) -> None:
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    replica.lag_seconds = float(conn.execute(LAG_QUERY).scalar())
+                replica.error = None
+                healthy = replica.lag_seconds <= self.max_lag
+            except Exception as e:
+                replica.lag_seconds = None
+                replica.error = str(e)
+                healthy = False
+            if healthy != replica.healthy:
+                logger.warning(
+                    "%s is now %s (lag=%s, error=%s)",
+                    replica.name, "in use" if healthy else "skipped", replica.lag_seconds, replica.error,
+                )
+            replica.healthy = healthy
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None or not self.replicas:
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="replica-monitor", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self.check()
+            if self._stopping.wait(self.check_interval):
+                return
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def pick(self) -> Optional[Replica]:
+        """Next healthy replica (round robin), or None to use the primary."""
+        if self._thread is None:
+            # Replicas start unhealthy: reads use the primary until the first check
+            self.start()
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = next(self._cycle)
+                if replica.healthy:
+                    return replica
+        return None
+
+    def status(self) -> list:
+        return [
+            {"name": r.name, "healthy": r.healthy, "lag_seconds": r.lag_seconds, "error": r.error}
+            for r in self.replicas
+        ]
+
+
+replica_set = ReplicaSet(DATABASE_REPLICA_URLS)
+
+
+class RoutingSession(Session):
+    """Session choosing the primary (``bind``) or a replica per statement."""
+
+    def _mark_write(self) -> None:
+        self.info["wrote"] = True
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        primary = super().get_bind(mapper=mapper, clause=clause, **kw)
+        if not replica_set.enabled:
+            return primary
+        if self._flushing or isinstance(clause, UpdateBase):
+            self._mark_write()
+            return primary
+        if not _read_only.get() or self.info.get("wrote"):
+            return primary
+        state = _request_state.get()
+        if state is not None and state.sticky:
+            DB_READS.inc(target="primary", reason="read_your_writes")
+            return primary
+        replica = replica_set.pick()
+        if replica is None:
+            DB_READS.inc(target="primary", reason="no_replica")
+            return primary
+        DB_READS.inc(target=replica.name, reason="routed")
+        return replica.engine
+
+    def commit(self) -> None:
+        # Also covers writes sent as text() statements
+        if replica_set.enabled:
+            self._mark_write()
+        super().commit()
+
+
+def routed_methods(cls):
+    """
+    Class decorator running the read-only public methods (``get_*``,
+    ``search_*``) of a repository on a replica when one is usable.
+    """
+    for name, method in list(vars(cls).items()):
+        if not name.startswith(READ_PREFIXES) or not inspect.isfunction(method):
+            continue
+        if inspect.isgeneratorfunction(method):
+            continue
+        setattr(cls, name, _routed(method))
+    return cls
+
+
+def _routed(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        token = _read_only.set(True)
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _read_only.reset(token)
+
+    return wrapper
+
+
+def _has_cookie(scope, name: str) -> bool:
+    for key, value in scope.get("headers", []):
+        if key == b"cookie" and f"{name}=".encode() in value:
+            return True
+    return False
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware keeping a browser on the primary for a short while after
+    one of its requests wrote to the database.
+    """
+
+    def __init__(self, app, window_seconds: int = READ_YOUR_WRITES_SECONDS):
+        self.app = app
+        self.window_seconds = window_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not replica_set.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        state = RequestState(sticky=_has_cookie(scope, PRIMARY_COOKIE))
+        cookie = (
+            f"{PRIMARY_COOKIE}=1; Max-Age={self.window_seconds}; Path=/; HttpOnly; SameSite=Lax"
+        ).encode("latin-1")
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and state.wrote:
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie)]
+            await send(message)
+
+        token = _request_state.set(state)
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request_state.reset(token)
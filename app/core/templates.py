@@ -0,0 +1,133 @@
+"""
+Shared Jinja2 environment for all routers.
+
+Every router renders through the single ``templates`` object defined here,
+so each template is compiled once per process instead of once per router.
+Compiled bytecode is also written to disk, letting restarted workers skip
+compilation entirely; run ``python -m app.core.templates`` at build time to
+fill that cache ahead of the first request.
+
+The ``{% cache %}`` tag caches rendered fragments in memory::
+
+    {% cache 60, "admin_users", data_version() %} ... {% endcache %}
+
+The first argument is the time-to-live in seconds, the remaining ones form
+the cache key. Start the key with a fragment name and include everything
+the fragment depends on. Keep it for data-driven fragments that are costly
+to render (query results, tables); static markup renders faster than a
+cache lookup, and keys on ids or dates only fill the LRU with copies.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from app.core.assets import asset_url
+
+TEMPLATES_DIR = "app/templates"
+BYTECODE_CACHE_DIR = os.getenv(
+    "TEMPLATE_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "nutrition_tracker_jinja"),
+)
+FRAGMENT_CACHE_SIZE = 512
+
+
+class FragmentCache:
+    """Small thread-safe LRU of rendered fragments with per-entry TTL."""
+
+    def __init__(self, max_entries: int = FRAGMENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+fragment_cache = FragmentCache()
+
+
+class FragmentCacheExtension(Extension):
+    """Adds ``{% cache ttl, key... %}...{% endcache %}`` to templates."""
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_render_cached", [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, args, caller):
+        ttl, key_parts = args[0], args[1:]
+        key = tuple(str(p) for p in key_parts)
+        cached = fragment_cache.get(key)
+        if cached is not None:
+            return cached
+        rendered = caller()
+        fragment_cache.set(key, rendered, float(ttl))
+        return rendered
+
+
+def data_version() -> int:
+    """Global data version (bumped on admin writes), for fragment cache keys."""
+    from app.core.http_cache import versions
+
+    return versions.global_version()
+
+
+def _create_templates() -> Jinja2Templates:
+    os.makedirs(BYTECODE_CACHE_DIR, exist_ok=True)
+    instance = Jinja2Templates(directory=TEMPLATES_DIR)
+    env = instance.env
+    env.bytecode_cache = FileSystemBytecodeCache(BYTECODE_CACHE_DIR)
+    env.add_extension(FragmentCacheExtension)
+    env.globals["data_version"] = data_version
+    env.globals["asset_url"] = asset_url
+    return instance
+
+
+templates = _create_templates()
+
+
+def precompile_templates() -> int:
+    """Compile every template into the bytecode cache, returns the count."""
+    names = templates.env.list_templates(extensions=["html"])
+    for name in names:
+        templates.env.get_template(name)
+    return len(names)
+
+
+if __name__ == "__main__":
+    count = precompile_templates()
+    print(f"Precompiled {count} templates into {BYTECODE_CACHE_DIR}")
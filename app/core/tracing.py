@@ -0,0 +1,392 @@
+"""
+Lightweight request tracing with OpenTelemetry-compatible spans.
+
+Every sampled HTTP request gets a root span (``TracingMiddleware``) and
+child spans for the service and repository methods it calls
+(``traced_methods``) and for explicit stages such as image decode, the
+forward pass or the Cloudinary upload (``span``). Trace and span ids follow
+the W3C Trace Context format, an incoming ``traceparent`` header is
+joined, and spans are exported with OTLP field names (``traceId``,
+``spanId``, ``parentSpanId``, ``startTimeUnixNano``...), so the files can be
+loaded into any OpenTelemetry tooling.
+
+Sampling is decided once per request (``TRACING_SAMPLE_RATE``; the
+caller's sampled flag only with ``TRACING_TRUST_TRACEPARENT``); unsampled
+requests only pay a context variable lookup per instrumented call. Finished
+spans are queued and written by a background thread to the exporter chosen
+with ``TRACING_EXPORTER``: ``file`` (JSON lines in ``TRACING_FILE``, rotated
+at ``TRACING_FILE_MAX_MB``, the default), ``console`` (the log) or ``none``.
+
+Summarise a trace file, slowest span names first::
+
+    python -m app.core.tracing traces.jsonl [--route /camera/result]
+"""
+
+import argparse
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import secrets
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "file").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_FILE_MAX_BYTES = int(float(os.getenv("TRACING_FILE_MAX_MB", "50")) * 1024 * 1024)
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0.05"))
+# Honour the sampled flag of incoming traceparent headers (only behind a
+# proxy that sets them); otherwise any client could force tracing
+TRACING_TRUST_TRACEPARENT = os.getenv("TRACING_TRUST_TRACEPARENT", "false").lower() == "true"
+SERVICE_NAME = "nutrition-tracker"
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = (
+        "trace_id", "span_id", "parent_id", "name", "kind",
+        "start_ns", "end_ns", "attributes", "status", "error",
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: str = "INTERNAL"):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = {}
+        self.status = "UNSET"
+        self.error = None
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = "ERROR"
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+        if self.status == "UNSET":
+            self.status = "OK"
+        processor.on_end(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "resource": {"service.name": SERVICE_NAME},
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": f"SPAN_KIND_{self.kind}",
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": {"code": f"STATUS_CODE_{self.status}", "message": self.error or ""},
+        }
+
+
+class FileExporter:
+    """
+    Appends spans to ``path`` as JSON lines. Once the file reaches
+    ``max_bytes`` it is renamed to ``path.1`` (replacing the previous one),
+    so at most about twice ``max_bytes`` stays on disk.
+    """
+
+    def __init__(self, path: str, max_bytes: int = TRACING_FILE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def _rotate_if_full(self) -> None:
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if self.max_bytes and size >= self.max_bytes:
+            os.replace(self.path, f"{self.path}.1")
+
+    def export(self, spans: list) -> None:
+        self._rotate_if_full()
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+class ConsoleExporter:
+    def export(self, spans: list) -> None:
+        for span in spans:
+            logger.info(
+                "span %s %.1fms trace=%s parent=%s %s",
+                span.name,
+                (span.end_ns - span.start_ns) / 1e6,
+                span.trace_id,
+                span.parent_id or "-",
+                span.attributes,
+            )
+
+
+class BatchSpanProcessor:
+    """Queues finished spans and exports them from a background thread."""
+
+    def __init__(self, exporter=None, max_queue: int = 10000, flush_interval: float = 2.0):
+        self.exporter = exporter
+        self.max_queue = max_queue
+        self.flush_interval = flush_interval
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self.dropped = 0
+
+    def on_end(self, span: Span) -> None:
+        if self.exporter is None:
+            return
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                return
+            self._queue.append(span)
+        if self._thread is None:
+            self.start()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None or self.exporter is None:
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            spans = list(self._queue)
+            self._queue.clear()
+        if not spans:
+            return
+        try:
+            self.exporter.export(spans)
+        except Exception as e:
+            logger.warning("Span export failed: %s", e)
+
+    def shutdown(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+
+def _create_exporter():
+    if TRACING_EXPORTER == "file":
+        return FileExporter(TRACING_FILE)
+    if TRACING_EXPORTER == "console":
+        return ConsoleExporter()
+    return None
+
+
+processor = BatchSpanProcessor(_create_exporter())
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def _parse_traceparent(header: Optional[str]):
+    """Return (trace_id, parent span id, sampled) from a W3C traceparent header."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        # All-zero ids are invalid
+        if not int(parts[1], 16) or not int(parts[2], 16):
+            return None
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1].lower(), parts[2].lower(), sampled
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, kind: str = "SERVER") -> Optional[Span]:
+    """Start a root span, or return None when the request is not sampled."""
+    if processor.exporter is None:
+        return None
+    parent = _parse_traceparent(traceparent)
+    if parent is not None:
+        # Keep joining the caller's trace, but sample at the local rate
+        # unless the header comes from a trusted proxy
+        trace_id, parent_id, sampled = parent
+        if not TRACING_TRUST_TRACEPARENT:
+            sampled = random.random() < TRACING_SAMPLE_RATE
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+        sampled = random.random() < TRACING_SAMPLE_RATE
+    if not sampled:
+        return None
+    return Span(name, trace_id, parent_id, kind)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child span of the current span; a no-op outside of a sampled trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent.trace_id, parent.span_id)
+    child.attributes.update(attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def traced_methods(cls):
+    """
+    Class decorator wrapping every public method in a child span named
+    ``ClassName.method``. Generator methods are left alone.
+    """
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.isfunction(method):
+            continue
+        if inspect.isgeneratorfunction(method):
+            continue
+        setattr(cls, name, _traced(method, f"{cls.__name__}.{name}"))
+    return cls
+
+
+def _traced(method, span_name: str):
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return await method(*args, **kwargs)
+            with span(span_name):
+                return await method(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if _current_span.get() is None:
+            return method(*args, **kwargs)
+        with span(span_name):
+            return method(*args, **kwargs)
+
+    return wrapper
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a sampled root span per HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        root = start_trace(f"{scope['method']} {scope['path']}", _header(scope, b"traceparent"))
+        if root is None:
+            await self.app(scope, receive, send)
+            return
+
+        root.set_attribute("http.request.method", scope["method"])
+        root.set_attribute("url.path", scope["path"])
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.response.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.status = "ERROR"
+            await send(message)
+
+        token = _current_span.set(root)
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException as e:
+            root.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                root.name = f"{scope['method']} {route}"
+                root.set_attribute("http.route", route)
+            root.end()
+
+
+def summarize(path: str, route: Optional[str] = None) -> list:
+    """Per span name: count, p50 / p95 / max duration (ms), slowest p95 first."""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                spans.append(json.loads(line))
+    if route:
+        traces = {
+            s["traceId"] for s in spans
+            if s["kind"] == "SPAN_KIND_SERVER" and s["attributes"].get("http.route") == route
+        }
+        spans = [s for s in spans if s["traceId"] in traces]
+
+    durations = defaultdict(list)
+    for s in spans:
+        durations[s["name"]].append(s["durationMs"])
+    rows = []
+    for name, values in durations.items():
+        values.sort()
+        rows.append(
+            {
+                "name": name,
+                "count": len(values),
+                "p50_ms": values[len(values) // 2],
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max_ms": values[-1],
+            }
+        )
+    return sorted(rows, key=lambda r: -r["p95_ms"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise a span file")
+    parser.add_argument("path", nargs="?", default=TRACING_FILE)
+    parser.add_argument("--route", default=None, help="Only traces of this route template")
+    args = parser.parse_args()
+
+    print(f"{'span':<50}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for r in summarize(args.path, args.route):
+        print(f"{r['name']:<50}{r['count']:>7}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['max_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
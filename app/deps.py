@@ -8,11 +8,13 @@ from app.repositories.food_logs_repository import FoodLogRepository
 from app.repositories.health_repository import HealthRepository
 from app.repositories.personal_food_repository import PersonalFoodRepository
 from app.repositories.food_repository import FoodRepository
+from app.repositories.nutrition_target_repository import NutritionTargetRepository
 from app.services.auth_service import AuthService
 from app.services.food_logs_service import FoodLogService
 from app.services.personal_food_service import PersonalFoodService
 from app.services.admin_service import AdminService
 from app.services.food_service import FoodService
+from app.services.export_service import ExportService
 
 
 from app.core.security import decode_token
@@ -71,6 +73,9 @@ def get_food_log_service(db: Session = Depends(get_db)) -> FoodLogService:
 def get_health_repository(db: Session = Depends(get_db)) -> HealthRepository:
     return HealthRepository(db)
 
+def get_nutrition_target_repository(db: Session = Depends(get_db)) -> NutritionTargetRepository:
+    return NutritionTargetRepository(db)
+
 def get_personal_food_service(db: Session = Depends(get_db)) -> PersonalFoodService:
     repo = PersonalFoodRepository(db)
     return PersonalFoodService(repo)
@@ -82,4 +87,7 @@ def get_admin_service(db: Session = Depends(get_db)) -> AdminService:
     return AdminService(db)
 
 def get_food_service(db: Session = Depends(get_db)) -> FoodService:
-    return FoodService(db)
\ No newline at end of file
+    return FoodService(db)
+
+def get_export_service() -> ExportService:
+    return ExportService()
@@ -6,14 +6,19 @@ import logging
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from dotenv import load_dotenv
-from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request
+from fastapi.responses import RedirectResponse, Response
 from starlette.middleware.sessions import SessionMiddleware
 import uvicorn
 
 from app.core.database import engine, Base
-from app.routers import auth_router, home_router, camera_router
+from app.core.http_cache import HTTPCacheMiddleware
+from app.core.assets import AssetStaticFiles
+from app.core.lifespan import lifespan
+from app.core import metrics
+from app.core.tracing import TracingMiddleware
+from app.core.replicas import ReadYourWritesMiddleware
+from app.routers import auth_router, home_router, camera_router, system_router
 from app.routers.admin_router import router as admin_router
 
 load_dotenv()
@@ -29,6 +34,7 @@ tags_metadata = [
     {"name": "Home", "description": "Dashboard, nhật ký, hồ sơ người dùng"},
     {"name": "Camera", "description": "Quét và nhận diện thực phẩm"},
     {"name": "Admin", "description": "Quản trị hệ thống (yêu cầu quyền admin)"},
+    {"name": "System", "description": "Liveness / readiness probes"},
 ]
 
 app = FastAPI(
@@ -38,22 +44,36 @@ app = FastAPI(
     openapi_tags=tags_metadata,
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
+# Keeps a browser's reads on the primary right after it wrote (no-op without replicas)
+app.add_middleware(ReadYourWritesMiddleware)
+
 # Session middleware for OAuth
 app.add_middleware(
     SessionMiddleware,
     secret_key=os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production"),
 )
 
-# Static files
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+# ETag revalidation for read-mostly pages (before routing, so 304s skip everything else)
+app.add_middleware(HTTPCacheMiddleware)
+
+# Sampled request traces (root span per request, see app.core.tracing)
+app.add_middleware(TracingMiddleware)
+
+# Request count / latency / in-flight metrics (outermost, so it also sees 304s)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Static files (fingerprinted + pre-compressed when built with `python -m app.core.assets`)
+app.mount("/static", AssetStaticFiles(directory="app/static"), name="static")
 
 # Routers
 app.include_router(auth_router)
 app.include_router(home_router)
 app.include_router(camera_router)
 app.include_router(admin_router)
+app.include_router(system_router)
 
 
 @app.get("/", include_in_schema=False)
@@ -62,6 +82,16 @@ async def root():
     return RedirectResponse(url="/welcome")
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Metrics of this worker in the Prometheus text format."""
+    client_host = request.client.host if request.client else ""
+    if not metrics.scrape_allowed(request.headers.get("authorization"), client_host):
+        # Same answer as an unknown path: do not advertise the endpoint
+        return Response(status_code=404)
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     logging.getLogger(__name__).info("Server is starting...")
     uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=True)
@@ -3,4 +3,5 @@ from .food_logs import FoodLog
 from .foods import Food
 from .personal_foods import PersonalFood
 from .ai_logs import AiLog
-from .health_status import HealthStatus
\ No newline at end of file
+from .health_status import HealthStatus
+from .nutrition_targets import NutritionTarget
\ No newline at end of file
@@ -10,6 +10,10 @@ class AiLog(Base):
     food_log_id = Column(Integer, ForeignKey("food_logs.id"), nullable=False)
     predicted_slug = Column(String, nullable=True)
     confidence = Column(Float, nullable=True)
-    model_version = Column(String, default="efficientnet_b0_v1")
+    # Set by the writer from predictor.model_version (registry version or weights hash)
+    model_version = Column(String, nullable=True)
     is_accurate = Column(Boolean, default=False)
+    latency_ms = Column(Float, nullable=True)
+    final_food_name = Column(String, nullable=True)
+    corrected_name = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class NutritionTarget(Base):
+    """Daily targets of a user, precomputed by app.core.nutrition_targets."""
+
+    __tablename__ = "nutrition_targets"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    # Inputs the row was computed from: recomputed when any of them changes
+    health_status_id = Column(Integer, nullable=False)
+    formula_version = Column(Integer, nullable=False)
+    valid_until = Column(Date, nullable=False)  # next birthday (age changes)
+
+    age = Column(Integer, nullable=False)
+    bmi = Column(Float, nullable=False)
+    bmr = Column(Float, nullable=False)
+    tdee = Column(Float, nullable=False)
+    calories = Column(Integer, nullable=False)
+    protein_g = Column(Float, nullable=False)
+    carbs_g = Column(Float, nullable=False)
+    fat_g = Column(Float, nullable=False)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
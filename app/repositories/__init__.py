@@ -2,4 +2,5 @@ from .user_repository import UserRepository
 from .food_logs_repository import FoodLogRepository
 from .health_repository import HealthRepository
 from .personal_food_repository import PersonalFoodRepository
-from .food_repository import FoodRepository
\ No newline at end of file
+from .food_repository import FoodRepository
+from .nutrition_target_repository import NutritionTargetRepository
\ No newline at end of file
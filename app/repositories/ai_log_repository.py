@@ -0,0 +1,63 @@
+from typing import List
+
+from sqlalchemy import and_, bindparam, exists, insert, update
+from sqlalchemy.orm import Session
+
+from app.models.ai_logs import AiLog
+from app.models.food_logs import FoodLog
+from app.core.metrics import timed_methods
+from app.core.replicas import routed_methods
+from app.core.tracing import traced_methods
+
+
+@traced_methods
+@timed_methods
+@routed_methods
+class AiLogRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def insert_many(self, rows: List[dict]) -> int:
+        """
+        Insert a batch of prediction logs with a single executemany.
+
+        Does not commit, so a flush of inserts and corrections is one transaction.
+        """
+        if not rows:
+            return 0
+        self.db.execute(insert(AiLog), rows)
+        return len(rows)
+
+    def apply_corrections(self, rows: List[dict]) -> int:
+        """
+        Mark predictions as wrong and store the name suggested by the user.
+
+        Each row is ``{"food_log_id", "user_id", "corrected_name"}``; a row
+        only applies when the food log belongs to that user. Does not commit.
+        """
+        if not rows:
+            return 0
+        table = AiLog.__table__
+        owned = exists().where(
+            and_(
+                FoodLog.id == table.c.food_log_id,
+                FoodLog.user_id == bindparam("b_user_id"),
+            )
+        )
+        stmt = (
+            update(table)
+            .where(table.c.food_log_id == bindparam("b_food_log_id"), owned)
+            .values(is_accurate=False, corrected_name=bindparam("b_corrected_name"))
+        )
+        self.db.execute(
+            stmt,
+            [
+                {
+                    "b_food_log_id": row["food_log_id"],
+                    "b_user_id": row["user_id"],
+                    "b_corrected_name": row["corrected_name"],
+                }
+                for row in rows
+            ],
+        )
+        return len(rows)
@@ -1,8 +1,33 @@
+from datetime import datetime, time, timedelta
+
 from sqlalchemy.orm import Session
-from sqlalchemy import cast, Date
 from app.models.food_logs import FoodLog
+from app.core.cache import Namespace, cached
+from app.core.metrics import timed_methods
+from app.core.replicas import routed_methods
+from app.core.tracing import traced_methods
+
+DAILY_CALORIES: Namespace[int] = Namespace("daily_calories", ttl=600)
+DAILY_CALORIES.invalidate_on(FoodLog, group=lambda log: log.user_id)
+
+
+def _day_bounds(start_date, end_date=None):
+    """
+    Half-open [start, end) timestamps covering the given days.
+
+    Filtering ``eaten_at`` on a range instead of ``CAST(eaten_at AS DATE)``
+    lets PostgreSQL use the (user_id, eaten_at) index for the date part too.
+    The naive bounds are read in the session time zone, as the cast was.
+    """
+    end_date = end_date or start_date
+    start = datetime.combine(start_date, time.min)
+    end = datetime.combine(end_date, time.min) + timedelta(days=1)
+    return start, end
 
 
+@traced_methods
+@timed_methods
+@routed_methods
 class FoodLogRepository:
     def __init__(self, db: Session):
         self.db = db
@@ -13,10 +38,19 @@ class FoodLogRepository:
         self.db.refresh(food_log)
         return food_log
 
+    def create_many(self, food_logs: list) -> list:
+        """Insert several logs in one transaction (e.g. a multi-dish photo)."""
+        self.db.add_all(food_logs)
+        self.db.commit()
+        for food_log in food_logs:
+            self.db.refresh(food_log)
+        return food_logs
+
     def get_by_user_and_date(self, user_id: int, date):
+        start, end = _day_bounds(date)
         return (
             self.db.query(FoodLog)
-            .filter(FoodLog.user_id == user_id, cast(FoodLog.eaten_at, Date) == date)
+            .filter(FoodLog.user_id == user_id, FoodLog.eaten_at >= start, FoodLog.eaten_at < end)
             .all()
         )
 
@@ -30,12 +64,13 @@ class FoodLogRepository:
         )
 
     def get_by_user_date_range(self, user_id: int, start_date, end_date):
+        start, end = _day_bounds(start_date, end_date)
         return (
             self.db.query(FoodLog)
             .filter(
                 FoodLog.user_id == user_id,
-                cast(FoodLog.eaten_at, Date) >= start_date,
-                cast(FoodLog.eaten_at, Date) <= end_date,
+                FoodLog.eaten_at >= start,
+                FoodLog.eaten_at < end,
             )
             .all()
         )
@@ -51,12 +86,64 @@ class FoodLogRepository:
             .first()
         )
 
+    def stream_by_user(self, user_id: int, batch_size: int = 1000):
+        """
+        Iterate over every log of a user using a server-side cursor.
+
+        Rows are fetched from the database in batches of ``batch_size`` so
+        exporting a long history keeps memory usage constant.
+        """
+        return (
+            self.db.query(
+                FoodLog.id,
+                FoodLog.eaten_at,
+                FoodLog.meal_type,
+                FoodLog.final_food_name,
+                FoodLog.calories,
+                FoodLog.protein,
+                FoodLog.carbs,
+                FoodLog.fat,
+                FoodLog.food_id,
+                FoodLog.personal_food_id,
+                FoodLog.image_url,
+                FoodLog.created_at,
+            )
+            .filter(FoodLog.user_id == user_id)
+            .order_by(FoodLog.eaten_at.asc(), FoodLog.id.asc())
+            .execution_options(stream_results=True)
+            .yield_per(batch_size)
+        )
+
+    def stream_confirmed_photos(self, batch_size: int = 1000):
+        """
+        Iterate over logs whose photo the user confirmed as a known food
+        (catalog or personal), for building the embedding index.
+        """
+        return (
+            self.db.query(
+                FoodLog.id,
+                FoodLog.user_id,
+                FoodLog.food_id,
+                FoodLog.personal_food_id,
+                FoodLog.image_url,
+            )
+            .filter(
+                FoodLog.image_url.isnot(None),
+                (FoodLog.food_id.isnot(None)) | (FoodLog.personal_food_id.isnot(None)),
+            )
+            .order_by(FoodLog.id.asc())
+            .execution_options(stream_results=True)
+            .yield_per(batch_size)
+        )
+
+    @cached(DAILY_CALORIES, group="user_id")
     def get_total_calories_by_date(self, user_id: int, date):
         from sqlalchemy import func
 
+        start, end = _day_bounds(date)
         result = (
             self.db.query(func.sum(FoodLog.calories))
-            .filter(FoodLog.user_id == user_id, cast(FoodLog.eaten_at, Date) == date)
+            .filter(FoodLog.user_id == user_id, FoodLog.eaten_at >= start, FoodLog.eaten_at < end)
             .scalar()
         )
         return result or 0
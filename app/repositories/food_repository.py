@@ -1,9 +1,26 @@
 # app/repositories/food_repository.py
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.models.foods import Food
+from app.models.personal_foods import PersonalFood
 from typing import Optional, List
+from app.core.cache import Namespace, cached
+from app.core.metrics import timed_methods
+from app.core.replicas import routed_methods
+from app.core.tracing import traced_methods
 
+# Catalog changes (rare, admin only) invalidate the whole namespace
+FOOD_BY_SLUG: Namespace[Optional[Food]] = Namespace("food_by_slug", ttl=3600)
+FOOD_BY_SLUG.invalidate_on(Food)
+# Results mix the catalog with the user's personal foods
+FOOD_SEARCH: Namespace[list] = Namespace("food_search", ttl=300)
+FOOD_SEARCH.invalidate_on(Food)
+FOOD_SEARCH.invalidate_on(PersonalFood, group=lambda food: food.user_id)
 
+
+@traced_methods
+@timed_methods
+@routed_methods
 class FoodRepository:
     """Repository for querying foods from the database."""
     
@@ -14,6 +31,13 @@ class FoodRepository:
         """Get food by ID."""
         return self.db.query(Food).filter(Food.id == food_id).first()
     
+    def get_by_ids(self, food_ids: List[int]) -> List[Food]:
+        """Get several foods in one query (order not preserved)."""
+        if not food_ids:
+            return []
+        return self.db.query(Food).filter(Food.id.in_(food_ids)).all()
+    
+    @cached(FOOD_BY_SLUG, attach=True)
     def get_by_ai_slug(self, ai_slug: str) -> Optional[Food]:
         """
         Get food by AI slug (used for matching AI predictions to database entries).
@@ -34,6 +58,18 @@ class FoodRepository:
         """Search foods by name (case-insensitive partial match)."""
         return self.db.query(Food).filter(Food.name.ilike(f"%{name}%")).all()
 
+    def get_unslugged_names(self, names: List[str]) -> set:
+        """Lowercased ``names`` already used by foods without an ``ai_slug``."""
+        if not names:
+            return set()
+        lowered = func.lower(Food.name)
+        rows = (
+            self.db.query(lowered)
+            .filter(Food.ai_slug.is_(None), lowered.in_([n.lower() for n in names]))
+            .all()
+        )
+        return {name for (name,) in rows}
+
     def create(self, food: Food):
         self.db.add(food)
         self.db.commit()
@@ -54,6 +90,45 @@ class FoodRepository:
             return True
         return False
     
+    def upsert_many(self, rows: List[dict]) -> int:
+        """
+        Insert or update a chunk of foods keyed on ``ai_slug``.
+
+        Uses ``INSERT ... ON CONFLICT (ai_slug) DO UPDATE`` sent as a single
+        executemany, so a chunk costs one round trip instead of one per row.
+        Rows must not repeat an ``ai_slug`` within the same chunk.
+
+        A Core statement, unseen by the ORM invalidation hooks: callers
+        invalidate ``FOOD_BY_SLUG`` and ``FOOD_SEARCH`` once all chunks are in.
+
+        Returns:
+            Number of rows sent to the database
+        """
+        if not rows:
+            return 0
+
+        if self.db.get_bind().dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        stmt = insert(Food)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Food.ai_slug],
+            set_={
+                "name": stmt.excluded.name,
+                "unit": stmt.excluded.unit,
+                "calories": stmt.excluded.calories,
+                "carbs": stmt.excluded.carbs,
+                "protein": stmt.excluded.protein,
+                "fat": stmt.excluded.fat,
+            },
+        )
+        self.db.execute(stmt, rows)
+        self.db.commit()
+        return len(rows)
+
+    @cached(FOOD_SEARCH, group="user_id")
     def search_foods_fts(self, query: str, user_id: int = None, limit: int = 10):
         """
         Search foods using Full-Text Search across both personal_foods and public foods tables.
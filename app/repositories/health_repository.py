@@ -1,6 +1,17 @@
 from sqlalchemy.orm import Session
 from app.models.health_status import HealthStatus
+from app.core.cache import Namespace, cached
+from app.core.metrics import timed_methods
+from app.core.replicas import routed_methods
+from app.core.tracing import traced_methods
 
+LATEST_HEALTH: Namespace[HealthStatus] = Namespace("latest_health", ttl=300)
+LATEST_HEALTH.invalidate_on(HealthStatus, group=lambda health: health.user_id)
+
+
+@traced_methods
+@timed_methods
+@routed_methods
 class HealthRepository:
     def __init__(self, db: Session):
         self.db = db
@@ -11,8 +22,27 @@ class HealthRepository:
         self.db.refresh(health_status)
         return health_status
         
+    @cached(LATEST_HEALTH, group="user_id", attach=True)
     def get_latest_by_user(self, user_id: int):
         return self.db.query(HealthStatus).filter(HealthStatus.user_id == user_id).order_by(HealthStatus.updated_at.desc()).first()
         
     def get_history_by_user(self, user_id: int):
         return self.db.query(HealthStatus).filter(HealthStatus.user_id == user_id).order_by(HealthStatus.updated_at.asc()).all()
+
+    def stream_history_by_user(self, user_id: int, batch_size: int = 1000):
+        """Iterate over a user's health history using a server-side cursor."""
+        return (
+            self.db.query(
+                HealthStatus.id,
+                HealthStatus.updated_at,
+                HealthStatus.weight_kg,
+                HealthStatus.height_cm,
+                HealthStatus.bmi,
+                HealthStatus.tdee,
+                HealthStatus.activity_level,
+            )
+            .filter(HealthStatus.user_id == user_id)
+            .order_by(HealthStatus.updated_at.asc(), HealthStatus.id.asc())
+            .execution_options(stream_results=True)
+            .yield_per(batch_size)
+        )
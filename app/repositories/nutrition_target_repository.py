@@ -0,0 +1,58 @@
+from typing import List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.nutrition_targets import NutritionTarget
+from app.core.cache import Namespace, cached
+from app.core.metrics import timed_methods
+from app.core.replicas import routed_methods
+from app.core.tracing import traced_methods
+
+# Read by the dashboard and the diary on every visit
+NUTRITION_TARGETS: Namespace[Optional[NutritionTarget]] = Namespace("nutrition_targets", ttl=3600)
+# Above this many rows, one namespace-wide bump instead of one per user
+GROUP_INVALIDATION_LIMIT = 100
+
+
+@traced_methods
+@timed_methods
+@routed_methods
+class NutritionTargetRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    @cached(NUTRITION_TARGETS, group="user_id", attach=True)
+    def get_by_user(self, user_id: int) -> Optional[NutritionTarget]:
+        return self.db.query(NutritionTarget).filter(NutritionTarget.user_id == user_id).first()
+
+    def upsert_many(self, rows: List[dict]) -> int:
+        """
+        Insert or replace the targets of several users keyed on ``user_id``,
+        as a single ``INSERT ... ON CONFLICT DO UPDATE`` executemany.
+
+        Returns:
+            Number of rows sent to the database
+        """
+        if not rows:
+            return 0
+
+        if self.db.get_bind().dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        stmt = insert(NutritionTarget)
+        columns = [c.name for c in NutritionTarget.__table__.columns if c.name not in ("user_id", "computed_at")]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[NutritionTarget.user_id],
+            set_={**{name: stmt.excluded[name] for name in columns}, "computed_at": func.now()},
+        )
+        self.db.execute(stmt, rows)
+        self.db.commit()
+        # Core statement: the ORM invalidation hooks do not see it
+        if len(rows) <= GROUP_INVALIDATION_LIMIT:
+            for row in rows:
+                NUTRITION_TARGETS.invalidate(group=row["user_id"])
+        else:
+            NUTRITION_TARGETS.invalidate()
+        return len(rows)
@@ -1,7 +1,14 @@
 from sqlalchemy.orm import Session
 from app.models.personal_foods import PersonalFood
 from typing import List
+from app.core.metrics import timed_methods
+from app.core.replicas import routed_methods
+from app.core.tracing import traced_methods
 
+
+@traced_methods
+@timed_methods
+@routed_methods
 class PersonalFoodRepository:
     def __init__(self, db: Session):
         self.db = db
@@ -18,6 +25,15 @@ class PersonalFoodRepository:
     def get_by_id(self, id: int) -> PersonalFood:
         return self.db.query(PersonalFood).filter(PersonalFood.id == id).first()
 
+    def get_by_ids_for_user(self, ids: List[int], user_id: int) -> List[PersonalFood]:
+        if not ids:
+            return []
+        return (
+            self.db.query(PersonalFood)
+            .filter(PersonalFood.id.in_(ids), PersonalFood.user_id == user_id)
+            .all()
+        )
+
     def update(self, personal_food: PersonalFood) -> PersonalFood:
         self.db.add(personal_food)
         self.db.commit()
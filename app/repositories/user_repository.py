@@ -1,6 +1,18 @@
 from sqlalchemy.orm import Session
 from app.models.user import User
+from app.core.cache import Namespace, cached
+from app.core.metrics import timed_methods
+from app.core.replicas import routed_methods
+from app.core.tracing import traced_methods
 
+# Loaded by every authenticated request (app.deps)
+USER_BY_ID: Namespace[User] = Namespace("user_by_id", ttl=300)
+USER_BY_ID.invalidate_on(User, group=lambda user: user.id)
+
+
+@traced_methods
+@timed_methods
+@routed_methods
 class UserRepository:
     def __init__(self, db: Session):
         self.db = db
@@ -8,6 +20,7 @@ class UserRepository:
     def get_by_email(self, email: str):
         return self.db.query(User).filter(User.email == email).first()
 
+    @cached(USER_BY_ID, group="user_id", attach=True)
     def get_by_id(self, user_id: int):
         return self.db.query(User).filter(User.id == user_id).first()
 
@@ -1,3 +1,4 @@
 from .auth_router import router as auth_router
 from .home_router import router as home_router
-from .camera_router import router as camera_router
\ No newline at end of file
+from .camera_router import router as camera_router
+from .system_router import router as system_router
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Request, Depends, Form
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import RedirectResponse
+import sys
+
+from fastapi import APIRouter, Request, Depends, Form, UploadFile, File, HTTPException
+from fastapi.responses import RedirectResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 
 from app.deps import get_admin_user, get_admin_service, get_food_service
 from app.services.admin_service import AdminService
-from app.services.food_service import FoodService
+from app.services.food_service import FoodService, IMPORT_FORMATS
 from app.core.csrf import issue_csrf_token, validate_csrf
+from app.core import cache, http_cache, profiling
+from app.core.model_registry import registry, summarize_shadow_log
+from app.services.ai_log_service import ai_log_writer
+from app.core.templates import templates
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
-templates = Jinja2Templates(directory="app/templates")
 
 
 @router.get("")
@@ -35,6 +40,101 @@ async def admin_dashboard(
     )
 
 
+@router.get("/cache/stats")
+async def cache_stats(user=Depends(get_admin_user)):
+    """HTTP and data cache hit / miss counters of the current worker."""
+    return {"http_cache": http_cache.stats.snapshot(), "data_cache": cache.stats.snapshot()}
+
+
+@router.get("/ai_logs/stats")
+async def ai_log_stats(user=Depends(get_admin_user)):
+    """Write-behind AI log queue of the current worker."""
+    return {"ai_log_writer": ai_log_writer.stats()}
+
+
+@router.get("/live_preview/stats")
+async def live_preview_stats(user=Depends(get_admin_user)):
+    """Live camera preview frames processed and dropped by the current worker."""
+    from app.core.live_preview import live_preview_engine
+
+    return {"live_preview": live_preview_engine.stats()}
+
+
+@router.get("/models")
+async def model_versions(user=Depends(get_admin_user)):
+    """Registered model versions, the serving model and the shadow comparison."""
+    from app.core.ai_predictor import predictor
+
+    active = registry.active()
+    shadow = registry.shadow()
+    return {
+        "versions": [v.to_dict() for v in registry.list_versions()],
+        "active": active.version if active else None,
+        "shadow": (
+            {"version": shadow["model"].version, "sample_rate": shadow["sample_rate"]}
+            if shadow
+            else None
+        ),
+        "serving": await run_in_threadpool(predictor.status),
+        "shadow_report": summarize_shadow_log(registry.read_shadow_log()),
+    }
+
+
+# Profiles are read-only GETs: an admin POST would invalidate every user's ETags
+@router.get("/profile/cpu")
+async def profile_cpu(
+    seconds: float = 10.0,
+    interval_ms: float = 10.0,
+    idle: bool = False,
+    format: str = "collapsed",
+    user=Depends(get_admin_user),
+):
+    """
+    Sample the stacks of this worker for ``seconds`` (at most 60).
+    The default output is collapsed stacks for flamegraph.pl / speedscope.
+    """
+    try:
+        profile = await run_in_threadpool(
+            profiling.sample_cpu, seconds, interval_ms / 1000, idle
+        )
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "json":
+        return profile
+    return PlainTextResponse(
+        profile["collapsed"] + "\n",
+        headers={"X-Profile-Samples": str(profile["samples"]), "X-Profile-Pid": str(profile["pid"])},
+    )
+
+
+@router.get("/profile/memory")
+async def profile_memory(
+    seconds: float = 10.0,
+    top: int = 25,
+    format: str = "json",
+    user=Depends(get_admin_user),
+):
+    """Allocations still alive after a ``seconds`` tracemalloc window."""
+    try:
+        diff = await run_in_threadpool(profiling.memory_diff, seconds, top)
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "collapsed":
+        return PlainTextResponse(diff["collapsed"] + "\n")
+    return diff
+
+
+@router.get("/profile/torch")
+async def profile_torch(user=Depends(get_admin_user)):
+    """Torch threads, memory and inference timings of this worker."""
+    stats = profiling.torch_stats()
+    # Never import the predictor (and torch) just to report on it
+    ai_predictor = sys.modules.get("app.core.ai_predictor")
+    if ai_predictor is not None:
+        stats["model"] = await run_in_threadpool(ai_predictor.predictor.status)
+    return stats
+
+
 @router.get("/users")
 async def admin_users(
     request: Request,
@@ -97,6 +197,50 @@ async def create_food(
     return RedirectResponse(url="/admin/foods", status_code=303)
 
 
+@router.get("/foods/import")
+async def import_foods_page(request: Request, user=Depends(get_admin_user)):
+    csrf_token = issue_csrf_token(request)
+    return templates.TemplateResponse(
+        "admin_food_import.html",
+        {"request": request, "user": user, "report": None, "csrf_token": csrf_token},
+    )
+
+
+@router.post("/foods/import")
+async def import_foods(
+    request: Request,
+    csrf_token: str = Form(...),
+    file: UploadFile = File(...),
+    user=Depends(get_admin_user),
+    food_service: FoodService = Depends(get_food_service),
+):
+    validate_csrf(request, csrf_token)
+
+    filename = (file.filename or "").lower()
+    fmt = filename.rsplit(".", 1)[-1] if "." in filename else ""
+    error = None
+    report = None
+    if fmt not in IMPORT_FORMATS:
+        error = "Chỉ hỗ trợ file .csv, .json hoặc .ndjson"
+    else:
+        # UploadFile is spooled to disk by Starlette, read it row by row
+        try:
+            report = food_service.bulk_import_foods(file.file, fmt)
+        except UnicodeDecodeError:
+            error = "File phải được mã hóa UTF-8"
+
+    return templates.TemplateResponse(
+        "admin_food_import.html",
+        {
+            "request": request,
+            "user": user,
+            "report": report,
+            "error": error,
+            "csrf_token": issue_csrf_token(request),
+        },
+    )
+
+
 @router.get("/foods/edit/{id}")
 async def edit_food_page(
     request: Request,
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Request, Form, Depends
-from fastapi.templating import Jinja2Templates
 from fastapi.responses import RedirectResponse, JSONResponse
 from app.services.auth_service import AuthService
 from app.deps import get_auth_service
 from app.core.security import create_access_token
+from app.core.templates import templates
 import os
 from dotenv import load_dotenv
 import logging
@@ -11,7 +11,6 @@ import logging
 load_dotenv()
 
 router = APIRouter(tags=["Authentication"])
-templates = Jinja2Templates(directory="app/templates")
 logger = logging.getLogger(__name__)
 
 
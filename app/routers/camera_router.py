@@ -1,19 +1,31 @@
+import asyncio
 import base64
 import logging
+import time
+import uuid
 
-from fastapi import APIRouter, Request, UploadFile, File, Depends
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, Request, UploadFile, File, Form, Depends, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.responses import RedirectResponse
+from starlette.concurrency import run_in_threadpool
 
 from app.core.ai_predictor import predictor
+from app.core.database import SessionLocal
+from app.core.live_preview import LivePreviewSession, live_preview_engine
+from app.core.security import decode_token
 from app.deps import get_optional_user, get_food_service
 from app.services.food_service import FoodService
 from app.services.cloudinary_service import CloudinaryService
+from app.services.ai_log_service import PREDICTION_SESSION_KEY
+from app.core.templates import templates
 
 router = APIRouter(prefix="/camera", tags=["Camera"])
-templates = Jinja2Templates(directory="app/templates")
 logger = logging.getLogger(__name__)
 
+# Below this confidence the result page also suggests visually similar foods
+SUGGEST_BELOW_CONFIDENCE = 0.6
+# "multi" looks for several dishes in the photo instead of one label
+SCAN_MODES = {"single", "multi"}
+
 
 @router.get("/scan")
 async def camera_scan_page(request: Request, user=Depends(get_optional_user)):
@@ -47,14 +59,21 @@ async def camera_result_page(
 async def upload_image(
     request: Request,
     file: UploadFile = File(...),
+    mode: str = Form("single"),
     user=Depends(get_optional_user),
     food_service: FoodService = Depends(get_food_service),
 ):
     if not user:
         return RedirectResponse(url="/account/login", status_code=303)
+    if mode not in SCAN_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown scan mode: {mode[:20]!r}")
+    if mode == "multi":
+        return await _multi_dish_result(request, file, user, food_service)
 
     predicted_label = None
     confidence = 0.0
+    prediction_id = None
+    similar_foods = []
     food = None
     not_found = False
     image_data = None
@@ -72,8 +91,11 @@ async def upload_image(
         # Encode image for display in template
         image_data = base64.b64encode(content).decode("utf-8")
 
-        # Get prediction from AI model
-        predicted_label, confidence = predictor.predict(content)
+        # Get prediction from AI model (off the event loop, it may block on
+        # the forward pass or on the inference service)
+        started = time.perf_counter()
+        predicted_label, confidence = await run_in_threadpool(predictor.predict, content)
+        latency_ms = (time.perf_counter() - started) * 1000
 
         if predicted_label:
             # Use service to get food by AI slug
@@ -87,6 +109,31 @@ async def upload_image(
         else:
             not_found = True
             logger.debug("AI prediction returned None")
+        matched_food_id = food.id if food is not None else None
+
+        # Unknown or uncertain dish: propose foods with similar-looking photos
+        if (food is None or confidence < SUGGEST_BELOW_CONFIDENCE) and (
+            food_service.similarity_search_available()
+        ):
+            embeddings = await run_in_threadpool(predictor.embed_batch, [content])
+            similar_foods = food_service.suggest_similar_foods(embeddings[0], user_id=user.id)
+            if food is None:
+                best = next((f for f in similar_foods if not f["is_personal"]), None)
+                if best is not None:
+                    food = food_service.get_food_by_id(best["id"])
+                    not_found = food is None
+
+        # Kept in the (signed) session until the user adds the meal, which is
+        # when /home/diary/add writes the prediction to ai_logs
+        prediction_id = uuid.uuid4().hex
+        request.session[PREDICTION_SESSION_KEY] = {
+            "id": prediction_id,
+            "slug": predicted_label,
+            "confidence": round(confidence, 4),
+            "model_version": predictor.model_version,
+            "latency_ms": round(latency_ms, 2),
+            "food_id": matched_food_id,
+        }
 
     except Exception as e:
         logger.error("Prediction error occurred", exc_info=True)
@@ -104,10 +151,135 @@ async def upload_image(
             "image_uploaded": True,
             "image_data": image_data,
             "image_url": image_url,
+            "prediction_id": prediction_id,
+            "similar_foods": similar_foods,
         },
     )
 
 
+async def _multi_dish_result(request: Request, file: UploadFile, user, food_service: FoodService):
+    dishes = []
+    image_data = None
+    image_url = None
+    prediction_id = None
+
+    try:
+        content = await file.read()
+        image_url = CloudinaryService.upload_image(
+            content, folder="nutrition_tracker/food_logs"
+        )
+        image_data = base64.b64encode(content).decode("utf-8")
+
+        started = time.perf_counter()
+        detection = await run_in_threadpool(predictor.detect_dishes, content)
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        for dish in detection["dishes"]:
+            food = food_service.get_food_by_ai_slug(dish["label"])
+            dishes.append(
+                {
+                    "label": dish["label"],
+                    "confidence": round(dish["confidence"] * 100, 1),
+                    "box": dish["box"],
+                    "food": food,
+                }
+            )
+
+        prediction_id = uuid.uuid4().hex
+        request.session[PREDICTION_SESSION_KEY] = {
+            "id": prediction_id,
+            "model_version": predictor.model_version,
+            "latency_ms": round(latency_ms, 2),
+            "dishes": [
+                {
+                    "slug": detected["label"],
+                    "confidence": round(detected["confidence"], 4),
+                    "food_id": dish["food"].id if dish["food"] is not None else None,
+                }
+                for detected, dish in zip(detection["dishes"], dishes)
+            ],
+        }
+    except Exception:
+        logger.error("Multi-dish prediction error occurred", exc_info=True)
+
+    return templates.TemplateResponse(
+        "your_meal_multi.html",
+        {
+            "request": request,
+            "user": user,
+            "dishes": dishes,
+            "image_data": image_data,
+            "image_url": image_url,
+            "prediction_id": prediction_id,
+        },
+    )
+
+
+def _food_name_for_slug(slug: str) -> str:
+    db = SessionLocal()
+    try:
+        food = FoodService(db).get_food_by_ai_slug(slug)
+        return food.name if food is not None else slug
+    finally:
+        db.close()
+
+
+@router.websocket("/live")
+async def live_preview(websocket: WebSocket):
+    """
+    Live preview: the client sends small JPEG frames as binary messages and
+    receives the smoothed best guess as JSON after each processed frame.
+    """
+    payload = decode_token(websocket.cookies.get("access_token") or "")
+    if not payload or not payload.get("sub"):
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    if not live_preview_engine.running:
+        await websocket.close(code=1013)
+        return
+
+    session = LivePreviewSession(live_preview_engine)
+    names = {}
+
+    async def push_guesses():
+        while True:
+            guess = await session.process(await session.next_frame())
+            if guess is None:
+                continue
+            if guess["label"] not in names:
+                names[guess["label"]] = await run_in_threadpool(_food_name_for_slug, guess["label"])
+            guess["name"] = names[guess["label"]]
+            guess["skipped"] = session.skipped
+            await websocket.send_json(guess)
+
+    async def receive_frames():
+        try:
+            while True:
+                session.offer(await websocket.receive_bytes())
+        except (WebSocketDisconnect, KeyError, RuntimeError):
+            # KeyError/RuntimeError: a text frame or a closed socket
+            pass
+
+    # Whichever loop stops first ends the connection: a failed pusher must
+    # not leave the receiver taking frames that are never answered
+    pusher = asyncio.create_task(push_guesses())
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        done, _ = await asyncio.wait({pusher, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        if pusher in done and not isinstance(pusher.exception(), WebSocketDisconnect):
+            logger.error("Live preview failed", exc_info=pusher.exception())
+            try:
+                await websocket.close(code=1011)
+            except RuntimeError:
+                # Already closed
+                pass
+    finally:
+        pusher.cancel()
+        receiver.cancel()
+        await asyncio.wait({pusher, receiver})
+
+
 @router.get("/search_food")
 async def search_food(
     request: Request,
@@ -1,6 +1,6 @@
 from collections import Counter
 from datetime import date, timedelta, datetime
-from typing import Optional
+from typing import List, Optional
 
 from fastapi import (
     APIRouter,
@@ -13,23 +13,29 @@ from fastapi import (
     HTTPException,
     status,
 )
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
 
 from app.deps import (
     get_optional_user,
     get_food_log_service,
     get_health_repository,
+    get_nutrition_target_repository,
     get_auth_service,
     get_personal_food_service,
+    get_export_service,
+    get_food_service,
 )
 from app.services.food_logs_service import FoodLogService
+from app.services.food_service import FoodService
 from app.services.personal_food_service import PersonalFoodService
 from app.services.cloudinary_service import CloudinaryService
+from app.services.export_service import ExportService, EXPORT_FORMATS
+from app.services.ai_log_service import ai_log_writer, PREDICTION_SESSION_KEY
 from app.repositories.health_repository import HealthRepository
+from app.repositories.nutrition_target_repository import NutritionTargetRepository
+from app.core.templates import templates
 
 router = APIRouter(prefix="/home", tags=["Home"])
-templates = Jinja2Templates(directory="app/templates")
 
 # --- File upload validation helpers ---
 ALLOWED_EXTS = {"jpg", "jpeg", "png", "gif"}
@@ -101,10 +107,13 @@ async def dashboard(
     request: Request,
     user=Depends(get_optional_user),
     food_log_service: FoodLogService = Depends(get_food_log_service),
+    health_repo: HealthRepository = Depends(get_health_repository),
+    targets_repo: NutritionTargetRepository = Depends(get_nutrition_target_repository),
 ):
     if not user:
         return RedirectResponse(url="/account/login", status_code=303)
 
+    targets = targets_repo.get_by_user(user.id)
     today = date.today()
     yesterday = today - timedelta(days=1)
     recent_food_logs = food_log_service.get_recent_food_logs(user.id, 5)
@@ -119,6 +128,9 @@ async def dashboard(
             "user": user,
             "recent_meals": recent_food_logs,
             "daily_calories": daily_calories,
+            "targets": targets,
+            # Fallback until the targets job has run for this user
+            "health_status": None if targets else health_repo.get_latest_by_user(user.id),
             "today": today,
             "yesterday": yesterday,
         },
@@ -216,10 +228,13 @@ async def diary(
     date: Optional[str] = None,
     user=Depends(get_optional_user),
     food_log_service: FoodLogService = Depends(get_food_log_service),
+    health_repo: HealthRepository = Depends(get_health_repository),
+    targets_repo: NutritionTargetRepository = Depends(get_nutrition_target_repository),
 ):
     if not user:
         return RedirectResponse(url="/account/login", status_code=303)
 
+    targets = targets_repo.get_by_user(user.id)
     if date:
         try:
             selected_date = datetime.strptime(date, "%Y-%m-%d").date()
@@ -248,6 +263,8 @@ async def diary(
             "next_date": selected_date + timedelta(days=1),
             "meals": meals,
             "total_calories": total_calories,
+            "targets": targets,
+            "health_status": None if targets else health_repo.get_latest_by_user(user.id),
         },
     )
 
@@ -265,6 +282,7 @@ async def add_to_diary_from_camera(
     meal_type: str = Form("Snack"),
     portion: float = Form(1.0),
     image_url: Optional[str] = Form(None),
+    prediction_id: Optional[str] = Form(None),
     user=Depends(get_optional_user),
     food_log_service: FoodLogService = Depends(get_food_log_service),
 ):
@@ -278,7 +296,7 @@ async def add_to_diary_from_camera(
     final_fat = fat * portion
 
     # Add to food logs
-    food_log_service.add_food_log(
+    food_log = food_log_service.add_food_log(
         user_id=user.id,
         final_food_name=food_name,
         calories=final_calories,
@@ -291,6 +309,82 @@ async def add_to_diary_from_camera(
         image_url=image_url,
     )
 
+    prediction = request.session.pop(PREDICTION_SESSION_KEY, None)
+    if prediction and prediction_id and prediction.get("id") == prediction_id:
+        ai_log_writer.log_prediction(
+            food_log_id=food_log.id,
+            predicted_slug=prediction.get("slug"),
+            confidence=prediction.get("confidence"),
+            model_version=prediction.get("model_version"),
+            latency_ms=prediction.get("latency_ms"),
+            final_food_name=food_name,
+            # Accurate when the user kept the public food the model matched
+            is_accurate=(
+                prediction.get("food_id") is not None
+                and food_id == prediction.get("food_id")
+                and personal_food_id is None
+            ),
+        )
+
+    return RedirectResponse(url="/home/diary", status_code=303)
+
+
+@router.post("/diary/add_many")
+async def add_dishes_to_diary_from_camera(
+    request: Request,
+    food_id: List[int] = Form([]),
+    portion: List[float] = Form([]),
+    dish: List[int] = Form([]),
+    meal_type: str = Form("Snack"),
+    image_url: Optional[str] = Form(None),
+    prediction_id: Optional[str] = Form(None),
+    user=Depends(get_optional_user),
+    food_log_service: FoodLogService = Depends(get_food_log_service),
+    food_service: FoodService = Depends(get_food_service),
+):
+    """Log the dishes the user kept from a multi-dish camera result."""
+    if not user:
+        return RedirectResponse(url="/account/login", status_code=303)
+
+    # food_id, portion and dish (the index of the detection) come in the
+    # same order, one per checked dish; the same food can appear twice (two
+    # bowls of phở), so they are matched by position, never by food id
+    foods = {food.id: food for food in food_service.get_foods_by_ids(food_id)}
+    kept = [
+        (foods[fid], portion[i] if i < len(portion) else 1.0, dish[i] if i < len(dish) else None)
+        for i, fid in enumerate(food_id)
+        if fid in foods
+    ]
+    if not kept:
+        return RedirectResponse(url="/home/diary", status_code=303)
+    food_logs = food_log_service.add_food_logs_from_foods(
+        user_id=user.id,
+        foods_with_portions=[(food, amount) for food, amount, _ in kept],
+        meal_type=meal_type,
+        image_url=image_url,
+    )
+
+    prediction = request.session.pop(PREDICTION_SESSION_KEY, None)
+    if prediction and prediction_id and prediction.get("id") == prediction_id:
+        detected = prediction.get("dishes", [])
+        used = set()
+        for food_log, (_, _, index) in zip(food_logs, kept):
+            if index is None or not 0 <= index < len(detected) or index in used:
+                continue
+            detection = detected[index]
+            if detection.get("food_id") != food_log.food_id:
+                continue
+            used.add(index)
+            ai_log_writer.log_prediction(
+                food_log_id=food_log.id,
+                predicted_slug=detection.get("slug"),
+                confidence=detection.get("confidence"),
+                model_version=prediction.get("model_version"),
+                latency_ms=prediction.get("latency_ms"),
+                final_food_name=food_log.final_food_name,
+                is_accurate=True,
+            )
+
     return RedirectResponse(url="/home/diary", status_code=303)
 
 
@@ -456,10 +550,12 @@ async def report_meal(
 ):
     if not user:
         return RedirectResponse(url="/account/login", status_code=303)
-    # Log the report for later review - future feature
-    print(
-        f"Meal report from user {user.id} - Meal ID: {id}, Suggested name: {correct_name}"
-    )
+    # Marks the AI prediction of this meal (if any) as wrong
+    correct_name = correct_name.strip()
+    if correct_name:
+        ai_log_writer.log_correction(
+            food_log_id=id, user_id=user.id, corrected_name=correct_name[:255]
+        )
     return RedirectResponse(url="/home/diary", status_code=303)
 
 
@@ -612,3 +708,53 @@ async def update_profile_info(
             "profile_success": "Cập nhật thông tin thành công!",
         },
     )
+
+
+def _export_response(chunks, filename: str, fmt: str) -> StreamingResponse:
+    ext = "csv" if fmt == "csv" else "ndjson"
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{ext}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@router.get("/export/food_logs")
+async def export_food_logs(
+    format: str = Query("csv"),
+    user=Depends(get_optional_user),
+    export_service: ExportService = Depends(get_export_service),
+):
+    if not user:
+        return RedirectResponse(url="/account/login", status_code=303)
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported format"
+        )
+
+    return _export_response(
+        export_service.stream_food_logs(user.id, format), "food_logs", format
+    )
+
+
+@router.get("/export/health_status")
+async def export_health_status(
+    format: str = Query("csv"),
+    user=Depends(get_optional_user),
+    export_service: ExportService = Depends(get_export_service),
+):
+    if not user:
+        return RedirectResponse(url="/account/login", status_code=303)
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported format"
+        )
+
+    return _export_response(
+        export_service.stream_health_history(user.id, format),
+        "health_status",
+        format,
+    )
@@ -0,0 +1,32 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.core.lifespan import MODEL_WARMUP
+
+router = APIRouter(prefix="/health", tags=["System"])
+
+
+@router.get("/live")
+async def liveness():
+    """The process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def readiness():
+    """
+    Ready once the AI model is loaded and warmed up.
+    Returns 503 while loading, or when the model failed to load. With
+    ``MODEL_WARMUP=false`` the model only loads on the first camera request,
+    so the worker is ready right away and the body shows the model state.
+    """
+    from app.core.ai_predictor import predictor
+
+    # RemotePredictor.status() pings the inference service over a socket
+    model = await run_in_threadpool(predictor.status)
+    ready = model["ready"] or not MODEL_WARMUP
+    return JSONResponse(
+        {"status": "ready" if ready else "not_ready", "model": model},
+        status_code=200 if ready else 503,
+    )
@@ -9,10 +9,12 @@ from app.repositories.food_repository import FoodRepository
 from app.repositories.food_logs_repository import FoodLogRepository
 from app.models.user import User, RoleEnum
 from app.models.food_logs import FoodLog
+from app.core.replicas import routed_methods
 
 logger = logging.getLogger(__name__)
 
 
+@routed_methods
 class AdminService:
     """Service layer for admin operations."""
 
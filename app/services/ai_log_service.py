@@ -0,0 +1,188 @@
+# app/services/ai_log_service.py
+"""
+Write-behind logging of AI predictions into ``ai_logs``.
+
+Request handlers only append to an in-memory queue; a background thread
+flushes it every ``AI_LOG_FLUSH_SECONDS`` (or as soon as a batch is full)
+with one executemany per batch, so the database never adds latency to the
+camera or diary requests. When the database is unavailable the entries are
+kept for the next flush, up to ``AI_LOG_MAX_QUEUE``; beyond that new
+entries are dropped and counted.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.repositories.ai_log_repository import AiLogRepository
+
+logger = logging.getLogger(__name__)
+
+# Session key holding the last camera prediction until the meal is added
+PREDICTION_SESSION_KEY = "ai_prediction"
+
+
+class AiLogWriter:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._predictions = deque()
+        self._corrections = deque()
+        self._lock = threading.Lock()
+        # Serialises flushes between the background thread and stop()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self.written = 0
+        self.corrected = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.last_error = None
+        self.last_flush_ms = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="ai-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the background thread and write what is still queued."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def log_prediction(
+        self,
+        food_log_id: int,
+        predicted_slug: Optional[str],
+        confidence: float,
+        model_version: Optional[str],
+        latency_ms: Optional[float],
+        final_food_name: Optional[str],
+        is_accurate: bool,
+    ) -> bool:
+        return self._enqueue(
+            self._predictions,
+            {
+                "food_log_id": food_log_id,
+                "predicted_slug": predicted_slug,
+                "confidence": confidence,
+                "model_version": model_version,
+                "latency_ms": latency_ms,
+                "final_food_name": final_food_name,
+                "is_accurate": is_accurate,
+            },
+        )
+
+    def log_correction(self, food_log_id: int, user_id: int, corrected_name: str) -> bool:
+        return self._enqueue(
+            self._corrections,
+            {"food_log_id": food_log_id, "user_id": user_id, "corrected_name": corrected_name},
+        )
+
+    def _enqueue(self, queue: deque, entry: dict) -> bool:
+        with self._lock:
+            if len(self._predictions) + len(self._corrections) >= self.max_queue:
+                self.dropped += 1
+                return False
+            queue.append(entry)
+            full = len(queue) >= self.batch_size
+        if full:
+            self._wakeup.set()
+        return True
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _take(self, queue: deque) -> list:
+        batch = []
+        while queue and len(batch) < self.batch_size:
+            batch.append(queue.popleft())
+        return batch
+
+    def flush(self) -> int:
+        """Write queued entries in batches; returns the number written."""
+        total = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    predictions = self._take(self._predictions)
+                    # Corrections go after the inserts they may refer to
+                    corrections = self._take(self._corrections)
+                if not predictions and not corrections:
+                    return total
+                if not self._write(predictions, corrections):
+                    return total
+                total += len(predictions) + len(corrections)
+
+    def _write(self, predictions: list, corrections: list) -> bool:
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            repo = AiLogRepository(db)
+            repo.insert_many(predictions)
+            repo.apply_corrections(corrections)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.failed_flushes += 1
+            self.last_error = str(e)
+            logger.warning("AI log flush failed, will retry: %s", e)
+            with self._lock:
+                # Put the batch back in front, keeping the queue bound
+                room = self.max_queue - len(self._predictions) - len(self._corrections)
+                for queue, batch in ((self._predictions, predictions), (self._corrections, corrections)):
+                    keep = batch[: max(room, 0)]
+                    self.dropped += len(batch) - len(keep)
+                    room -= len(keep)
+                    queue.extendleft(reversed(keep))
+            return False
+        finally:
+            db.close()
+
+        self.written += len(predictions)
+        self.corrected += len(corrections)
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            queued = len(self._predictions) + len(self._corrections)
+        return {
+            "queued": queued,
+            "written": self.written,
+            "corrected": self.corrected,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+            "last_error": self.last_error,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+ai_log_writer = AiLogWriter(
+    batch_size=int(os.getenv("AI_LOG_BATCH_SIZE", "200")),
+    flush_interval=float(os.getenv("AI_LOG_FLUSH_SECONDS", "1.0")),
+    max_queue=int(os.getenv("AI_LOG_MAX_QUEUE", "10000")),
+)
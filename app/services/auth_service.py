@@ -4,7 +4,11 @@ from app.models.user import User, GenderEnum
 from app.models.health_status import HealthStatus, ActivityLevelEnum
 from datetime import datetime, date
 import bcrypt
+import logging
 import re
+from app.core.tracing import traced_methods
+
+logger = logging.getLogger(__name__)
 
 
 def _validate_password_strength(password: str) -> tuple[bool, str]:
@@ -34,6 +38,7 @@ def _validate_password_strength(password: str) -> tuple[bool, str]:
     return True, "Password is strong"
 
 
+@traced_methods
 class AuthService:
     def __init__(self, repo: UserRepository, health_repo: HealthRepository):
         self.repo = repo
@@ -87,10 +92,9 @@ class AuthService:
         if weight <= 0 or height <= 0:
             raise ValueError("Weight and height must be positive numbers.")
 
-        height_m = height / 100
-        bmi = round(weight / (height_m**2), 2)
+        # Same formulas as the precomputed targets the dashboard shows
+        from app.core.nutrition_targets import ACTIVITY_MULTIPLIERS, ages_on, compute_targets
 
-        activity_multipliers = {"Sedentary": 1.2, "Moderate": 1.55, "Active": 1.725}
         activity_keys = {
             "low": "Sedentary",
             "sedentary": "Sedentary",
@@ -106,41 +110,30 @@ class AuthService:
             normalized_level = activity_keys.get(
                 str(activity_level).lower(), "Sedentary"
             )
-            if str(activity_level) in activity_multipliers:
+            if str(activity_level) in {level.value for level in ActivityLevelEnum}:
                 normalized_level = str(activity_level)
 
-        multiplier = activity_multipliers.get(normalized_level, 1.2)
         try:
             act_enum = ActivityLevelEnum(normalized_level)
         except ValueError:
             act_enum = ActivityLevelEnum.Sedentary
 
-        # Calculate age with validation
-        age = date.today().year - dob.year
-        # Adjust for birthday not yet occurred this year
-        if date.today() < dob.replace(year=date.today().year):
-            age -= 1
-
-        # Constrain age to reasonable bounds (1-120 years)
-        age = max(1, min(age, 120))
-
-        is_male = gender == GenderEnum.Male
-
-        # Mifflin-St Jeor Equation for BMR
-        if is_male:
-            bmr = (10 * weight) + (6.25 * height) - (5 * age) + 5
-        else:
-            bmr = (10 * weight) + (6.25 * height) - (5 * age) - 161
-
-        # Ensure BMR is never below a safe minimum (800 kcal for children/small adults)
-        bmr = max(bmr, 800)
+        ages, _ = ages_on([dob], date.today())
+        targets = compute_targets(
+            weight, height, ages[0], gender == GenderEnum.Male, ACTIVITY_MULTIPLIERS[act_enum]
+        )
 
-        tdee = round(bmr * multiplier, 2)
+        return {"bmi": float(targets["bmi"]), "tdee": float(targets["tdee"]), "activity_enum": act_enum}
 
-        # Final safety check - TDEE should never be negative
-        tdee = max(tdee, 1000)
+    def _refresh_targets(self, user_id: int) -> None:
+        from app.core.nutrition_targets import recompute_users
 
-        return {"bmi": bmi, "tdee": tdee, "activity_enum": act_enum}
+        try:
+            recompute_users(self.repo.db, [user_id])
+        except Exception:
+            # The health row is committed; the next targets run catches up
+            logger.exception("Could not recompute nutrition targets of user %s", user_id)
+            self.repo.db.rollback()
 
     def complete_onboarding(
         self,
@@ -185,6 +178,7 @@ class AuthService:
         )
 
         self.health_repo.create(health)
+        self._refresh_targets(user.id)
         self.repo.db.refresh(user)
 
         return user
@@ -213,6 +207,7 @@ class AuthService:
         )
 
         self.health_repo.create(new_health)
+        self._refresh_targets(user_id)
 
         return new_health
 
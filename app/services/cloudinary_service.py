@@ -1,9 +1,15 @@
 import cloudinary
 import cloudinary.uploader
+import logging
 import os
+import time
 from dotenv import load_dotenv
 
+from app.core.metrics import CLOUDINARY_UPLOAD
+from app.core.tracing import span
+
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 # Configure Cloudinary
 cloudinary.config(
@@ -22,9 +28,13 @@ class CloudinaryService:
         :param folder: The folder in Cloudinary to store the image.
         :return: The URL of the uploaded image or None if failed.
         """
+        started = time.perf_counter()
         try:
-            upload_result = cloudinary.uploader.upload(file_content, folder=folder)
+            with span("cloudinary.upload", folder=folder):
+                upload_result = cloudinary.uploader.upload(file_content, folder=folder)
+            CLOUDINARY_UPLOAD.observe(time.perf_counter() - started, outcome="ok")
             return upload_result.get("secure_url")
         except Exception as e:
-            print(f"Cloudinary upload error: {e}")
+            CLOUDINARY_UPLOAD.observe(time.perf_counter() - started, outcome="error")
+            logger.warning("Cloudinary upload error: %s", e)
             return None
@@ -0,0 +1,139 @@
+# app/services/export_service.py
+import csv
+import enum
+import io
+import json
+from datetime import date, datetime
+from typing import Callable, Iterable, Iterator, List
+
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.repositories.food_logs_repository import FoodLogRepository
+from app.repositories.health_repository import HealthRepository
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+FOOD_LOG_FIELDS = [
+    "id",
+    "eaten_at",
+    "meal_type",
+    "final_food_name",
+    "calories",
+    "protein",
+    "carbs",
+    "fat",
+    "food_id",
+    "personal_food_id",
+    "image_url",
+    "created_at",
+]
+
+HEALTH_FIELDS = [
+    "id",
+    "updated_at",
+    "weight_kg",
+    "height_cm",
+    "bmi",
+    "tdee",
+    "activity_level",
+]
+
+
+def _to_plain(value):
+    """Convert DB values into CSV/JSON friendly primitives."""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class ExportService:
+    """
+    Streams a user's data as CSV or NDJSON.
+
+    Each export opens its own session so the server-side cursor stays alive
+    for as long as the response is being sent, independently of the request
+    scoped session handed out by ``get_db``.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        batch_size: int = 1000,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+
+    def stream_food_logs(self, user_id: int, fmt: str = "csv") -> Iterator[str]:
+        """Yield the user's food diary, oldest entry first."""
+        return self._stream(
+            lambda db: FoodLogRepository(db).stream_by_user(user_id, self.batch_size),
+            FOOD_LOG_FIELDS,
+            fmt,
+        )
+
+    def stream_health_history(self, user_id: int, fmt: str = "csv") -> Iterator[str]:
+        """Yield the user's weight / BMI / TDEE history, oldest entry first."""
+        return self._stream(
+            lambda db: HealthRepository(db).stream_history_by_user(user_id, self.batch_size),
+            HEALTH_FIELDS,
+            fmt,
+        )
+
+    def _stream(
+        self,
+        query_factory: Callable[[Session], Iterable],
+        fields: List[str],
+        fmt: str,
+    ) -> Iterator[str]:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+
+        db = self.session_factory()
+        try:
+            rows = query_factory(db)
+            if fmt == "csv":
+                yield from self._iter_csv(rows, fields)
+            else:
+                yield from self._iter_ndjson(rows, fields)
+        finally:
+            db.close()
+
+    def _iter_csv(self, rows: Iterable, fields: List[str]) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        # Send the header right away so the download starts immediately
+        yield self._drain(buffer)
+
+        for i, row in enumerate(rows, start=1):
+            writer.writerow([_to_plain(v) for v in row])
+            if i % self.batch_size == 0:
+                yield self._drain(buffer)
+
+        if buffer.tell():
+            yield self._drain(buffer)
+
+    def _iter_ndjson(self, rows: Iterable, fields: List[str]) -> Iterator[str]:
+        chunk = []
+        for row in rows:
+            record = {k: _to_plain(v) for k, v in zip(fields, row)}
+            chunk.append(json.dumps(record, ensure_ascii=False))
+            if len(chunk) >= self.batch_size:
+                yield "\n".join(chunk) + "\n"
+                chunk = []
+
+        if chunk:
+            yield "\n".join(chunk) + "\n"
+
+    @staticmethod
+    def _drain(buffer: io.StringIO) -> str:
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return data
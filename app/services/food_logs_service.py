@@ -1,7 +1,46 @@
+import logging
+import os
+from urllib.parse import urlsplit
+
 from app.repositories import FoodLogRepository
 from app.models.food_logs import FoodLog
+from app.core.tracing import traced_methods
+
+logger = logging.getLogger(__name__)
+
+# Host of the secure_url Cloudinary returns for uploaded photos
+DELIVERY_HOST = "res.cloudinary.com"
+
 
+def is_delivery_url(url) -> bool:
+    """
+    True for an https URL of an asset in our Cloudinary account, the only
+    photo URLs food logs store and the embedding index build fetches.
+    """
+    if not isinstance(url, str):
+        return False
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return False
+    if parts.scheme != "https" or parts.hostname != DELIVERY_HOST or port not in (None, 443):
+        return False
+    if parts.username or parts.password:
+        return False
+    cloud_name = os.getenv("CLOUDINARY_CLOUD_NAME")
+    return not cloud_name or parts.path.startswith(f"/{cloud_name}/")
 
+
+def _checked_image_url(image_url):
+    # The URL comes back from the camera page in a hidden form field
+    if image_url and not is_delivery_url(image_url):
+        logger.warning("Ignoring food log image_url outside Cloudinary: %.200s", image_url)
+        return None
+    return image_url or None
+
+
+@traced_methods
 class FoodLogService:
     def __init__(self, repo: FoodLogRepository):
         self.repo = repo
@@ -25,7 +64,7 @@ class FoodLogService:
             user_id=user_id,
             food_id=food_id,
             personal_food_id=personal_food_id,
-            image_url=image_url,
+            image_url=_checked_image_url(image_url),
             final_food_name=final_food_name,
             calories=int(round(calories)),  # Enforce Int
             carbs=carbs,
@@ -36,6 +75,35 @@ class FoodLogService:
         )
         return self.repo.create(food_log)
 
+    def add_food_logs_from_foods(
+        self,
+        user_id: int,
+        foods_with_portions: list,
+        meal_type: str = "Snack",
+        image_url=None,
+    ):
+        """Log several catalog foods eaten together, as [(food, portion)]."""
+        from datetime import datetime
+
+        eaten_at = datetime.now()
+        image_url = _checked_image_url(image_url)
+        food_logs = [
+            FoodLog(
+                user_id=user_id,
+                food_id=food.id,
+                image_url=image_url,
+                final_food_name=food.name,
+                calories=int(round(food.calories * portion)),
+                carbs=(food.carbs or 0) * portion,
+                protein=(food.protein or 0) * portion,
+                fat=(food.fat or 0) * portion,
+                meal_type=meal_type,
+                eaten_at=eaten_at,
+            )
+            for food, portion in foods_with_portions
+        ]
+        return self.repo.create_many(food_logs)
+
     def get_recent_food_logs(self, user_id: int, limit: int = 10):
         return self.repo.get_recent_by_user(user_id, limit)
 
@@ -1,11 +1,32 @@
 # app/services/food_service.py
 from sqlalchemy.orm import Session
-from typing import Optional, List
+from typing import Optional, List, Iterator, IO, Tuple
+import csv
+import io
+import json
+import logging
+import math
+import os
 
-from app.repositories.food_repository import FoodRepository
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.repositories.food_repository import FOOD_BY_SLUG, FOOD_SEARCH, FoodRepository
+from app.repositories.personal_food_repository import PersonalFoodRepository
 from app.models.foods import Food
+from app.core.tracing import traced_methods
+
+logger = logging.getLogger(__name__)
 
+IMPORT_FORMATS = {"csv", "json", "ndjson"}
+IMPORT_CHUNK_SIZE = 500
+# Column limits: foods.calories is an INTEGER, macros are NUMERIC(5, 1)
+MAX_IMPORT_CALORIES = 2**31 - 1
+MAX_IMPORT_GRAMS = 9999.9
+# Minimum cosine similarity for a nearest-neighbour food suggestion
+SIMILARITY_THRESHOLD = 0.5
 
+
+@traced_methods
 class FoodService:
     """Service layer for food operations."""
     
@@ -21,6 +42,11 @@ class FoodService:
         """Get food by ID."""
         return self.food_repo.get_by_id(food_id)
     
+    def get_foods_by_ids(self, food_ids: List[int]) -> List[Food]:
+        """Get several foods by ID, in the order of ``food_ids``."""
+        foods = {food.id: food for food in self.food_repo.get_by_ids(food_ids)}
+        return [foods[food_id] for food_id in food_ids if food_id in foods]
+
     def get_food_by_ai_slug(self, ai_slug: str) -> Optional[Food]:
         """Get food by AI prediction label (slug)."""
         return self.food_repo.get_by_ai_slug(ai_slug)
@@ -80,3 +106,254 @@ class FoodService:
     def search_foods_fts(self, query: str, user_id: int = None, limit: int = 10) -> list:
         """Search foods using full-text search."""
         return self.food_repo.search_foods_fts(query, user_id=user_id, limit=limit)
+
+    def similarity_search_available(self) -> bool:
+        """True once an embedding index has been built."""
+        from app.core.embedding_index import INDEX_PATH
+
+        return os.path.exists(INDEX_PATH)
+
+    def suggest_similar_foods(
+        self,
+        embedding,
+        user_id: int = None,
+        limit: int = 3,
+        min_similarity: float = SIMILARITY_THRESHOLD,
+    ) -> list:
+        """
+        Foods whose reference photos look most like the given image embedding.
+
+        Covers catalog foods and the user's own personal foods, including
+        dishes outside the classifier's labels. Returns the same dicts as
+        ``search_foods_fts`` plus a ``similarity`` score, best first; empty
+        when no embedding index has been built.
+        """
+        # Lazy: NumPy and the index are only needed when the camera misses
+        from app.core.embedding_index import KIND_PERSONAL, get_index
+
+        index = get_index()
+        if index is None:
+            return []
+        matches = [
+            m for m in index.search(embedding, k=limit, owner_id=user_id)
+            if m[2] >= min_similarity
+        ]
+        food_ids = [item_id for kind, item_id, _ in matches if kind != KIND_PERSONAL]
+        personal_ids = [item_id for kind, item_id, _ in matches if kind == KIND_PERSONAL]
+        foods = {f.id: f for f in self.food_repo.get_by_ids(food_ids)}
+        personal = {}
+        if personal_ids and user_id is not None:
+            personal = {
+                f.id: f
+                for f in PersonalFoodRepository(self.db).get_by_ids_for_user(personal_ids, user_id)
+            }
+
+        results = []
+        for kind, item_id, similarity in matches:
+            food = personal.get(item_id) if kind == KIND_PERSONAL else foods.get(item_id)
+            if food is None:
+                # Deleted since the index was built
+                continue
+            results.append(
+                {
+                    "id": food.id,
+                    "name": food.name,
+                    "unit": food.unit,
+                    "calories": food.calories,
+                    "carbs": float(food.carbs or 0),
+                    "protein": float(food.protein or 0),
+                    "fat": float(food.fat or 0),
+                    "is_personal": kind == KIND_PERSONAL,
+                    "similarity": round(similarity, 3),
+                }
+            )
+        return results
+
+    def bulk_import_foods(
+        self, stream: IO[bytes], fmt: str, chunk_size: int = IMPORT_CHUNK_SIZE
+    ) -> dict:
+        """
+        Validate and upsert foods from a CSV / JSON / NDJSON upload.
+
+        Rows are read lazily and sent to the database in chunks keyed on
+        ``ai_slug`` (on name for rows without one); invalid rows, and chunks
+        the database rejects, are skipped and reported with their line
+        numbers instead of aborting the whole import.
+
+        Returns:
+            Dict with ``processed``, ``upserted`` and a list of ``errors``
+        """
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"Unsupported import format: {fmt}")
+
+        report = {"processed": 0, "upserted": 0, "errors": []}
+        # ai_slug -> (line, row), and lowercased name -> (line, row) for rows
+        # without a slug, which have no conflict key and are deduped on name
+        chunk = {}
+        unslugged = {}
+        seen_names = set()
+
+        for line_no, raw in self._iter_import_rows(stream, fmt, report):
+            report["processed"] += 1
+            try:
+                row = self._validate_import_row(raw)
+            except ValueError as e:
+                report["errors"].append({"row": line_no, "error": str(e)})
+                continue
+
+            if row["ai_slug"] is None:
+                name_key = row["name"].lower()
+                if name_key in seen_names:
+                    report["errors"].append(
+                        {
+                            "row": line_no,
+                            "error": f"Duplicate name '{row['name']}' without ai_slug, skipped",
+                        }
+                    )
+                    continue
+                seen_names.add(name_key)
+                unslugged[name_key] = (line_no, row)
+            else:
+                if row["ai_slug"] in chunk:
+                    report["errors"].append(
+                        {
+                            "row": line_no,
+                            "error": f"Duplicate ai_slug '{row['ai_slug']}' in chunk, last row wins",
+                        }
+                    )
+                chunk[row["ai_slug"]] = (line_no, row)
+
+            if len(chunk) + len(unslugged) >= chunk_size:
+                report["upserted"] += self._flush_import_chunk(chunk, unslugged, report)
+
+        report["upserted"] += self._flush_import_chunk(chunk, unslugged, report)
+        if report["upserted"]:
+            # Once per import rather than per chunk
+            FOOD_BY_SLUG.invalidate()
+            FOOD_SEARCH.invalidate()
+
+        logger.info(
+            "Bulk food import: processed=%s upserted=%s errors=%s",
+            report["processed"],
+            report["upserted"],
+            len(report["errors"]),
+        )
+        return report
+
+    def _flush_import_chunk(self, chunk: dict, unslugged: dict, report: dict) -> int:
+        """
+        Upsert one chunk, in its own transaction.
+
+        Rows without an ``ai_slug`` are plain inserts, so those whose name is
+        already in the catalog (e.g. from an earlier run of the same file) are
+        skipped. A database error rolls back and is reported for the chunk;
+        chunks already committed stay imported.
+        """
+        entries = list(chunk.values()) + list(unslugged.values())
+        chunk.clear()
+        if not entries:
+            return 0
+        lines = [line_no for line_no, _ in entries]
+        try:
+            existing = self.food_repo.get_unslugged_names([row["name"] for _, row in unslugged.values()])
+            for line_no, row in unslugged.values():
+                if row["name"].lower() in existing:
+                    report["errors"].append(
+                        {
+                            "row": line_no,
+                            "error": f"Food '{row['name']}' without ai_slug already exists, skipped",
+                        }
+                    )
+            rows = [row for _, row in entries if row["ai_slug"] is not None or row["name"].lower() not in existing]
+            return self.food_repo.upsert_many(rows)
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.exception("Bulk food import: chunk of lines %s-%s failed", min(lines), max(lines))
+            report["errors"].append(
+                {
+                    "row": f"{min(lines)}-{max(lines)}",
+                    "error": f"Chunk of {len(entries)} rows not imported: {type(e).__name__}: {getattr(e, 'orig', e)}",
+                }
+            )
+            return 0
+        finally:
+            unslugged.clear()
+
+    @staticmethod
+    def _iter_import_rows(
+        stream: IO[bytes], fmt: str, report: dict
+    ) -> Iterator[Tuple[int, dict]]:
+        """Yield ``(line_number, raw_row)`` pairs read lazily from the upload."""
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+        try:
+            if fmt == "csv":
+                reader = csv.DictReader(text)
+                for raw in reader:
+                    yield reader.line_num, raw
+            elif fmt == "ndjson":
+                for line_no, line in enumerate(text, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        yield line_no, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        report["processed"] += 1
+                        report["errors"].append({"row": line_no, "error": f"Invalid JSON: {e.msg}"})
+            else:
+                try:
+                    data = json.load(text)
+                except json.JSONDecodeError as e:
+                    report["errors"].append({"row": e.lineno, "error": f"Invalid JSON: {e.msg}"})
+                    return
+                if not isinstance(data, list):
+                    report["errors"].append({"row": 1, "error": "Expected a JSON array of foods"})
+                    return
+                for index, raw in enumerate(data, start=1):
+                    yield index, raw
+        finally:
+            # Leave the caller's file open, it owns the underlying stream
+            text.detach()
+
+    @staticmethod
+    def _validate_import_row(raw) -> dict:
+        """Normalize one imported row, raising ``ValueError`` on bad data."""
+        if not isinstance(raw, dict):
+            raise ValueError("Row must be an object")
+
+        name = str(raw.get("name") or "").strip()
+        if not name:
+            raise ValueError("Missing name")
+
+        def _number(key: str, maximum: float, default=0.0) -> float:
+            value = raw.get(key)
+            if value is None or (isinstance(value, str) and not value.strip()):
+                return default
+            try:
+                number = float(value)
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError(f"Invalid {key}: {value!r}")
+            if not math.isfinite(number):
+                raise ValueError(f"Invalid {key}: {value!r}")
+            if number < 0:
+                raise ValueError(f"{key} must not be negative")
+            if number > maximum:
+                raise ValueError(f"{key} must not exceed {maximum}")
+            return number
+
+        calories = _number("calories", MAX_IMPORT_CALORIES, None)
+        if calories is None:
+            raise ValueError("Missing calories")
+
+        ai_slug = str(raw.get("ai_slug") or "").strip() or None
+        unit = str(raw.get("unit") or "").strip() or "phần"
+
+        return {
+            "name": name,
+            "ai_slug": ai_slug,
+            "unit": unit,
+            "calories": int(round(calories)),
+            # Stored as NUMERIC(5, 1)
+            "carbs": round(_number("carbs", MAX_IMPORT_GRAMS), 1),
+            "protein": round(_number("protein", MAX_IMPORT_GRAMS), 1),
+            "fat": round(_number("fat", MAX_IMPORT_GRAMS), 1),
+        }
@@ -0,0 +1,114 @@
+"""
+Memory and query latency of the food embedding index.
+
+Fills ``EmbeddingIndex`` with synthetic clustered 1536-d embeddings (photos
+of the same dish are close to each other) and reports, per storage dtype and
+search mode, the index memory, build time, p50 / p95 query latency, and
+how often the best food (recall@1) and the k best foods (recall@k) match
+exact float32 search.
+
+Usage:
+    python -m benchmarks.bench_embedding_index [--size 100000] [--queries 200] [--k 10]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.core.embedding_index import DTYPES, EMBEDDING_DIM, KIND_FOOD, EmbeddingIndex, normalize
+
+
+def synthetic_embeddings(size: int, foods: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((foods, EMBEDDING_DIM), dtype=np.float32))
+    item_ids = rng.integers(0, foods, size=size)
+    noise = rng.standard_normal((size, EMBEDDING_DIM), dtype=np.float32) * 0.03
+    return normalize(centers[item_ids] + noise), item_ids, centers
+
+
+def _percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(size: int, queries: int, k: int, foods: int, n_probe: int) -> list:
+    vectors, item_ids, centers = synthetic_embeddings(size, foods)
+    rng = np.random.default_rng(1)
+    query_items = rng.integers(0, foods, size=queries)
+    query_vectors = normalize(
+        centers[query_items] + rng.standard_normal((queries, EMBEDDING_DIM), dtype=np.float32) * 0.03
+    )
+
+    # Ground truth: distinct foods ranked by exact float32 similarity
+    truth = []
+    for q in query_vectors:
+        scores = vectors @ q
+        ranked = []
+        for row in np.argsort(-scores):
+            if item_ids[row] not in ranked:
+                ranked.append(item_ids[row])
+            if len(ranked) == k:
+                break
+        truth.append([int(i) for i in ranked])
+
+    print(f"float32 matrix for reference: {vectors.nbytes / 2**20:.1f} MB")
+    results = []
+    for dtype in DTYPES:
+        index = EmbeddingIndex(dtype=dtype)
+        started = time.perf_counter()
+        index.add(vectors, np.full(size, KIND_FOOD), item_ids)
+        add_seconds = time.perf_counter() - started
+
+        for mode in ("exact", "ivf"):
+            build_seconds = 0.0
+            if mode == "ivf":
+                started = time.perf_counter()
+                index.build_ivf()
+                build_seconds = time.perf_counter() - started
+
+            latencies = []
+            hits = top_hits = 0
+            for q, expected in zip(query_vectors, truth):
+                started = time.perf_counter()
+                found = index.search(q, k=k, exact=mode == "exact", n_probe=n_probe)
+                latencies.append((time.perf_counter() - started) * 1000)
+                found_ids = [item_id for _, item_id, _ in found]
+                hits += len(set(expected) & set(found_ids))
+                top_hits += bool(found_ids) and found_ids[0] == expected[0]
+
+            results.append(
+                {
+                    "dtype": dtype,
+                    "mode": mode,
+                    "memory_mb": index.memory_bytes() / 2**20,
+                    "build_s": add_seconds + build_seconds,
+                    "p50_ms": _percentile(latencies, 50),
+                    "p95_ms": _percentile(latencies, 95),
+                    "recall_1": top_hits / queries,
+                    "recall_k": hits / (queries * k),
+                }
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--foods", type=int, default=2000, help="Distinct foods in the index")
+    parser.add_argument("--n-probe", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{args.size} embeddings of {args.foods} foods, {args.queries} queries, k={args.k}")
+    print(f"{'dtype':<9}{'mode':<7}{'memory MB':>11}{'build s':>9}{'p50 ms':>9}{'p95 ms':>9}{'R@1':>7}{'R@k':>7}")
+    for r in run(args.size, args.queries, args.k, args.foods, args.n_probe):
+        print(
+            f"{r['dtype']:<9}{r['mode']:<7}{r['memory_mb']:>11.1f}{r['build_s']:>9.2f}"
+            f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['recall_1']:>7.3f}{r['recall_k']:>7.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
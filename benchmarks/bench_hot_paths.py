@@ -0,0 +1,354 @@
+"""
+Micro-benchmarks of repository, service and model hot paths.
+
+Each case is timed over ``--rounds`` rounds (after a warm-up round) for
+every data size it takes, and reported as min / median / mean / IQR per
+call, like pytest-benchmark. Save a run with ``--output`` and compare a
+later one with ``--baseline``: the run exits with status 1 when a case's
+median grows by more than ``--max-increase``.
+
+Cases and what their size means:
+
+* ``calculate_metrics``: ``AuthService._calculate_metrics`` (no size);
+* ``targets_batch``: the nutrition targets of a batch of N users, from
+  query rows to upsert rows (``app.core.nutrition_targets``);
+* ``health_status``: ``User.health_status`` over N history rows;
+* ``preprocess``: ``VNFoodClassifier._preprocess`` of a JPEG N pixels wide
+  (needs torchvision, not the weights);
+* ``logs_by_date``, ``calories_by_date``, ``average_macros``: the diary and
+  dashboard queries for a user with N food logs over the last 30 days;
+* ``search_fts``: ``FoodRepository.search_foods_fts`` for a user with N
+  personal foods.
+
+The database cases need ``DATABASE_URL`` to point at a PostgreSQL database
+with the schema of database_schemas.txt (e.g. one seeded by
+``benchmarks.seed_data``): the queries cast timestamps to dates and search
+with PostgreSQL full-text search. They insert their own bench users and
+delete them afterwards. Without PostgreSQL they are skipped.
+
+Usage:
+    python -m benchmarks.bench_hot_paths [-k search] [--sizes 100,1000,10000]
+        [--rounds 50] [--output hot.json] [--baseline hot-main.json] [--max-increase 0.15]
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+BENCH_EMAIL_TEMPLATE = "microbench+{}@example.com"
+HEALTH_HISTORY_SIZES = (1, 10, 100)
+IMAGE_WIDTHS = (640, 1280, 3024)
+
+
+def _measure(fn, rounds: int) -> dict:
+    fn()
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    quartiles = statistics.quantiles(timings, n=4) if len(timings) > 1 else [timings[0]] * 3
+    return {
+        "rounds": rounds,
+        "min_ms": round(min(timings) * 1000, 4),
+        "median_ms": round(statistics.median(timings) * 1000, 4),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 4),
+        "iqr_ms": round((quartiles[2] - quartiles[0]) * 1000, 4),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Pure Python cases
+# ---------------------------------------------------------------------------
+
+
+def bench_calculate_metrics(rounds: int, sizes) -> dict:
+    from app.models.user import GenderEnum
+    from app.services.auth_service import AuthService
+
+    service = AuthService(None, None)
+    dob = date(1990, 6, 15)
+    return {
+        "-": _measure(
+            lambda: service._calculate_metrics(68.0, 172.0, dob, GenderEnum.Male, "Moderate"), rounds
+        )
+    }
+
+
+def bench_targets_batch(rounds: int, sizes) -> dict:
+    from app.core.nutrition_targets import _target_rows
+    from app.models.health_status import ActivityLevelEnum
+    from app.models.user import GenderEnum
+
+    rng = random.Random(0)
+    today = date.today()
+    results = {}
+    for size in sizes:
+        inputs = [
+            (
+                i,
+                date(1960, 1, 1) + timedelta(days=rng.randint(0, 365 * 45)),
+                rng.choice((GenderEnum.Male, GenderEnum.Female)),
+                i,
+                rng.uniform(45, 95),
+                rng.uniform(150, 190),
+                rng.choice(list(ActivityLevelEnum)),
+            )
+            for i in range(size)
+        ]
+        results[str(size)] = _measure(lambda: _target_rows(inputs, today), rounds)
+    return results
+
+
+def bench_health_status(rounds: int, sizes) -> dict:
+    import app.models  # noqa: F401  (configures every mapper)
+    from app.models.health_status import HealthStatus
+    from app.models.user import User
+
+    results = {}
+    now = datetime.now()
+    for size in HEALTH_HISTORY_SIZES:
+        history = [
+            HealthStatus(id=i, weight_kg=70.0, height_cm=170.0, updated_at=now - timedelta(days=i))
+            for i in range(size)
+        ]
+        user = User(id=1, email="bench@example.com", password_hash="-", dob=date(1990, 1, 1))
+        user._health_history = history
+        results[str(size)] = _measure(lambda: user.health_status, rounds)
+    return results
+
+
+def bench_preprocess(rounds: int, sizes) -> dict:
+    from PIL import Image
+
+    from app.core.ai_predictor import LoadedModel, VNFoodClassifier
+
+    classifier = VNFoodClassifier.standalone()
+    loaded = LoadedModel(None, [], classifier._create_transforms(), "bench", "none")
+    results = {}
+    for width in IMAGE_WIDTHS:
+        # Noise keeps the JPEG about as large as a real photo of that size
+        image = Image.effect_noise((width, width * 3 // 4), 64).convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+        payload = [buffer.getvalue()]
+        results[str(width)] = _measure(lambda: classifier._preprocess(payload, loaded), rounds)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# PostgreSQL cases
+# ---------------------------------------------------------------------------
+
+
+class BenchUsers:
+    """Creates one user per size with N food logs and N personal foods."""
+
+    def __init__(self, db):
+        self.db = db
+        self.user_ids = {}
+
+    def get(self, size: int) -> int:
+        if size in self.user_ids:
+            return self.user_ids[size]
+        from sqlalchemy import text
+
+        db = self.db
+        email = BENCH_EMAIL_TEMPLATE.format(size)
+        db.execute(text("DELETE FROM users WHERE email = :email"), {"email": email})
+        user_id = db.execute(
+            text(
+                "INSERT INTO users (email, password_hash, full_name, dob) "
+                "VALUES (:email, '-', 'Micro Bench', '1990-01-01') RETURNING id"
+            ),
+            {"email": email},
+        ).scalar()
+        rng = random.Random(size)
+        now = datetime.now()
+        db.execute(
+            text(
+                "INSERT INTO food_logs (user_id, final_food_name, calories, carbs, protein, fat, eaten_at) "
+                "VALUES (:user_id, :name, :calories, 40, 20, 10, :eaten_at)"
+            ),
+            [
+                {
+                    "user_id": user_id,
+                    "name": f"Phở bò {i}",
+                    "calories": rng.randint(100, 900),
+                    "eaten_at": now - timedelta(seconds=rng.randint(0, 30 * 86400)),
+                }
+                for i in range(size)
+            ],
+        )
+        db.execute(
+            text(
+                "INSERT INTO personal_foods (user_id, name, calories) VALUES (:user_id, :name, :calories)"
+            ),
+            [
+                {"user_id": user_id, "name": f"Phở gà nhà làm {i}", "calories": 400}
+                for i in range(size)
+            ],
+        )
+        db.commit()
+        db.execute(text("ANALYZE food_logs"))
+        db.execute(text("ANALYZE personal_foods"))
+        self.user_ids[size] = user_id
+        return user_id
+
+    def cleanup(self) -> None:
+        from sqlalchemy import text
+
+        if self.user_ids:
+            # food_logs and personal_foods go with the user (ON DELETE CASCADE)
+            self.db.execute(text("DELETE FROM users WHERE id = ANY(:ids)"), {"ids": list(self.user_ids.values())})
+            self.db.commit()
+
+
+def bench_logs_by_date(rounds: int, sizes, users: BenchUsers) -> dict:
+    from app.repositories.food_logs_repository import FoodLogRepository
+
+    repo = FoodLogRepository(users.db)
+    today = date.today()
+    results = {}
+    for size in sizes:
+        user_id = users.get(size)
+        results[str(size)] = _measure(lambda: repo.get_by_user_and_date(user_id, today), rounds)
+        users.db.expunge_all()
+    return results
+
+
+def bench_calories_by_date(rounds: int, sizes, users: BenchUsers) -> dict:
+    from app.repositories.food_logs_repository import FoodLogRepository
+
+    repo = FoodLogRepository(users.db)
+    today = date.today()
+    results = {}
+    for size in sizes:
+        user_id = users.get(size)
+        results[str(size)] = _measure(lambda: repo.get_total_calories_by_date(user_id, today), rounds)
+    return results
+
+
+def bench_average_macros(rounds: int, sizes, users: BenchUsers) -> dict:
+    from app.repositories.food_logs_repository import FoodLogRepository
+    from app.services.food_logs_service import FoodLogService
+
+    service = FoodLogService(FoodLogRepository(users.db))
+    results = {}
+    for size in sizes:
+        user_id = users.get(size)
+        results[str(size)] = _measure(lambda: service.get_average_macros(user_id), rounds)
+        users.db.expunge_all()
+    return results
+
+
+def bench_search_fts(rounds: int, sizes, users: BenchUsers) -> dict:
+    from app.repositories.food_repository import FoodRepository
+
+    repo = FoodRepository(users.db)
+    results = {}
+    for size in sizes:
+        user_id = users.get(size)
+        # A prefix, as typed in the search box, matching catalog and personal foods
+        results[str(size)] = _measure(lambda: repo.search_foods_fts("pho g", user_id=user_id), rounds)
+    return results
+
+
+PURE_CASES = {
+    "calculate_metrics": bench_calculate_metrics,
+    "targets_batch": bench_targets_batch,
+    "health_status": bench_health_status,
+    "preprocess": bench_preprocess,
+}
+DB_CASES = {
+    "logs_by_date": bench_logs_by_date,
+    "calories_by_date": bench_calories_by_date,
+    "average_macros": bench_average_macros,
+    "search_fts": bench_search_fts,
+}
+
+
+def compare(result: dict, baseline: dict, max_increase: float) -> list:
+    failures = []
+    for case, by_size in result.items():
+        for size, row in by_size.items():
+            reference = baseline.get(case, {}).get(size)
+            if reference is None:
+                continue
+            limit = reference["median_ms"] * (1 + max_increase)
+            if row["median_ms"] > limit:
+                failures.append(
+                    f"{case}[{size}]: median {row['median_ms']:.3f}ms > {limit:.3f}ms "
+                    f"(baseline {reference['median_ms']:.3f}ms +{max_increase:.0%})"
+                )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-k", dest="keyword", default=None, help="Only cases whose name contains this")
+    parser.add_argument("--sizes", default="100,1000,10000", help="Rows per bench user (database cases)")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--max-increase", type=float, default=0.15)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    def selected(cases: dict) -> dict:
+        return {n: f for n, f in cases.items() if not args.keyword or args.keyword in n}
+
+    result = {}
+    for name, case in selected(PURE_CASES).items():
+        try:
+            result[name] = case(args.rounds, sizes)
+        except ImportError as e:
+            print(f"skipped {name}: {e}")
+
+    db_cases = selected(DB_CASES)
+    if db_cases:
+        if not os.getenv("DATABASE_URL", "").startswith("postgresql"):
+            print(f"skipped {', '.join(db_cases)}: DATABASE_URL is not a PostgreSQL database")
+        else:
+            from app.core.database import SessionLocal
+
+            db = SessionLocal()
+            users = BenchUsers(db)
+            try:
+                for name, case in db_cases.items():
+                    result[name] = case(args.rounds, sizes, users)
+            finally:
+                db.rollback()
+                users.cleanup()
+                db.close()
+
+    print(f"{'case':<20}{'size':>8}{'min ms':>12}{'median ms':>12}{'mean ms':>12}{'iqr ms':>12}")
+    for name, by_size in result.items():
+        for size, row in by_size.items():
+            print(
+                f"{name:<20}{size:>8}{row['min_ms']:>12.4f}{row['median_ms']:>12.4f}"
+                f"{row['mean_ms']:>12.4f}{row['iqr_ms']:>12.4f}"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    failures = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures = compare(result, json.load(f), args.max_increase)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Per-worker memory of the food classifier, private copy vs memory-mapped.
+
+Starts N worker processes for each weights mode, loads and warms up the
+model in each of them, then reads ``/proc/<pid>/smaps_rollup`` to report
+RSS, PSS (proportional share of shared pages) and USS (pages private to the
+process). With shared weights the USS per worker should drop by roughly the
+size of the checkpoint and the PSS sum should approach a single copy.
+
+Linux only. Usage:
+    python -m benchmarks.bench_model_memory [--workers 4] [--model food_model.pth]
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+
+MODES = ("private", "mmap")
+
+
+def _worker(mode: str, model_path: str, labels_path: str, ready, stop):
+    os.environ["MODEL_WEIGHTS_MMAP"] = "true" if mode == "mmap" else "false"
+    from app.core.ai_predictor import predictor
+
+    if not predictor.load_model(model_path, labels_path):
+        ready.put((os.getpid(), False))
+        return
+    predictor.warmup((1,))
+    ready.put((os.getpid(), predictor.status()["weights"] == mode))
+    stop.wait()
+
+
+def _smaps_rollup(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1])  # kB
+    return {
+        "rss_mb": values.get("Rss", 0) / 1024,
+        "pss_mb": values.get("Pss", 0) / 1024,
+        "uss_mb": (values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)) / 1024,
+    }
+
+
+def measure(mode: str, workers: int, model_path: str, labels_path: str) -> list:
+    ctx = mp.get_context("spawn")
+    ready = ctx.Queue()
+    stop = ctx.Event()
+    procs = [
+        ctx.Process(target=_worker, args=(mode, model_path, labels_path, ready, stop))
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+
+    results = []
+    try:
+        for _ in procs:
+            pid, ok = ready.get(timeout=600)
+            if not ok:
+                print(f"[{mode}] worker {pid} could not load the model in this mode")
+        for p in procs:
+            results.append({"pid": p.pid, **_smaps_rollup(p.pid)})
+    finally:
+        stop.set()
+        for p in procs:
+            p.join(timeout=30)
+    return results
+
+
+def main():
+    if not sys.platform.startswith("linux"):
+        sys.exit("smaps_rollup is only available on Linux")
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--model", default="food_model.pth")
+    parser.add_argument("--labels", default="labels.txt")
+    args = parser.parse_args()
+
+    print(f"checkpoint size: {os.path.getsize(args.model) / 2**20:.1f} MB")
+    for mode in MODES:
+        rows = measure(mode, args.workers, args.model, args.labels)
+        print(f"\n[{mode}] {'pid':>8}{'RSS MB':>10}{'PSS MB':>10}{'USS MB':>10}")
+        for r in rows:
+            print(f"{'':>9}{r['pid']:>8}{r['rss_mb']:>10.1f}{r['pss_mb']:>10.1f}{r['uss_mb']:>10.1f}")
+        print(
+            f"{'total':>17}{sum(r['rss_mb'] for r in rows):>10.1f}"
+            f"{sum(r['pss_mb'] for r in rows):>10.1f}{sum(r['uss_mb'] for r in rows):>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
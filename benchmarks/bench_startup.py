@@ -0,0 +1,113 @@
+"""
+Cold-start import budget check.
+
+Imports ``app.main`` in a fresh interpreter with ``-X importtime`` and
+reports the slowest top-level modules. Exits with status 1 when the import
+takes longer than the budget (``--budget-ms``, ``STARTUP_BUDGET_MS``) or
+when torch gets imported eagerly; ``tests/test_startup.py`` runs the same
+check with the test suite.
+
+Usage:
+    python -m benchmarks.bench_startup [--budget-ms 1500] [--top 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+PROBE = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import app.main\n"
+    "print('IMPORT_MS', (time.perf_counter() - start) * 1000)\n"
+    "print('TORCH_LOADED', 'torch' in sys.modules)\n"
+)
+
+# Heavy modules that must stay out of the import path of the web app
+FORBIDDEN_MODULES = ("torch", "torchvision")
+
+DEFAULT_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+
+
+def _parse_importtime(stderr: str) -> list:
+    """Return (cumulative_us, module) for top-level imports."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            _, self_us, cumulative_us, name = [p.strip() for p in line.split("|")]
+        except ValueError:
+            continue
+        # Top-level imports are not indented in -X importtime output
+        if not name.startswith(" "):
+            rows.append((int(cumulative_us), name))
+    return sorted(rows, reverse=True)
+
+
+def measure() -> dict:
+    """
+    Import ``app.main`` in a fresh interpreter. Returns ``import_ms``,
+    ``wall_ms``, ``torch_loaded`` and the top-level ``modules`` as
+    (cumulative_us, name), slowest first.
+    """
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"import app.main failed:\n{proc.stderr[-2000:]}")
+
+    result = {"import_ms": None, "wall_ms": wall_ms, "torch_loaded": None}
+    for line in proc.stdout.splitlines():
+        if line.startswith("IMPORT_MS"):
+            result["import_ms"] = float(line.split()[1])
+        elif line.startswith("TORCH_LOADED"):
+            result["torch_loaded"] = line.split()[1] == "True"
+    result["modules"] = _parse_importtime(proc.stderr)
+    return result
+
+
+def check(result: dict, budget_ms: float = DEFAULT_BUDGET_MS) -> list:
+    """Budget violations of a ``measure()`` result."""
+    failures = []
+    if result["import_ms"] > budget_ms:
+        failures.append(f"import took {result['import_ms']:.1f} ms > {budget_ms:.1f} ms")
+    if result["torch_loaded"]:
+        failures.append(f"one of {FORBIDDEN_MODULES} was imported at startup")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    try:
+        result = measure()
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+
+    print(f"{'module':<50}{'cumulative ms':>15}")
+    for cumulative_us, name in result["modules"][: args.top]:
+        print(f"{name.strip():<50}{cumulative_us / 1000:>15.1f}")
+    print()
+    print(f"import app.main: {result['import_ms']:.1f} ms (process wall time {result['wall_ms']:.1f} ms)")
+    print(f"budget: {args.budget_ms:.1f} ms, torch imported: {result['torch_loaded']}")
+
+    failures = check(result, args.budget_ms)
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Render-time benchmark for the main pages.
+
+Renders each page template against synthetic data through the shared
+environment from ``app.core.templates`` and reports, per page, the cold
+render (first render, includes compilation or bytecode cache load) and the
+mean / p95 of warm renders.
+
+Usage:
+    python -m benchmarks.bench_templates [--iterations 200] [--rows 50]
+"""
+
+import argparse
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from app.core.templates import templates, fragment_cache
+
+
+def _fake_request(path: str):
+    return SimpleNamespace(url=SimpleNamespace(path=path))
+
+
+def _fake_user(i: int = 1):
+    return SimpleNamespace(
+        id=i,
+        email=f"user{i}@example.com",
+        full_name=f"User {i}",
+        avatar_url=None,
+        created_at=datetime(2024, 1, 1),
+        password_hash="$2b$12$" + "x" * 53,
+        role=SimpleNamespace(value="admin" if i == 1 else "user"),
+        health_status=SimpleNamespace(weight_kg=65.0, height_cm=170.0, tdee=2200.0),
+    )
+
+
+def _fake_log(i: int):
+    return SimpleNamespace(
+        id=i,
+        final_food_name=f"Phở bò {i}",
+        calories=450,
+        image_url=None,
+        personal_food=None,
+        eaten_at=datetime.now() - timedelta(hours=i),
+        meal_type=SimpleNamespace(value=["Breakfast", "Lunch", "Dinner", "Snack"][i % 4]),
+    )
+
+
+def _fake_food(i: int):
+    return SimpleNamespace(
+        id=i,
+        name=f"Món {i}",
+        ai_slug=f"mon_{i}",
+        unit="tô",
+        calories=300 + i,
+        protein=10.0,
+        carbs=40.0,
+        fat=8.0,
+        image_url=None,
+    )
+
+
+def build_pages(rows: int) -> dict:
+    """Template name -> context, covering the most visited pages."""
+    today = date.today()
+    user = _fake_user()
+    logs = [_fake_log(i) for i in range(rows)]
+    meals = {"Breakfast": [], "Lunch": [], "Dinner": [], "Snack": []}
+    for log in logs:
+        meals[log.meal_type.value].append(log)
+
+    return {
+        "dashboard.html": {
+            "request": _fake_request("/home/dashboard"),
+            "user": user,
+            "recent_meals": logs[:5],
+            "daily_calories": 1350,
+            "today": today,
+            "yesterday": today - timedelta(days=1),
+        },
+        "diary.html": {
+            "request": _fake_request("/home/diary"),
+            "user": user,
+            "selected_date": today,
+            "prev_date": today - timedelta(days=1),
+            "next_date": today + timedelta(days=1),
+            "meals": meals,
+            "total_calories": sum(l.calories for l in logs),
+        },
+        "profile.html": {
+            "request": _fake_request("/home/profile"),
+            "user": user,
+            "avg_macros": {"calories": 1800, "protein": 70, "carbs": 220, "fat": 60},
+        },
+        "meals.html": {
+            "request": _fake_request("/home/meals"),
+            "user": user,
+            "personal_foods": [_fake_food(i) for i in range(rows)],
+            "dates": [f"{i:02d}/01" for i in range(1, 31)],
+            "weights": [65.0 + i * 0.1 for i in range(30)],
+        },
+        "admin_foods.html": {
+            "request": _fake_request("/admin/foods"),
+            "user": user,
+            "foods": [_fake_food(i) for i in range(rows * 2)],
+            "csrf_token": "benchmark-token",
+        },
+        "admin_users.html": {
+            "request": _fake_request("/admin/users"),
+            "user": user,
+            "users": [_fake_user(i) for i in range(rows * 2)],
+        },
+    }
+
+
+def _percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(iterations: int, rows: int) -> list:
+    results = []
+    for name, context in build_pages(rows).items():
+        fragment_cache.clear()
+        start = time.perf_counter()
+        template = templates.env.get_template(name)
+        template.render(context)
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            template.render(context)
+            samples.append((time.perf_counter() - start) * 1000)
+
+        results.append(
+            {
+                "page": name,
+                "cold_ms": round(cold_ms, 3),
+                "mean_ms": round(statistics.mean(samples), 3),
+                "p95_ms": round(_percentile(samples, 95), 3),
+            }
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'page':<20}{'cold ms':>10}{'mean ms':>10}{'p95 ms':>10}")
+    for r in run(args.iterations, args.rows):
+        print(f"{r['page']:<20}{r['cold_ms']:>10}{r['mean_ms']:>10}{r['p95_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
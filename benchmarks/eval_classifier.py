@@ -0,0 +1,306 @@
+"""
+Offline accuracy and speed evaluation of the food classifier.
+
+Runs a labeled image folder (one sub-directory per ``ai_slug``, as in
+``labels.txt``) through ``VNFoodClassifier`` with a torch ``DataLoader``
+(decode + preprocessing in worker processes) and reports top-1 / top-5
+accuracy, per-class accuracy and confusions, throughput and p50/p95/p99
+batch latency. With ``--tta-threshold`` low-confidence images go through
+the confidence-gated test-time augmentation, and the report includes how
+often it triggered. The JSON report can be compared against a previous run to
+catch regressions between model versions.
+
+Usage:
+    python -m benchmarks.eval_classifier --data data/val [--model food_model.pth]
+        [--version <registry version>] [--batch-size 32] [--workers 4]
+        [--threads N] [--backend eager|torchscript] [--device cpu|cuda]
+        [--tta-threshold 0.5] [--output report.json] [--baseline old_report.json]
+        [--max-top1-drop 0.01] [--max-p95-increase 0.2]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+BACKENDS = ("eager", "torchscript")
+
+
+def find_samples(data_dir: str, labels: list) -> tuple:
+    """Return ([(path, label_index)], [unknown class directories])."""
+    index = {label: i for i, label in enumerate(labels)}
+    samples = []
+    unknown = []
+    for name in sorted(os.listdir(data_dir)):
+        class_dir = os.path.join(data_dir, name)
+        if not os.path.isdir(class_dir):
+            continue
+        if name not in index:
+            unknown.append(name)
+            continue
+        for root, _, files in os.walk(class_dir):
+            for file_name in sorted(files):
+                if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                    samples.append((os.path.join(root, file_name), index[name]))
+    return samples, unknown
+
+
+class ImageFolderDataset:
+    """Map-style dataset decoding images with the classifier's transform."""
+
+    def __init__(self, samples: list, transform):
+        self.samples = samples
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, i):
+        import torch
+        from PIL import Image
+
+        path, target = self.samples[i]
+        try:
+            with Image.open(path) as image:
+                tensor = self.transform(image.convert("RGB"))
+            ok = True
+        except Exception:
+            # Keep batch shapes intact; unreadable files are reported, not scored
+            tensor = torch.zeros(3, 300, 300)
+            ok = False
+        return tensor, target, ok
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _load_classifier(args):
+    from app.core.ai_predictor import VNFoodClassifier
+    from app.core.model_registry import registry
+
+    classifier = VNFoodClassifier.standalone()
+    model_path, labels_path, version = args.model, args.labels, None
+    if args.version:
+        model_version = registry.get(args.version)
+        if model_version is None:
+            sys.exit(f"Unknown model version: {args.version}")
+        model_path, labels_path, version = (
+            model_version.model_path, model_version.labels_path, model_version.version
+        )
+    if args.device:
+        import torch
+
+        classifier._device = torch.device(args.device)
+    with classifier._load_lock:
+        if not classifier._load_model_locked(model_path, labels_path, version):
+            sys.exit(f"Could not load the model: {classifier.status()['error']}")
+    return classifier
+
+
+def _select_backend(classifier, backend: str, batch_size: int):
+    """Return a callable batch -> logits for the requested backend."""
+    import torch
+
+    if backend == "eager":
+        return classifier.logits
+
+    loaded = classifier._loaded
+    example = torch.zeros(batch_size, 3, 300, 300, device=classifier._device)
+    with torch.no_grad():
+        traced = torch.jit.optimize_for_inference(torch.jit.trace(loaded.model, example))
+
+    def run(batch):
+        with torch.no_grad():
+            return traced(batch.to(classifier._device))
+
+    return run
+
+
+def evaluate(args) -> dict:
+    import torch
+    from torch.utils.data import DataLoader
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    classifier = _load_classifier(args)
+    labels = classifier.labels
+    samples, unknown = find_samples(args.data, labels)
+    if args.limit:
+        samples = samples[: args.limit]
+    if not samples:
+        sys.exit(f"No images found for known labels under {args.data}")
+
+    loader = DataLoader(
+        ImageFolderDataset(samples, classifier.transform),
+        batch_size=args.batch_size,
+        num_workers=args.workers,
+        pin_memory=classifier._device.type == "cuda",
+    )
+    forward = _select_backend(classifier, args.backend, args.batch_size)
+
+    # Warm-up outside of the measured window
+    forward(torch.zeros(args.batch_size, 3, 300, 300))
+
+    top_k = min(5, len(labels))
+    top1 = top5 = scored = unreadable = tta_triggered = 0
+    per_class = defaultdict(Counter)
+    batch_ms = []
+
+    started = time.perf_counter()
+    for images, targets, ok in loader:
+        batch_start = time.perf_counter()
+        outputs = forward(images)
+        if args.tta_threshold > 0:
+            outputs, refined = classifier.refine_logits(
+                images.to(classifier._device), outputs, args.tta_threshold
+            )
+            tta_triggered += int(refined[ok].sum())
+        if classifier._device.type == "cuda":
+            torch.cuda.synchronize()
+        batch_ms.append((time.perf_counter() - batch_start) * 1000)
+
+        predicted = outputs.topk(top_k, dim=1).indices.cpu()
+        for row, target, readable in zip(predicted.tolist(), targets.tolist(), ok.tolist()):
+            if not readable:
+                unreadable += 1
+                continue
+            scored += 1
+            top1 += row[0] == target
+            top5 += target in row
+            per_class[target][row[0]] += 1
+    wall_seconds = time.perf_counter() - started
+
+    classes = {}
+    for target, predictions in sorted(per_class.items()):
+        support = sum(predictions.values())
+        confusions = [
+            {"label": labels[p], "count": n}
+            for p, n in predictions.most_common()
+            if p != target
+        ][:5]
+        classes[labels[target]] = {
+            "support": support,
+            "accuracy": round(predictions[target] / support, 4),
+            "top_confusions": confusions,
+        }
+
+    model_seconds = sum(batch_ms) / 1000
+    return {
+        "model_version": classifier.model_version,
+        "data": os.path.abspath(args.data),
+        "config": {
+            "batch_size": args.batch_size,
+            "workers": args.workers,
+            "threads": torch.get_num_threads(),
+            "backend": args.backend,
+            "device": str(classifier._device),
+            "torch": torch.__version__,
+        },
+        "images": scored,
+        "unreadable_images": unreadable,
+        "unknown_classes": unknown,
+        "top1_accuracy": round(top1 / scored, 4) if scored else 0.0,
+        "top5_accuracy": round(top5 / scored, 4) if scored else 0.0,
+        "tta": {
+            "threshold": args.tta_threshold,
+            "triggered": tta_triggered,
+            "trigger_rate": round(tta_triggered / scored, 4) if scored else 0.0,
+        },
+        "throughput": {
+            # End to end includes decoding in the DataLoader workers
+            "images_per_sec": round((scored + unreadable) / wall_seconds, 2),
+            "model_images_per_sec": round((scored + unreadable) / model_seconds, 2)
+            if model_seconds
+            else None,
+        },
+        "batch_latency_ms": {
+            "p50": round(_percentile(batch_ms, 50), 2),
+            "p95": round(_percentile(batch_ms, 95), 2),
+            "p99": round(_percentile(batch_ms, 99), 2),
+        },
+        "per_class": classes,
+    }
+
+
+def compare(report: dict, baseline: dict, max_top1_drop: float, max_p95_increase: float) -> list:
+    """Return a list of regressions of ``report`` against ``baseline``."""
+    failures = []
+    top1_drop = baseline["top1_accuracy"] - report["top1_accuracy"]
+    if top1_drop > max_top1_drop:
+        failures.append(
+            f"top-1 accuracy {report['top1_accuracy']:.4f} vs {baseline['top1_accuracy']:.4f}"
+        )
+    old_p95 = baseline["batch_latency_ms"]["p95"]
+    new_p95 = report["batch_latency_ms"]["p95"]
+    if old_p95 and (new_p95 - old_p95) / old_p95 > max_p95_increase:
+        failures.append(f"p95 batch latency {new_p95:.1f} ms vs {old_p95:.1f} ms")
+    if report["config"]["batch_size"] != baseline["config"]["batch_size"]:
+        print("warning: baseline used a different batch size, latency is not comparable")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--data", required=True, help="Folder with one sub-folder per label")
+    parser.add_argument("--model", default="food_model.pth")
+    parser.add_argument("--labels", default="labels.txt")
+    parser.add_argument("--version", default=None, help="Evaluate a registry version instead")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--backend", choices=BACKENDS, default="eager")
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--tta-threshold", type=float, default=0.0, help="0 disables TTA")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--max-top1-drop", type=float, default=0.01)
+    parser.add_argument("--max-p95-increase", type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = evaluate(args)
+
+    print(f"model {report['model_version']} on {report['images']} images")
+    print(f"top-1 {report['top1_accuracy']:.4f}   top-5 {report['top5_accuracy']:.4f}")
+    if args.tta_threshold > 0:
+        print(f"TTA triggered on {report['tta']['trigger_rate']:.1%} of images")
+    print(
+        f"{report['throughput']['images_per_sec']} img/s end to end, "
+        f"{report['throughput']['model_images_per_sec']} img/s model only"
+    )
+    latency = report["batch_latency_ms"]
+    print(f"batch latency ms: p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}")
+    worst = sorted(report["per_class"].items(), key=lambda kv: kv[1]["accuracy"])[:10]
+    print("\nweakest classes:")
+    for label, row in worst:
+        confused = ", ".join(f"{c['label']}({c['count']})" for c in row["top_confusions"][:3])
+        print(f"  {label:<30}{row['accuracy']:>8.3f}{row['support']:>6}  {confused}")
+    if report["unknown_classes"]:
+        print(f"\nskipped folders not in labels: {', '.join(report['unknown_classes'])}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nreport written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures = compare(report, baseline, args.max_top1_drop, args.max_p95_increase)
+        if failures:
+            print("REGRESSION: " + "; ".join(failures))
+            sys.exit(1)
+        print(f"no regression against {args.baseline} ({baseline.get('model_version')})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+EXPLAIN ANALYZE report of the repository queries on a seeded database.
+
+Runs the hot repository methods for one user, captures the SQL they send
+(so the report follows the code, not a copy of its queries) and runs each
+statement again under ``EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)``. Foreign
+key cascades are measured by deleting a food and a food log inside a
+transaction that is rolled back. For each case it keeps the median
+execution time, the buffers touched, the scans (node, table, index) and,
+for deletes, the time spent in foreign key triggers.
+
+Take a report before and after a migration and compare them:
+
+Usage:
+    python -m benchmarks.explain_report --output before.json
+    alembic upgrade head
+    python -m benchmarks.explain_report --output after.json --compare before.json
+        [--user-id 42] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+from datetime import date, timedelta
+
+from sqlalchemy import event, text
+
+EXPLAIN = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+
+
+def _scans(plan: dict, found: list) -> list:
+    node = plan.get("Node Type", "")
+    if "Scan" in node:
+        found.append(
+            " ".join(
+                part for part in (node, plan.get("Relation Name"), plan.get("Index Name")) if part
+            )
+        )
+    for child in plan.get("Plans", []):
+        _scans(child, found)
+    return found
+
+
+def _summarize(explained: list) -> dict:
+    """Merge the EXPLAIN outputs of the statements of one case."""
+    runs = []
+    for statements in explained:
+        runs.append(sum(e["Execution Time"] for e in statements))
+    last = explained[-1]
+    return {
+        "execution_ms": round(statistics.median(runs), 3),
+        "planning_ms": round(sum(e["Planning Time"] for e in last), 3),
+        "shared_hit": sum(e["Plan"].get("Shared Hit Blocks", 0) for e in last),
+        "shared_read": sum(e["Plan"].get("Shared Read Blocks", 0) for e in last),
+        "scans": sorted({scan for e in last for scan in _scans(e["Plan"], [])}),
+        "triggers_ms": {
+            t["Trigger Name"]: round(t["Time"], 3) for e in last for t in e.get("Triggers", [])
+        },
+    }
+
+
+class Capture:
+    """Records the statements executed on an engine while active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def _explain(db, statement: str, parameters) -> dict:
+    row = db.connection().exec_driver_sql(EXPLAIN + statement, parameters).scalar()
+    return (json.loads(row) if isinstance(row, str) else row)[0]
+
+
+def _read_cases(user_id: int, log_id: int):
+    from app.repositories.food_logs_repository import FoodLogRepository
+    from app.repositories.food_repository import FoodRepository
+    from app.repositories.health_repository import HealthRepository
+    from app.repositories.personal_food_repository import PersonalFoodRepository
+    from app.services.food_logs_service import FoodLogService
+
+    # The seeded history ends today; yesterday is a full day of logs
+    day = date.today() - timedelta(days=1)
+    return {
+        "diary_day": lambda db: FoodLogRepository(db).get_by_user_and_date(user_id, day),
+        "daily_calories": lambda db: FoodLogRepository(db).get_total_calories_by_date(user_id, day),
+        "average_macros_7d": lambda db: FoodLogService(FoodLogRepository(db)).get_average_macros(user_id),
+        "recent_meals": lambda db: FoodLogRepository(db).get_recent_by_user(user_id),
+        "log_by_id_for_user": lambda db: FoodLogRepository(db).get_by_id_for_user(log_id, user_id),
+        "latest_health": lambda db: HealthRepository(db).get_latest_by_user(user_id),
+        "personal_foods": lambda db: PersonalFoodRepository(db).get_by_user(user_id),
+        "search_fts": lambda db: FoodRepository(db).search_foods_fts("pho", user_id=user_id),
+        "pending_queue": lambda db: db.execute(
+            text(
+                "SELECT id, name FROM personal_foods WHERE approval_status = 'Pending' "
+                "ORDER BY created_at LIMIT 50"
+            )
+        ).all(),
+    }
+
+
+def _delete_cases(food_id: int, log_id: int) -> dict:
+    # Executed by EXPLAIN ANALYZE, then rolled back
+    return {
+        "delete_food_set_null": ("DELETE FROM foods WHERE id = %(id)s", {"id": food_id}),
+        "delete_log_cascade": ("DELETE FROM food_logs WHERE id = %(id)s", {"id": log_id}),
+    }
+
+
+def build_report(db, engine, user_id: int, repeat: int) -> dict:
+    log_id = db.execute(
+        text("SELECT id FROM food_logs WHERE user_id = :u ORDER BY eaten_at DESC LIMIT 1"), {"u": user_id}
+    ).scalar()
+    # The least used food: its delete measures the foreign key lookup, not mass updates
+    food_id = db.execute(text("SELECT MAX(id) FROM foods")).scalar()
+    if log_id is None or food_id is None:
+        sys.exit(f"User {user_id} has no food logs or the foods table is empty; seed the database first")
+
+    cases = {}
+    for name, run in _read_cases(user_id, log_id).items():
+        with Capture(engine) as capture:
+            run(db)
+        db.expunge_all()
+        explained = [
+            [_explain(db, statement, parameters) for statement, parameters in capture.statements]
+            for _ in range(repeat)
+        ]
+        cases[name] = _summarize(explained)
+        db.rollback()
+
+    for name, (statement, parameters) in _delete_cases(food_id, log_id).items():
+        explained = []
+        for _ in range(repeat):
+            explained.append([_explain(db, statement, parameters)])
+            db.rollback()
+        cases[name] = _summarize(explained)
+
+    version = db.execute(text("SHOW server_version")).scalar()
+    rows = db.execute(text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'food_logs'")).scalar()
+    return {"server_version": version, "food_logs_estimate": rows, "user_id": user_id, "cases": cases}
+
+
+def _print(report: dict, before: dict = None) -> None:
+    print(f"PostgreSQL {report['server_version']}, ~{report['food_logs_estimate']:,} food logs, user {report['user_id']}")
+    if before is None:
+        print(f"{'case':<24}{'exec ms':>10}{'plan ms':>10}{'hit':>9}{'read':>9}  scans")
+        for name, case in report["cases"].items():
+            print(
+                f"{name:<24}{case['execution_ms']:>10.2f}{case['planning_ms']:>10.2f}"
+                f"{case['shared_hit']:>9}{case['shared_read']:>9}  {'; '.join(case['scans'])}"
+            )
+            for trigger, ms in case["triggers_ms"].items():
+                print(f"{'':<24}{ms:>10.2f}  trigger {trigger}")
+        return
+
+    print(f"{'case':<24}{'before ms':>11}{'after ms':>10}{'speedup':>9}")
+    for name, case in report["cases"].items():
+        old = before["cases"].get(name)
+        if old is None:
+            print(f"{name:<24}{'-':>11}{case['execution_ms']:>10.2f}")
+            continue
+        speedup = old["execution_ms"] / case["execution_ms"] if case["execution_ms"] else float("inf")
+        print(f"{name:<24}{old['execution_ms']:>11.2f}{case['execution_ms']:>10.2f}{speedup:>8.1f}x")
+        if old["scans"] != case["scans"]:
+            print(f"{'':<24}  before: {'; '.join(old['scans'])}")
+            print(f"{'':<24}  after:  {'; '.join(case['scans'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--user-id", type=int, default=None, help="Defaults to the first seeded user")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None, help="Report of an earlier run")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL", "").startswith("postgresql"):
+        sys.exit("DATABASE_URL must point at a seeded PostgreSQL database")
+
+    import app.models  # noqa: F401  (configures every mapper)
+    from app.core.database import SessionLocal, engine
+
+    db = SessionLocal()
+    try:
+        user_id = args.user_id or db.execute(text("SELECT MIN(id) FROM users")).scalar()
+        report = build_report(db, engine, user_id, args.repeat)
+    finally:
+        db.rollback()
+        db.close()
+
+    before = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            before = json.load(f)
+    _print(report, before)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+End-to-end load test driving scripted user journeys against a running app.
+
+Each virtual user logs in as one of the users created by
+``benchmarks.seed_data`` and then loops over a journey: open the dashboard,
+page back through the diary, type a search query one keystroke at a time
+(every prefix of two characters or more hits ``/camera/search_food``, as the
+search box does) and, with ``--image``, upload a photo to ``/camera/result``.
+Latencies are recorded per route; the first ``--warmup`` seconds are not.
+
+The report gives throughput and p50 / p90 / p95 / p99 latency per route.
+Save it with ``--output`` and compare a later run with ``--baseline``: the
+run exits with status 1 when a route's p95 grows by more than
+``--max-p95-increase`` or its error rate exceeds ``--max-error-rate``.
+Results record the machine and the journey settings; a baseline taken with
+different ones is reported as not comparable, and a missing one only warns.
+
+Usage:
+    python -m benchmarks.seed_data --reset --users 100000 --food-logs 50000000
+    python -m benchmarks.load_test --start-server [--base-url http://127.0.0.1:8000]
+        [--users 100000] [--concurrency 50] [--duration 60] [--warmup 10]
+        [--image dish.jpg] [--output run.json] [--baseline baseline.json]
+        [--max-p95-increase 0.2] [--max-error-rate 0.01] [--seed 42]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+import httpx
+
+from benchmarks.seed_data import EMAIL_TEMPLATE, LOADTEST_PASSWORD
+
+PERCENTILES = (50, 90, 95, 99)
+
+SEARCH_QUERIES = (
+    "pho bo", "com tam", "bun cha", "banh mi", "goi cuon", "bun bo hue", "chao ga",
+    "xoi xeo", "ca kho", "canh chua", "banh xeo", "mi quang", "com ga", "hu tieu",
+)
+
+
+class Recorder:
+    def __init__(self, warmup_until: float):
+        self.warmup_until = warmup_until
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            # Redirects are expected answers (login, expired session), not errors
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            response = None
+            failed = True
+        elapsed = time.perf_counter() - started
+        if time.monotonic() >= self.warmup_until:
+            self.latencies[route].append(elapsed)
+            if failed:
+                self.errors[route] += 1
+        return response
+
+    def report(self, measured_seconds: float) -> dict:
+        routes = {}
+        for route, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            row = {
+                "requests": len(values),
+                "rps": round(len(values) / measured_seconds, 2),
+                "error_rate": round(self.errors[route] / len(values), 4),
+            }
+            for p in PERCENTILES:
+                index = min(len(values) - 1, int(len(values) * p / 100))
+                row[f"p{p}_ms"] = round(values[index] * 1000, 2)
+            routes[route] = row
+        return routes
+
+
+async def _login(client: httpx.AsyncClient, recorder: Recorder, user_index: int) -> bool:
+    response = await recorder.request(
+        client,
+        "POST /account/login",
+        "POST",
+        "/account/login",
+        data={"email": EMAIL_TEMPLATE.format(user_index), "password": LOADTEST_PASSWORD},
+    )
+    if response is None or response.status_code != 303:
+        return False
+    # The cookie is set with Secure, so httpx will not send it back over http
+    token = response.cookies.get("access_token")
+    if not token:
+        return False
+    client.cookies.set("access_token", token)
+    return True
+
+
+async def _journey(client: httpx.AsyncClient, recorder: Recorder, rng: random.Random, image) -> None:
+    await recorder.request(client, "GET /home/dashboard", "GET", "/home/dashboard")
+
+    today = date.today()
+    for days_back in range(rng.randint(1, 4)):
+        day = (today - timedelta(days=days_back)).isoformat()
+        await recorder.request(client, "GET /home/diary", "GET", "/home/diary", params={"date": day})
+
+    query = rng.choice(SEARCH_QUERIES)
+    for end in range(2, len(query) + 1):
+        await recorder.request(
+            client, "GET /camera/search_food", "GET", "/camera/search_food", params={"q": query[:end]}
+        )
+        # Keystroke interval of a fast typist
+        await asyncio.sleep(rng.uniform(0.05, 0.15))
+
+    if image is not None:
+        name, content = image
+        await recorder.request(
+            client,
+            "POST /camera/result",
+            "POST",
+            "/camera/result",
+            files={"file": (name, content, "image/jpeg")},
+        )
+
+
+async def _virtual_user(args, recorder: Recorder, deadline: float, worker: int, image) -> None:
+    rng = random.Random(args.seed * 1000 + worker)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        while time.monotonic() < deadline:
+            if not await _login(client, recorder, rng.randrange(args.users)):
+                await asyncio.sleep(1.0)
+                continue
+            # A session lasts a few journeys before the next user logs in
+            for _ in range(rng.randint(1, 5)):
+                if time.monotonic() >= deadline:
+                    break
+                await _journey(client, recorder, rng, image)
+                await asyncio.sleep(rng.uniform(0, args.think_time))
+            client.cookies.clear()
+
+
+async def run(args) -> dict:
+    image = None
+    if args.image:
+        with open(args.image, "rb") as f:
+            image = (os.path.basename(args.image), f.read())
+
+    started = time.monotonic()
+    recorder = Recorder(warmup_until=started + args.warmup)
+    deadline = started + args.warmup + args.duration
+    await asyncio.gather(
+        *(_virtual_user(args, recorder, deadline, i, image) for i in range(args.concurrency))
+    )
+    measured = max(time.monotonic() - recorder.warmup_until, 1e-9)
+    routes = recorder.report(measured)
+    total = sum(r["requests"] for r in routes.values())
+    return {
+        "base_url": args.base_url,
+        "machine": _machine(),
+        "concurrency": args.concurrency,
+        "duration_s": round(measured, 1),
+        "seed": args.seed,
+        "users": args.users,
+        "think_time": args.think_time,
+        "image": bool(args.image),
+        "requests": total,
+        "rps": round(total / measured, 2),
+        "routes": routes,
+    }
+
+
+def _machine() -> dict:
+    """Where the run happened: latencies only compare on the same hardware."""
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+def _load_baseline(path: str, result: dict) -> dict:
+    """The baseline at ``path``, or {} with a warning when there is none yet."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(
+            f"warning: no baseline at {path}, p95 not compared; "
+            f"save a run on the reference machine with --output {path} to create it"
+        )
+        return {}
+    for key in ("machine", "concurrency", "seed", "users", "think_time", "image"):
+        if key in baseline and baseline[key] != result[key]:
+            print(f"warning: baseline {key} differs ({baseline[key]!r} vs {result[key]!r}), latency is not comparable")
+    return baseline
+
+
+def _start_server(base_url: str) -> subprocess.Popen:
+    port = httpx.URL(base_url).port or 8000
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"]
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            sys.exit(f"Server exited with status {proc.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health/live", timeout=1.0).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    sys.exit("Server did not become live within 120s")
+
+
+def compare(result: dict, baseline: dict, max_p95_increase: float, max_error_rate: float) -> list:
+    """Human-readable regressions of ``result`` against ``baseline``."""
+    failures = []
+    for route, row in result["routes"].items():
+        if row["error_rate"] > max_error_rate:
+            failures.append(f"{route}: error rate {row['error_rate']:.2%} > {max_error_rate:.2%}")
+        reference = baseline.get("routes", {}).get(route)
+        if reference is None:
+            continue
+        limit = reference["p95_ms"] * (1 + max_p95_increase)
+        if row["p95_ms"] > limit:
+            failures.append(
+                f"{route}: p95 {row['p95_ms']:.1f}ms > {limit:.1f}ms "
+                f"(baseline {reference['p95_ms']:.1f}ms +{max_p95_increase:.0%})"
+            )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--start-server", action="store_true", help="Run uvicorn for the duration of the test")
+    parser.add_argument("--users", type=int, default=100_000, help="Seeded users to log in as")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--warmup", type=float, default=10.0)
+    parser.add_argument("--think-time", type=float, default=1.0, help="Max pause between journeys (s)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--image", default=None, help="Photo to upload on every journey")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--max-p95-increase", type=float, default=0.2)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    server = _start_server(args.base_url) if args.start_server else None
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print(f"{result['requests']} requests in {result['duration_s']}s ({result['rps']} req/s)")
+    header = f"{'route':<28}{'reqs':>8}{'rps':>9}{'err':>8}" + "".join(f"{f'p{p} ms':>10}" for p in PERCENTILES)
+    print(header)
+    for route, row in result["routes"].items():
+        print(
+            f"{route:<28}{row['requests']:>8}{row['rps']:>9.1f}{row['error_rate']:>8.2%}"
+            + "".join(f"{row[f'p{p}_ms']:>10.1f}" for p in PERCENTILES)
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    baseline = _load_baseline(args.baseline, result) if args.baseline else {}
+    failures = compare(result, baseline, args.max_p95_increase, args.max_error_rate)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
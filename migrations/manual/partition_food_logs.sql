@@ -0,0 +1,155 @@
+-- =============================================
+-- RANGE-PARTITION FOOD_LOGS BY MONTH (manual, offline)
+-- =============================================
+-- Optional, for large databases (tens of millions of logs), after
+-- ``alembic upgrade head``. Not an Alembic revision: it cannot run online.
+-- Later revisions keep working: create_index_concurrently (migrations/online.py)
+-- builds indexes of a partitioned table partition by partition.
+--
+-- Diary and dashboard queries read one user's logs over a few days: with
+-- monthly partitions they only touch the indexes of the current month or
+-- two, which stay small and hot in cache, and old months can be detached or
+-- archived without a bulk DELETE.
+--
+-- The table is rebuilt in one transaction holding an ACCESS EXCLUSIVE lock:
+-- food_logs is unavailable while the rows are copied (about a minute per
+-- ten million rows). Run it in a maintenance window:
+--
+--     psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f migrations/manual/partition_food_logs.sql
+--
+-- What changes:
+-- * The primary key becomes (id, eaten_at) (a partitioned table's unique
+--   keys must contain the partition key) and eaten_at becomes NOT NULL.
+-- * ai_logs.food_log_id can no longer be a foreign key to food_logs(id);
+--   the ON DELETE CASCADE is kept by a trigger.
+-- * Lookups by id alone (get_by_id, get_by_id_for_user) probe the primary
+--   key index of every partition: still index scans, one per month.
+--
+-- Partitions cover the oldest log up to three months ahead, anything else
+-- lands in food_logs_default. Create the coming months before they start
+-- (a partition cannot be created over rows already in the default one),
+-- e.g. from a monthly cron job:
+--
+--     psql "$DATABASE_URL" -c "SELECT fn_food_logs_create_partitions(CURRENT_DATE, 3)"
+
+BEGIN;
+
+SET LOCAL lock_timeout = '10s';
+LOCK TABLE food_logs IN ACCESS EXCLUSIVE MODE;
+
+CREATE OR REPLACE FUNCTION fn_food_logs_create_partitions(from_month DATE, months_ahead INT DEFAULT 3)
+RETURNS INT AS $$
+DECLARE
+    month_start DATE := date_trunc('month', from_month)::date;
+    last_month DATE := (date_trunc('month', NOW()) + make_interval(months => months_ahead))::date;
+    partition_name TEXT;
+    created INT := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        partition_name := format('food_logs_y%sm%s', to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF food_logs FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, (month_start + INTERVAL '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE ai_logs DROP CONSTRAINT IF EXISTS ai_logs_food_log_id_fkey;
+ALTER TABLE food_logs RENAME TO food_logs_unpartitioned;
+
+CREATE TABLE food_logs (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    user_id BIGINT REFERENCES users(id) ON DELETE CASCADE NOT NULL,
+
+    food_id BIGINT REFERENCES foods(id) ON DELETE SET NULL,
+    personal_food_id BIGINT REFERENCES personal_foods(id) ON DELETE SET NULL,
+
+    image_url TEXT,
+    final_food_name TEXT NOT NULL,
+
+    calories INTEGER NOT NULL,
+    carbs NUMERIC(5, 1) DEFAULT 0,
+    protein NUMERIC(5, 1) DEFAULT 0,
+    fat NUMERIC(5, 1) DEFAULT 0,
+
+    meal_type meal_type_enum DEFAULT 'Breakfast',
+    eaten_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+
+    CONSTRAINT food_logs_partitioned_pkey PRIMARY KEY (id, eaten_at),
+    CONSTRAINT check_food_source CHECK (
+        (food_id IS NOT NULL AND personal_food_id IS NULL) OR
+        (food_id IS NULL AND personal_food_id IS NOT NULL) OR
+        (food_id IS NULL AND personal_food_id IS NULL)
+    )
+) PARTITION BY RANGE (eaten_at);
+
+CREATE TABLE food_logs_default PARTITION OF food_logs DEFAULT;
+
+SELECT fn_food_logs_create_partitions(
+    (SELECT COALESCE(MIN(eaten_at), NOW()) FROM food_logs_unpartitioned)::date, 3
+);
+
+INSERT INTO food_logs (
+    id, user_id, food_id, personal_food_id, image_url, final_food_name,
+    calories, carbs, protein, fat, meal_type, eaten_at, created_at
+)
+SELECT
+    id, user_id, food_id, personal_food_id, image_url, final_food_name,
+    calories, carbs, protein, fat, meal_type, COALESCE(eaten_at, created_at, NOW()), created_at
+FROM food_logs_unpartitioned;
+
+DO $$
+DECLARE
+    copied BIGINT;
+    original BIGINT;
+BEGIN
+    SELECT COUNT(*) INTO copied FROM food_logs;
+    SELECT COUNT(*) INTO original FROM food_logs_unpartitioned;
+    IF copied <> original THEN
+        RAISE EXCEPTION 'food_logs copy mismatch: % rows copied, % expected', copied, original;
+    END IF;
+END;
+$$;
+
+SELECT setval(
+    pg_get_serial_sequence('food_logs', 'id'),
+    (SELECT COALESCE(MAX(id), 0) + 1 FROM food_logs),
+    false
+);
+
+DROP TABLE food_logs_unpartitioned;
+ALTER TABLE food_logs RENAME CONSTRAINT food_logs_partitioned_pkey TO food_logs_pkey;
+
+-- Same indexes as revision 0002_query_indexes, created on every partition
+CREATE INDEX idx_food_logs_user_eaten_at ON food_logs(user_id, eaten_at) INCLUDE (calories);
+CREATE INDEX idx_food_logs_user_created ON food_logs(user_id, created_at DESC);
+CREATE INDEX idx_food_logs_food_id ON food_logs(food_id) WHERE food_id IS NOT NULL;
+CREATE INDEX idx_food_logs_personal_food_id ON food_logs(personal_food_id) WHERE personal_food_id IS NOT NULL;
+
+-- Replaces ai_logs.food_log_id REFERENCES food_logs(id) ON DELETE CASCADE.
+-- An UPDATE moving a log to another month is a delete plus an insert of the
+-- same id: the log still exists then, and its ai_logs rows are kept.
+CREATE OR REPLACE FUNCTION fn_food_logs_delete_ai_logs()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM ai_logs
+    WHERE food_log_id = OLD.id
+      AND NOT EXISTS (SELECT 1 FROM food_logs WHERE id = OLD.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_food_logs_delete_ai_logs
+    AFTER DELETE ON food_logs
+    FOR EACH ROW EXECUTE FUNCTION fn_food_logs_delete_ai_logs();
+
+COMMIT;
+
+ANALYZE food_logs;
@@ -0,0 +1,215 @@
+"""
+Helpers for schema changes that must not block writes (e.g. to food_logs).
+
+* ``create_index_concurrently`` / ``drop_index_concurrently``: build or drop
+  an index without the SHARE lock of a plain ``CREATE INDEX``; an INVALID
+  index left by an earlier failed build is dropped first. On a partitioned
+  table (see migrations/manual) the index is built on each partition and
+  attached, since PostgreSQL cannot build it concurrently on the parent.
+* ``lock_guarded``: run DDL that needs an ACCESS EXCLUSIVE lock (adding a
+  column, a constraint ``NOT VALID``...) with a short ``lock_timeout``, and
+  retry. Without it, the ALTER waits behind a long query and every query
+  arriving after it queues behind the ALTER.
+* ``backfill_in_batches``: UPDATE a large table by primary key ranges, one
+  committed transaction per batch, pausing between batches and while
+  replicas lag behind.
+
+All of them step out of the revision's transaction (Alembic's
+``autocommit_block``), so call them at the start or the end of a revision,
+not between statements that must be atomic with each other.
+
+Usage in a revision::
+
+    from migrations.online import backfill_in_batches, create_index_concurrently
+
+    def upgrade():
+        create_index_concurrently("idx_food_logs_food_id", "food_logs", "food_id",
+                                  where="food_id IS NOT NULL")
+"""
+
+import logging
+import time
+from typing import Optional
+
+from alembic import context, op
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger("alembic.online")
+
+# SQLSTATE of "could not obtain lock" (lock_timeout expired)
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+def _is_lock_timeout(error: OperationalError) -> bool:
+    return getattr(error.orig, "pgcode", None) == LOCK_NOT_AVAILABLE
+
+
+def _run_with_retries(statements: list, lock_timeout: str, retries: int, backoff: float) -> None:
+    """Execute ``statements`` (in an autocommit block), retrying on lock timeouts."""
+    op.execute(f"SET lock_timeout = '{lock_timeout}'")
+    try:
+        for statement in statements:
+            for attempt in range(retries + 1):
+                try:
+                    op.execute(statement)
+                    break
+                except OperationalError as e:
+                    if not _is_lock_timeout(e) or attempt == retries:
+                        raise
+                    delay = backoff * (2 ** attempt)
+                    logger.warning("Lock not acquired, retrying in %.1fs: %s", delay, statement)
+                    time.sleep(delay)
+    finally:
+        op.execute("RESET lock_timeout")
+
+
+def _drop_invalid_index(name: str) -> None:
+    if context.is_offline_mode():
+        return
+    invalid = op.get_bind().execute(
+        text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name},
+    ).scalar()
+    if invalid:
+        logger.warning("Dropping invalid index %s left by a failed build", name)
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def _partitions(table: str) -> Optional[list]:
+    """Partition names of ``table``, or None when it is not partitioned."""
+    if context.is_offline_mode():
+        return None
+    bind = op.get_bind()
+    kind = bind.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}).scalar()
+    if kind != "p":
+        return None
+    return list(
+        bind.execute(
+            text("SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass(:t)"),
+            {"t": table},
+        ).scalars()
+    )
+
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: str,
+    where: Optional[str] = None,
+    include: Optional[str] = None,
+    unique: bool = False,
+    lock_timeout: str = "5s",
+    retries: int = 3,
+    backoff: float = 2.0,
+) -> None:
+    """
+    ``CREATE [UNIQUE] INDEX CONCURRENTLY IF NOT EXISTS`` ``name`` on
+    ``table (columns) [INCLUDE (include)] [WHERE where]``.
+
+    ``columns``, ``include`` and ``where`` are SQL fragments, e.g.
+    ``"user_id, created_at DESC"``.
+    """
+    sql = f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"
+    if include:
+        sql += f" INCLUDE ({include})"
+    if where:
+        sql += f" WHERE {where}"
+    with op.get_context().autocommit_block():
+        partitions = _partitions(table)
+        if partitions is None:
+            _drop_invalid_index(name)
+            _run_with_retries([sql], lock_timeout, retries, backoff)
+            return
+
+        # Parent index first (ON ONLY: catalog only, stays invalid), then one
+        # concurrent build per partition attached to it; valid once all are
+        statements = [sql.replace(" CONCURRENTLY", "").replace(f" ON {table} ", f" ON ONLY {table} ")]
+        for partition in partitions:
+            child = f"{name}_{partition}"[:63]
+            _drop_invalid_index(child)
+            statements.append(sql.replace(f" {name} ON {table} ", f" {child} ON {partition} "))
+            statements.append(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+        _run_with_retries(statements, lock_timeout, retries, backoff)
+
+
+def drop_index_concurrently(name: str, lock_timeout: str = "5s", retries: int = 3, backoff: float = 2.0) -> None:
+    with op.get_context().autocommit_block():
+        statement = f"DROP INDEX CONCURRENTLY IF EXISTS {name}"
+        if not context.is_offline_mode():
+            kind = op.get_bind().execute(
+                text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"), {"name": name}
+            ).scalar()
+            if kind == "I":
+                # Index of a partitioned table: cannot be dropped concurrently
+                statement = f"DROP INDEX IF EXISTS {name}"
+        _run_with_retries([statement], lock_timeout, retries, backoff)
+
+
+def lock_guarded(*statements: str, lock_timeout: str = "3s", retries: int = 5, backoff: float = 1.0) -> None:
+    """
+    Run short DDL statements, each in its own transaction, giving up on a
+    lock after ``lock_timeout`` and retrying with exponential backoff.
+    """
+    with op.get_context().autocommit_block():
+        _run_with_retries(list(statements), lock_timeout, retries, backoff)
+
+
+def _replica_lag_seconds() -> float:
+    return float(
+        op.get_bind().execute(
+            text("SELECT COALESCE(MAX(EXTRACT(EPOCH FROM replay_lag)), 0) FROM pg_stat_replication")
+        ).scalar()
+    )
+
+
+def backfill_in_batches(
+    table: str,
+    set_clause: str,
+    where: Optional[str] = None,
+    key: str = "id",
+    batch_size: int = 10000,
+    pause: float = 0.05,
+    max_replica_lag: Optional[float] = 5.0,
+) -> int:
+    """
+    ``UPDATE table SET set_clause WHERE where`` over ``key`` ranges of
+    ``batch_size``, committing each batch. Returns the number of rows updated.
+
+    Each batch holds row locks on at most ``batch_size`` rows for a short
+    transaction, so concurrent writes only wait on the rows being updated.
+    ``where`` should exclude rows already done, so an interrupted backfill
+    can be run again. Offline (``--sql``) mode emits a single UPDATE.
+    """
+    condition = f" AND ({where})" if where else ""
+    if context.is_offline_mode():
+        op.execute(f"UPDATE {table} SET {set_clause} WHERE TRUE{condition}")
+        return 0
+
+    updated = 0
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        low, high = bind.execute(text(f"SELECT MIN({key}), MAX({key}) FROM {table}")).one()
+        if low is None:
+            return 0
+        statement = text(
+            f"UPDATE {table} SET {set_clause} WHERE {key} >= :start AND {key} < :stop{condition}"
+        )
+        started = time.monotonic()
+        for start in range(low, high + 1, batch_size):
+            updated += bind.execute(statement, {"start": start, "stop": start + batch_size}).rowcount
+            if max_replica_lag is not None:
+                while _replica_lag_seconds() > max_replica_lag:
+                    time.sleep(1.0)
+            if pause:
+                time.sleep(pause)
+            done = min(start + batch_size, high + 1) - low
+            if done // batch_size % 100 == 0:
+                logger.info(
+                    "%s: %d/%d keys, %d rows updated (%.0fs)",
+                    table, done, high + 1 - low, updated, time.monotonic() - started,
+                )
+    return updated
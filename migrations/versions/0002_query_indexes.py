@@ -0,0 +1,57 @@
+"""Query indexes: one per repository query, built without blocking writes
+
+Diary / dashboard (eaten_at ranges, covering the daily calorie total),
+recent meals, the foreign keys of food_logs, ai_logs and foods (deletes
+cascading to them no longer scan the table), personal foods of a user and
+the Pending moderation queue. Drops the index over every approval_status
+value and the duplicate of the UNIQUE (ai_slug) index.
+
+Revision ID: 0002_query_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-19 09:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from migrations.online import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_query_indexes"
+down_revision: Union[str, Sequence[str], None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, include, where)
+INDEXES = (
+    ("idx_food_logs_user_eaten_at", "food_logs", "user_id, eaten_at", "calories", None),
+    ("idx_food_logs_user_created", "food_logs", "user_id, created_at DESC", None, None),
+    ("idx_food_logs_food_id", "food_logs", "food_id", None, "food_id IS NOT NULL"),
+    ("idx_food_logs_personal_food_id", "food_logs", "personal_food_id", None, "personal_food_id IS NOT NULL"),
+    ("idx_ai_logs_food_log_id", "ai_logs", "food_log_id", None, None),
+    ("idx_foods_origin_user", "foods", "origin_user_id", None, "origin_user_id IS NOT NULL"),
+    ("idx_personal_foods_user_created", "personal_foods", "user_id, created_at DESC", None, None),
+    ("idx_personal_foods_pending", "personal_foods", "created_at", None, "approval_status = 'Pending'"),
+)
+
+# Replaced by the indexes above
+REPLACED = (
+    ("idx_food_logs_user_date", "food_logs", "user_id, eaten_at", None, None),
+    ("idx_personal_foods_approval", "personal_foods", "approval_status", None, None),
+    ("idx_foods_slug", "foods", "ai_slug", None, None),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns, include, where in INDEXES:
+        create_index_concurrently(name, table, columns, include=include, where=where)
+    for name, *_ in REPLACED:
+        drop_index_concurrently(name)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, columns, include, where in REPLACED:
+        create_index_concurrently(name, table, columns, include=include, where=where)
+    for name, *_ in INDEXES:
+        drop_index_concurrently(name)
@@ -0,0 +1,49 @@
+"""Nutrition targets: precomputed BMI / TDEE / calorie and macro targets per user
+
+Filled by ``python -m app.core.nutrition_targets recompute`` (run it once
+after upgrading, then daily); until a user has a row, the dashboard falls
+back to the TDEE of their latest health status.
+
+Revision ID: 0003_nutrition_targets
+Revises: 0002_query_indexes
+Create Date: 2026-10-19 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from migrations.online import lock_guarded
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_nutrition_targets"
+down_revision: Union[str, Sequence[str], None] = "0002_query_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS nutrition_targets (
+    user_id BIGINT PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    health_status_id BIGINT NOT NULL,
+    formula_version INTEGER NOT NULL,
+    valid_until DATE NOT NULL,
+    age INTEGER NOT NULL,
+    bmi REAL NOT NULL,
+    bmr REAL NOT NULL,
+    tdee REAL NOT NULL,
+    calories INTEGER NOT NULL,
+    protein_g REAL NOT NULL,
+    carbs_g REAL NOT NULL,
+    fat_g REAL NOT NULL,
+    computed_at TIMESTAMPTZ DEFAULT NOW()
+)
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The foreign key briefly locks users: give up and retry rather than queue writes
+    lock_guarded(CREATE_TABLE)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    lock_guarded("DROP TABLE IF EXISTS nutrition_targets")
@@ -0,0 +1,22 @@
+"""
+Test settings: an SQLite database and throwaway cache directories, set
+before any ``app`` module reads its configuration at import time.
+
+Run from the repository root::
+
+    python -m pytest tests
+"""
+
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="nutrition-tests-")
+
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'test.db')}")
+os.environ.setdefault("CACHE_BACKEND", "memory")
+os.environ.setdefault("CACHE_DIR", os.path.join(_tmp, "cache"))
+os.environ.setdefault("HTTP_CACHE_DIR", os.path.join(_tmp, "http_cache"))
+os.environ.setdefault("MODEL_REGISTRY_DIR", os.path.join(_tmp, "model_registry"))
+os.environ.setdefault("TRACING_EXPORTER", "none")
+os.environ.setdefault("METRICS_TOKEN", "")
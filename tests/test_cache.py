@@ -0,0 +1,122 @@
+import asyncio
+import itertools
+from datetime import date
+
+import pytest
+
+import app.models  # noqa: F401  (configures every mapper)
+from app.core import cache
+from app.core.database import Base, SessionLocal, engine
+from app.models import User
+from app.repositories.user_repository import UserRepository
+
+_names = itertools.count()
+
+
+@pytest.fixture
+def namespace():
+    # Namespace names are process-wide
+    return cache.Namespace(f"test_{next(_names)}", ttl=60)
+
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.calls
+
+
+def test_second_lookup_is_a_hit(namespace):
+    load = Loader()
+    assert namespace.get_or_load(("a",), load) == 1
+    assert namespace.get_or_load(("a",), load) == 1
+    assert namespace.get_or_load(("b",), load) == 2
+    assert load.calls == 2
+
+
+def test_invalidate_makes_every_key_unreachable(namespace):
+    load = Loader()
+    namespace.get_or_load(("a",), load, group=1)
+    namespace.get_or_load(("b",), load, group=2)
+    namespace.invalidate()
+    namespace.get_or_load(("a",), load, group=1)
+    namespace.get_or_load(("b",), load, group=2)
+    assert load.calls == 4
+
+
+def test_group_invalidation_leaves_other_groups_cached(namespace):
+    load = Loader()
+    namespace.get_or_load(("a",), load, group=1)
+    namespace.get_or_load(("b",), load, group=2)
+    namespace.invalidate(group=1)
+    assert namespace.get_or_load(("a",), load, group=1) == 3
+    assert namespace.get_or_load(("b",), load, group=2) == 2
+
+
+def test_versions_are_shared_between_backends(namespace):
+    # Two workers on one host: separate LRUs, one version directory
+    other = cache.MemoryBackend()
+    key = namespace.key(("a",))
+    namespace.invalidate()
+    assert namespace.key(("a",)) != key
+    assert other.versions(namespace._version_names(None)) == cache.get_backend().versions(
+        namespace._version_names(None)
+    )
+
+
+def test_event_loop_detection():
+    assert not cache._on_event_loop()
+
+    async def inside():
+        return cache._on_event_loop()
+
+    assert asyncio.run(inside())
+
+
+@pytest.fixture(scope="module")
+def tables():
+    Base.metadata.create_all(engine)
+    yield
+    Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def user(tables):
+    db = SessionLocal()
+    user = User(email=f"cache{next(_names)}@example.com", password_hash="x", full_name="Before", dob=date(1990, 1, 1))
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+    return user_id
+
+
+def _read_name(user_id):
+    db = SessionLocal()
+    try:
+        return UserRepository(db).get_by_id(user_id).full_name
+    finally:
+        db.close()
+
+
+def test_commit_invalidates_cached_rows(user):
+    assert _read_name(user) == "Before"
+    db = SessionLocal()
+    db.get(User, user).full_name = "After"
+    db.commit()
+    db.close()
+    assert _read_name(user) == "After"
+
+
+def test_rollback_keeps_the_cache_and_pending_changes_bypass_it(user):
+    assert _read_name(user) == "Before"
+    db = SessionLocal()
+    db.get(User, user).full_name = "Uncommitted"
+    db.flush()
+    # The session reads its own flushed change, not the cached row
+    assert UserRepository(db).get_by_id(user).full_name == "Uncommitted"
+    db.rollback()
+    db.close()
+    assert _read_name(user) == "Before"
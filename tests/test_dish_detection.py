@@ -0,0 +1,32 @@
+import pytest
+
+from app.core.ai_predictor import _box_overlap, _dedupe_dishes
+
+
+def test_box_overlap():
+    assert _box_overlap((0, 0, 1, 1), (2, 2, 3, 3)) == (0.0, 0.0)
+    iou, containment = _box_overlap((0, 0, 1, 1), (0, 0, 0.5, 0.5))
+    assert iou == pytest.approx(0.25)
+    assert containment == pytest.approx(1.0)
+
+
+def test_windows_of_one_bowl_collapse_to_the_most_confident():
+    candidates = [
+        ("pho", 0.7, (0.0, 0.0, 0.5, 0.5)),
+        ("pho", 0.9, (0.0, 0.0, 0.6, 0.6)),
+        ("pho", 0.6, (0.1, 0.1, 0.4, 0.4)),
+    ]
+    assert _dedupe_dishes(candidates) == [("pho", 0.9, (0.0, 0.0, 0.6, 0.6))]
+
+
+def test_two_separate_bowls_of_the_same_dish_are_kept():
+    candidates = [("pho", 0.8, (0.0, 0.0, 0.4, 0.4)), ("pho", 0.7, (0.6, 0.6, 1.0, 1.0))]
+    assert [c[1] for c in _dedupe_dishes(candidates)] == [0.8, 0.7]
+
+
+def test_other_dish_on_the_same_region_is_dropped_but_a_nested_one_is_kept():
+    same_region = [("pho", 0.9, (0.0, 0.0, 0.5, 0.5)), ("bun_bo", 0.6, (0.0, 0.0, 0.5, 0.52))]
+    assert [c[0] for c in _dedupe_dishes(same_region)] == ["pho"]
+    # A small side dish inside the tray window: low IoU, kept
+    nested = [("com_tam", 0.9, (0.0, 0.0, 1.0, 1.0)), ("trung", 0.6, (0.1, 0.1, 0.3, 0.3))]
+    assert [c[0] for c in _dedupe_dishes(nested)] == ["com_tam", "trung"]
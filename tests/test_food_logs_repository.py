@@ -0,0 +1,12 @@
+from datetime import date, datetime
+
+from app.repositories.food_logs_repository import _day_bounds
+
+
+def test_single_day_is_half_open():
+    assert _day_bounds(date(2026, 10, 19)) == (datetime(2026, 10, 19), datetime(2026, 10, 20))
+
+
+def test_range_includes_the_end_day_across_month_and_leap_day():
+    assert _day_bounds(date(2028, 2, 28), date(2028, 2, 29)) == (datetime(2028, 2, 28), datetime(2028, 3, 1))
+    assert _day_bounds(date(2026, 12, 31)) == (datetime(2026, 12, 31), datetime(2027, 1, 1))
@@ -0,0 +1,36 @@
+from app.core import http_cache
+from app.core.http_cache import DataVersionStore, compute_etag
+
+
+def test_versions_start_at_zero_and_strictly_increase(tmp_path):
+    store = DataVersionStore(str(tmp_path))
+    assert store.version("user-1") == 0
+    seen = []
+    for _ in range(5):
+        store.bump("user-1")
+        seen.append(store.version("user-1"))
+    assert seen == sorted(set(seen))
+    assert store.version("user-2") == 0
+
+
+def test_versions_are_shared_through_the_directory(tmp_path):
+    first, second = DataVersionStore(str(tmp_path)), DataVersionStore(str(tmp_path))
+    assert first.epoch == second.epoch
+    first.bump("global")
+    assert second.version("global") == first.version("global") > 0
+
+
+def test_etag_changes_with_user_data_and_url(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, "versions", type(http_cache.versions)(str(tmp_path)))
+    scope = {"path": "/home/diary", "query_string": b"date=2026-10-19"}
+    etag = compute_etag(scope, user_id=1)
+    assert etag.startswith('W/"')
+    assert compute_etag(scope, user_id=1) == etag
+    assert compute_etag(scope, user_id=2) != etag
+    assert compute_etag({**scope, "query_string": b"date=2026-10-18"}, user_id=1) != etag
+
+    http_cache.versions.bump_user(1)
+    changed = compute_etag(scope, user_id=1)
+    assert changed != etag
+    http_cache.versions.bump_global()
+    assert compute_etag(scope, user_id=1) != changed
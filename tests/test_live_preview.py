@@ -0,0 +1,46 @@
+import pytest
+
+from app.core import live_preview
+from app.core.live_preview import STABLE_FRAMES, ProbabilitySmoother, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(live_preview.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_token_bucket_burst_then_refill(clock):
+    bucket = TokenBucket(rate=2.0, burst=2.0)
+    assert [bucket.try_acquire() for _ in range(3)] == [True, True, False]
+    clock[0] += 0.5
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    # Refill is capped at the burst size
+    clock[0] += 60
+    assert [bucket.try_acquire() for _ in range(3)] == [True, True, False]
+
+
+def test_smoother_first_frame_is_not_damped():
+    guess = ProbabilitySmoother(alpha=0.4).update([("pho", 0.8), ("bun_bo", 0.1)])
+    assert guess == {"label": "pho", "confidence": 0.8, "stable": False}
+
+
+def test_smoother_needs_consecutive_frames_to_switch_and_stabilise():
+    smoother = ProbabilitySmoother(alpha=0.4)
+    smoother.update([("pho", 0.9)])
+    # One contradicting frame does not flip the guess
+    assert smoother.update([("bun_bo", 0.9)])["label"] == "pho"
+    guesses = [smoother.update([("bun_bo", 0.9)]) for _ in range(STABLE_FRAMES + 1)]
+    assert guesses[0]["label"] == "bun_bo"
+    assert not guesses[0]["stable"]
+    assert guesses[-1]["stable"]
+
+
+def test_smoother_drops_faded_labels():
+    smoother = ProbabilitySmoother(alpha=0.5, min_score=0.05)
+    smoother.update([("pho", 0.2)])
+    for _ in range(5):
+        smoother.update([("com_tam", 0.9)])
+    assert "pho" not in smoother.scores
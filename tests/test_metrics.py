@@ -0,0 +1,16 @@
+from app.core.metrics import scrape_allowed
+
+
+def test_without_token_only_loopback_may_scrape():
+    assert scrape_allowed(None, "127.0.0.1", token="")
+    assert scrape_allowed(None, "::1", token="")
+    assert not scrape_allowed(None, "10.0.0.7", token="")
+    assert not scrape_allowed("Bearer anything", "203.0.113.9", token="")
+
+
+def test_with_token_the_bearer_must_match_from_anywhere():
+    assert scrape_allowed("Bearer s3cret", "203.0.113.9", token="s3cret")
+    assert scrape_allowed("bearer s3cret", "203.0.113.9", token="s3cret")
+    assert not scrape_allowed("Bearer wrong", "127.0.0.1", token="s3cret")
+    assert not scrape_allowed("Basic s3cret", "127.0.0.1", token="s3cret")
+    assert not scrape_allowed(None, "127.0.0.1", token="s3cret")
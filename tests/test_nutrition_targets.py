@@ -0,0 +1,52 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app.core.nutrition_targets import MIN_TDEE, ages_on, compute_targets
+
+
+def test_age_before_and_on_birthday():
+    ages, next_birthday = ages_on([date(1990, 10, 20)], date(2026, 10, 19))
+    assert ages.tolist() == [35]
+    assert next_birthday.astype(object).tolist() == [date(2026, 10, 20)]
+
+    ages, next_birthday = ages_on([date(1990, 10, 20)], date(2026, 10, 20))
+    assert ages.tolist() == [36]
+    assert next_birthday.astype(object).tolist() == [date(2027, 10, 20)]
+
+
+def test_feb_29_birthday_rolls_over_to_march_1():
+    dob = date(2000, 2, 29)
+    ages, next_birthday = ages_on([dob], date(2027, 2, 28))
+    assert ages.tolist() == [26]
+    assert next_birthday.astype(object).tolist() == [date(2027, 3, 1)]
+
+    ages, next_birthday = ages_on([dob], date(2027, 3, 1))
+    assert ages.tolist() == [27]
+    assert next_birthday.astype(object).tolist() == [date(2028, 2, 29)]
+
+
+def test_mifflin_st_jeor_scalar():
+    targets = compute_targets(70, 175, 35, True, 1.55)
+    # 10 * 70 + 6.25 * 175 - 5 * 35 + 5
+    assert targets["bmr"] == pytest.approx(1623.75)
+    assert targets["tdee"] == pytest.approx(2516.81)
+    assert targets["calories"] == 2517
+    assert targets["bmi"] == pytest.approx(22.86)
+    assert targets["protein_g"] == pytest.approx(94.4)
+    assert targets["carbs_g"] == pytest.approx(377.6)
+    assert targets["fat_g"] == pytest.approx(69.9)
+
+
+def test_vectorized_matches_scalar_and_floors():
+    weights = np.array([70.0, 55.0, 20.0])
+    heights = np.array([175.0, 160.0, 110.0])
+    ages = np.array([35, 26, 8])
+    is_male = np.array([True, False, False])
+    multipliers = np.array([1.55, 1.9, 1.2])
+    batch = compute_targets(weights, heights, ages, is_male, multipliers)
+    for i in range(len(weights)):
+        single = compute_targets(weights[i], heights[i], ages[i], is_male[i], multipliers[i])
+        assert batch["calories"][i] == single["calories"]
+    assert batch["tdee"][2] == MIN_TDEE
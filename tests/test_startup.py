@@ -0,0 +1,9 @@
+from benchmarks.bench_startup import DEFAULT_BUDGET_MS, check, measure
+
+
+def test_cold_start_import_budget():
+    result = measure()
+    assert not check(result), (
+        f"{'; '.join(check(result))} (budget {DEFAULT_BUDGET_MS:.0f} ms, STARTUP_BUDGET_MS); slowest: "
+        + ", ".join(f"{name.strip()} {us / 1000:.0f} ms" for us, name in result["modules"][:5])
+    )